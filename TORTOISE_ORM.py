@@ -12,20 +12,85 @@ DB_PORT = int(os.getenv("DB_PORT", 5432))
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "a1527896724")
 DB_NAME = os.getenv("DB_NAME", "postgres")
-DB_ENGINE = os.getenv("DB_ENGINE", "tortoise.backends.asyncpg")
+# 默认使用带查询指标的asyncpg后端，见 database/asyncpg_backend.py
+DB_ENGINE = os.getenv("DB_ENGINE", "database.asyncpg_backend")
+
+# 连接池配置，默认值与 Tortoise/asyncpg 的默认值一致
+# 每个worker进程各有一个连接池，总连接数 = worker数 * DB_POOL_MAXSIZE，需小于数据库的 max_connections
+DB_POOL_MINSIZE = int(os.getenv("DB_POOL_MINSIZE", 1))
+DB_POOL_MAXSIZE = int(os.getenv("DB_POOL_MAXSIZE", 5))
+# 单个连接执行多少条查询后重建
+DB_POOL_MAX_QUERIES = int(os.getenv("DB_POOL_MAX_QUERIES", 50000))
+# 空闲连接超过该秒数后关闭，0表示不关闭
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_POOL_MAX_INACTIVE_LIFETIME", 300))
+# 预编译语句缓存大小，经 pgbouncer transaction 模式连接时必须设为0
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+# 每个连接建立时设置的服务端参数，留空使用数据库的默认值
+DB_STATEMENT_TIMEOUT = os.getenv("DB_STATEMENT_TIMEOUT", "")  # 如 "30s"
+DB_JIT = os.getenv("DB_JIT", "")  # 以短查询为主时建议 "off"
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "")
+# 其他服务端参数，格式 "name=value,name=value"，如 "idle_in_transaction_session_timeout=60s"
+DB_SERVER_SETTINGS = os.getenv("DB_SERVER_SETTINGS", "")
+
+# 只读副本，格式 "host:port,host:port"(端口可省略，默认同 DB_PORT)，留空表示所有查询都走主库
+# 副本使用与主库相同的用户名、密码和数据库名，读查询的分配见 database/replica.py
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_REPLICA_POOL_MAXSIZE = int(os.getenv("DB_REPLICA_POOL_MAXSIZE", DB_POOL_MAXSIZE))
+
+
+def _server_settings() -> dict:
+    """汇总连接建立时发送给服务端的参数(相当于每个连接执行一次 SET)"""
+    settings = {}
+    for item in DB_SERVER_SETTINGS.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            settings[name.strip()] = value.strip()
+    if DB_STATEMENT_TIMEOUT:
+        settings["statement_timeout"] = DB_STATEMENT_TIMEOUT
+    if DB_JIT:
+        settings["jit"] = DB_JIT
+    if DB_APPLICATION_NAME:
+        settings["application_name"] = DB_APPLICATION_NAME
+    return settings
+
+
+def _connection(host: str, port: int, maxsize: int) -> dict:
+    return {
+        'engine': DB_ENGINE,
+        'credentials': {
+            'host': host,
+            'port': port,
+            'user': DB_USER,
+            'password': DB_PASSWORD,
+            'database': DB_NAME,
+            'minsize': DB_POOL_MINSIZE,
+            'maxsize': maxsize,
+            'max_queries': DB_POOL_MAX_QUERIES,
+            'max_inactive_connection_lifetime': DB_POOL_MAX_INACTIVE_LIFETIME,
+            'statement_cache_size': DB_STATEMENT_CACHE_SIZE,
+            'server_settings': _server_settings(),
+        }
+    }
+
+
+def _replica_connections() -> dict:
+    """按 DB_REPLICA_HOSTS 生成副本连接 replica_0, replica_1, ..."""
+    replicas = {}
+    hosts = [item.strip() for item in DB_REPLICA_HOSTS.split(",") if item.strip()]
+    for index, item in enumerate(hosts):
+        host, sep, port = item.rpartition(":")
+        if not sep:
+            host, port = item, DB_PORT
+        replicas[f"replica_{index}"] = _connection(host, int(port), DB_REPLICA_POOL_MAXSIZE)
+    return replicas
+
+
+REPLICA_CONNECTIONS = _replica_connections()
 
 TORTOISE_ORM = {
     'connections': {
-        'default': {
-            'engine': DB_ENGINE,
-            'credentials': {
-                'host': DB_HOST,
-                'port': DB_PORT,
-                'user': DB_USER,
-                'password': DB_PASSWORD,
-                'database': DB_NAME,
-            }
-        }
+        'default': _connection(DB_HOST, DB_PORT, DB_POOL_MAXSIZE),
+        **REPLICA_CONNECTIONS,
     },
     'apps': {
         'models': {
@@ -35,4 +100,8 @@ TORTOISE_ORM = {
     },
     'use_tz': False,
     'timezone': 'Asia/Shanghai'
-} 
\ No newline at end of file
+} 
+
+# 配置了副本时启用读写分离路由
+if REPLICA_CONNECTIONS:
+    TORTOISE_ORM['routers'] = ["database.replica.ReplicaRouter"]
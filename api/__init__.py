@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from .internal import internal_router
+from .health import health_router
 
 # 创建API路由器
 api_router = APIRouter()
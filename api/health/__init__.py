@@ -0,0 +1 @@
+from .health import router as health_router
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from core.health import readiness_probe
+from schemas.Baseresponse import BaseResponse, success_response
+
+
+# 创建API路由器，挂载在根路径下，供负载均衡器和容器编排探测，无需鉴权
+router = APIRouter(tags=["健康检查"])
+
+
+@router.get("/healthz")
+async def healthz():
+    """
+    存活探针: 不做任何I/O，进程能处理请求即返回200
+    
+    Returns:
+        固定的成功响应
+    """
+    return success_response(message="ok")
+
+
+@router.get("/readyz")
+async def readyz(request: Request):
+    """
+    就绪探针: 检查数据库可达性、连接池饱和度和操作日志写入器状态
+    检查结果缓存 HEALTH_PROBE_TTL 秒；启动完成前和开始关闭后直接返回503
+    
+    Returns:
+        就绪时返回200，否则返回503，data 中包含各项检查结果
+    """
+    if not getattr(request.app.state, "ready", False):
+        return _unavailable("应用未就绪", None)
+    result = await readiness_probe.check()
+    if not result["ready"]:
+        return _unavailable("依赖检查未通过", result)
+    return success_response(message="ready", data=result)
+
+
+def _unavailable(message: str, data) -> JSONResponse:
+    return JSONResponse(status_code=503, content=BaseResponse(code=503, message=message, data=data).model_dump())
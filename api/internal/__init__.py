@@ -1,5 +1,7 @@
 from fastapi import APIRouter
 from .user.user import router as user_router
+from .monitor.monitor import router as monitor_router
+from .operation_log.operation_log import router as operation_log_router
 
 # 创建API路由器
 internal_router = APIRouter(prefix="/internal",tags=["内部接口"])
@@ -7,6 +9,8 @@ internal_router = APIRouter(prefix="/internal",tags=["内部接口"])
 
 # 添加路由器到内部路由器
 internal_router.include_router(user_router)
+internal_router.include_router(monitor_router)
+internal_router.include_router(operation_log_router)
 
 
 
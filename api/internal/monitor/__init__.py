@@ -0,0 +1 @@
+from .monitor import router as monitor_router
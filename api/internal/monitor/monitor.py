@@ -0,0 +1,87 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
+from core.auth import get_admin_user
+from core.audit import AuditPolicy, audit_policy
+from core.metrics import metrics
+from core.error_tracker import error_tracker
+from database.asyncpg_backend import pool_stats
+from database.replica import replica_set
+from config import config
+from schemas.Baseresponse import success_response
+
+
+# 创建API路由器
+router = APIRouter(tags=["系统监控"])
+
+# Prometheus 文本格式的 Content-Type
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", dependencies=[Depends(get_admin_user)], response_class=PlainTextResponse)
+@audit_policy(AuditPolicy.ERRORS)
+async def get_metrics():
+    """
+    获取Prometheus格式的运行指标
+    包含按路由的请求数/耗时直方图、数据库查询、密码哈希和JWT验证耗时
+    
+    Returns:
+        Prometheus文本格式的指标
+    """
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/errors", dependencies=[Depends(get_admin_user)])
+@audit_policy(AuditPolicy.ERRORS)
+async def get_error_fingerprints(limit: int = Query(20, ge=1, le=200, description="返回条数")):
+    """
+    获取出现次数最多的未处理异常指纹
+    
+    Args:
+        limit: 返回条数
+    
+    Returns:
+        包含指纹、异常类型、消息、位置、次数、首次/最近出现时间的列表
+    """
+    return success_response(
+        message="获取异常统计成功",
+        data={"stats": error_tracker.stats(), "items": error_tracker.top(limit)}
+    )
+
+
+@router.get("/db/pool", dependencies=[Depends(get_admin_user)])
+@audit_policy(AuditPolicy.ERRORS)
+async def get_db_pool_stats(
+    long_held_seconds: Optional[float] = Query(None, ge=0, description="借出超过该秒数的连接列为长时间占用，默认取配置")
+):
+    """
+    获取数据库连接池的实时统计
+    用于按实际worker数和并发量调整 DB_POOL_MINSIZE/DB_POOL_MAXSIZE
+    
+    Args:
+        long_held_seconds: 长时间占用的阈值(秒)
+    
+    Returns:
+        每个连接的池大小、使用率、等待数、获取等待时间和长时间占用的连接(含请求ID)
+    """
+    if long_held_seconds is None:
+        long_held_seconds = config.DB_POOL_LONG_HELD_SECONDS
+    return success_response(
+        message="获取连接池统计成功",
+        data=pool_stats(long_held_seconds)
+    )
+
+
+@router.get("/db/replicas", dependencies=[Depends(get_admin_user)])
+@audit_policy(AuditPolicy.ERRORS)
+async def get_db_replica_stats():
+    """
+    获取只读副本的健康状态和读查询分配情况
+    
+    Returns:
+        主库承担的读查询数、处于读己之写窗口内的用户数，以及每个副本的健康状态、复制延迟和读查询数
+    """
+    return success_response(
+        message="获取副本状态成功",
+        data=replica_set.stats()
+    )
@@ -0,0 +1 @@
+from .operation_log import router as operation_log_router
@@ -0,0 +1,256 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from tortoise import Tortoise
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+from common.pagination import paginate_tortoise, parse_fields
+from config import config
+from core.auth import get_admin_user
+from core.Exception import ServiceUnavailableException
+from database.replica import replica_set
+from model.operation_log import OperationLog
+from schemas.Baseresponse import success_response
+from schemas.internal.operation_log import OperationLogItem
+
+
+# 创建API路由器
+router = APIRouter(prefix="/operation_logs", tags=["操作日志"])
+
+# 列表和导出返回的列，顺序即导出文件的列顺序
+EXPORT_COLUMNS = ("id", "create_time", "user_id", "username", "operation", "result", "request_id")
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+class _ExportSlot:
+    """一个导出名额，响应体结束或响应完成时释放，重复释放无效"""
+
+    def __init__(self, limiter: "_ExportLimiter"):
+        self._limiter = limiter
+        self._held = True
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._limiter.active -= 1
+
+
+class _ExportLimiter:
+    """
+    并发导出名额
+    只在事件循环线程中使用，检查和占用之间没有 await，不需要加锁
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+    def try_acquire(self) -> Optional[_ExportSlot]:
+        """不等待地占用一个名额，名额已满时返回 None"""
+        if self.active >= self.limit:
+            return None
+        self.active += 1
+        return _ExportSlot(self)
+
+
+# 导出在整个下载期间占用一个数据库连接，限制每个worker的并发导出数，避免占满连接池
+export_limiter = _ExportLimiter(config.OPLOG_EXPORT_MAX_CONCURRENT)
+
+
+def _build_query(
+    user_id: Optional[int],
+    username: Optional[str],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    operation: Optional[str],
+    result: Optional[str],
+) -> QuerySet[OperationLog]:
+    """
+    构建按时间倒序的操作日志查询
+    时间范围为左闭右开，start_time/end_time 同时限定了需要扫描的分区
+    """
+    query = OperationLog.all()
+    if user_id is not None:
+        query = query.filter(user_id=user_id)
+    if username:
+        query = query.filter(username=username)
+    if start_time:
+        query = query.filter(create_time__gte=start_time)
+    if end_time:
+        query = query.filter(create_time__lt=end_time)
+    if operation:
+        query = query.filter(operation__icontains=operation)
+    if result:
+        query = query.filter(result__icontains=result)
+    return query.order_by("-create_time", "-id")
+
+
+@router.get("", dependencies=[Depends(get_admin_user)])
+async def get_operation_logs(
+    user_id: Optional[int] = Query(None, description="用户ID过滤"),
+    username: Optional[str] = Query(None, description="用户名过滤"),
+    start_time: Optional[datetime] = Query(None, description="开始时间(包含)"),
+    end_time: Optional[datetime] = Query(None, description="结束时间(不包含)"),
+    operation: Optional[str] = Query(None, description="操作内容过滤"),
+    result: Optional[str] = Query(None, description="操作结果过滤"),
+    cursor: Optional[str] = Query(None, description="上一次返回的 next_cursor/prev_cursor，为空时从最新记录开始"),
+    page_size: int = Query(20, ge=1, le=200, description="每页条数"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，如 id,create_time,operation"),
+):
+    """
+    按时间倒序查询操作日志
+    使用 (create_time, id) 键集分页，任意深度的翻页只读取 page_size 行
+    
+    Args:
+        user_id: 用户ID过滤
+        username: 用户名过滤
+        start_time: 开始时间(包含)
+        end_time: 结束时间(不包含)
+        operation: 操作内容过滤(包含匹配)
+        result: 操作结果过滤(包含匹配)
+        cursor: 分页游标
+        page_size: 每页条数
+        fields: 只返回的字段，逗号分隔
+    
+    Returns:
+        包含操作日志列表和上一页/下一页游标的响应
+    """
+    query = _build_query(user_id, username, start_time, end_time, operation, result)
+    pagination_result = await paginate_tortoise(
+        query_set=query,
+        page_size=page_size,
+        schema_model=OperationLogItem,
+        cursor=cursor,
+        keyset=True,
+        fields=parse_fields(fields)
+    )
+    return success_response(
+        message="获取操作日志成功",
+        data=pagination_result
+    )
+
+
+async def _iter_rows(query: QuerySet[OperationLog]) -> AsyncIterator[tuple]:
+    """
+    逐行读取查询结果，内存占用与结果集大小无关
+        - asyncpg: 在只读事务中使用服务端游标，每次预取 OPLOG_EXPORT_PREFETCH 行
+        - 其他后端: 按 (create_time, id) 键集分批查询
+    配置了只读副本时在副本上执行
+    """
+    conn = Tortoise.get_connection(replica_set.read_connection())
+    if isinstance(conn, AsyncpgDBClient):
+        sql = query.values_list(*EXPORT_COLUMNS).sql()
+        async with conn.acquire_connection() as connection:
+            async with connection.transaction(readonly=True):
+                async for record in connection.cursor(sql, prefetch=config.OPLOG_EXPORT_PREFETCH):
+                    yield tuple(record)
+        return
+
+    batch_query = query.limit(config.OPLOG_EXPORT_PREFETCH).values_list(*EXPORT_COLUMNS)
+    while True:
+        rows = await batch_query
+        for row in rows:
+            yield row
+        if len(rows) < config.OPLOG_EXPORT_PREFETCH:
+            return
+        last = rows[-1]
+        create_time, last_id = last[1], last[0]
+        batch_query = query.filter(
+            Q(create_time__lte=create_time),
+            Q(create_time__lt=create_time) | Q(id__lt=last_id),
+        ).limit(config.OPLOG_EXPORT_PREFETCH).values_list(*EXPORT_COLUMNS)
+
+
+def _format_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def _export_csv(rows: AsyncIterator[tuple]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # 带BOM，Excel打开时能正确识别UTF-8中文
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    async for row in rows:
+        writer.writerow([_format_value(value) for value in row])
+        count += 1
+        if count % config.OPLOG_EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def _export_ndjson(rows: AsyncIterator[tuple]) -> AsyncIterator[str]:
+    lines: List[str] = []
+    async for row in rows:
+        item = {column: _format_value(value) for column, value in zip(EXPORT_COLUMNS, row)}
+        lines.append(json.dumps(item, ensure_ascii=False))
+        if len(lines) >= config.OPLOG_EXPORT_CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines.clear()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def _release_after(body: AsyncIterator[str], slot: _ExportSlot) -> AsyncIterator[str]:
+    """响应体发送完毕、出错或被取消时释放导出名额"""
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        slot.release()
+
+
+@router.get("/export", dependencies=[Depends(get_admin_user)])
+async def export_operation_logs(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="导出格式: csv 或 ndjson"),
+    user_id: Optional[int] = Query(None, description="用户ID过滤"),
+    username: Optional[str] = Query(None, description="用户名过滤"),
+    start_time: Optional[datetime] = Query(None, description="开始时间(包含)"),
+    end_time: Optional[datetime] = Query(None, description="结束时间(不包含)"),
+    operation: Optional[str] = Query(None, description="操作内容过滤"),
+    result: Optional[str] = Query(None, description="操作结果过滤"),
+):
+    """
+    流式导出操作日志
+    数据边查询边发送，导出一个月的日志也不会整体加载到worker内存中
+    
+    Args:
+        export_format: 导出格式(查询参数 format)，csv 或 ndjson
+        其余参数与列表接口相同
+    
+    Returns:
+        StreamingResponse: 按时间倒序的导出文件
+    """
+    # 名额已满时直接拒绝，而不是让下载排队等待
+    # 在处理函数中占用名额，名额已满时立即拒绝，而不是让下载排队等待
+    slot = export_limiter.try_acquire()
+    if slot is None:
+        raise ServiceUnavailableException(detail="导出任务过多，请稍后再试", headers={"Retry-After": "30"})
+    try:
+        query = _build_query(user_id, username, start_time, end_time, operation, result)
+        rows = _iter_rows(query)
+        body = _export_csv(rows) if export_format == "csv" else _export_ndjson(rows)
+        filename = f"operation_logs_{datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+        return StreamingResponse(
+            _release_after(body, slot),
+            media_type=EXPORT_MEDIA_TYPES[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+            # 客户端在响应体开始之前断开时，响应体生成器可能不会执行，由后台任务兜底释放
+            background=BackgroundTask(slot.release),
+        )
+    except Exception:
+        slot.release()
+        raise
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Query, UploadFile, File
+from fastapi import APIRouter, Query, UploadFile, File, Request
 from schemas.internal.user import LoginRequest
 from schemas.Baseresponse import success_response, error_response
 from core.jwtwoken import create_access_token
-from utils.crypto import PasswordManager
+from core.password_executor import hash_password_async, verify_and_update_password_async
 from core.loguru import logger
 from model.enum.user import UserStatus, UserType
 from model.user import User
 from schemas.internal.user import CreateUserRequest, UserListItem, UpdateUserRequest
-from core.Exception import DatabaseException
+from core.Exception import DatabaseException, BaseAPIException, ValidationException
 from typing import Optional
-from common.pagination import paginate_tortoise
+from common.pagination import CountStrategy, count_cache, paginate_tortoise, parse_fields
+from common.search import fuzzy_search
 from fastapi import Depends
-from core.auth import get_admin_user, get_current_user
+from core.auth import get_admin_user, get_current_user, invalidate_principal
+from core.revocation import revocation_filter
+from core.audit import AuditPolicy, audit_policy
+from core.error_tracker import error_tracker
+from core.rate_limit import check_login_allowed, get_client_ip, record_login_failure, record_login_success
 from datetime import datetime
 import os
 import shutil
@@ -20,47 +25,68 @@ import shutil
 # 创建API路由器
 router = APIRouter(prefix="/users", tags=["内部用户管理"])
 
+# 关键词模糊搜索的字段，均建有 pg_trgm 索引(迁移 13_*_add_user_trigram_indexes.py)
+USER_SEARCH_FIELDS = ("username", "nickname", "user_phone", "user_email")
+
 @router.post("/login")
-async def login_user(login_data: LoginRequest):
+async def login_user(login_data: LoginRequest, request: Request):
     """
     用户登录接口
     
     Args:
         login_data: 登录请求数据，包含用户名和密码
+        request: 当前请求，用于获取客户端IP
         
     Returns:
         包含token和用户信息的响应
     """
     try:
-        logger.debug(f"用户尝试登录: {login_data.username}")
+        logger.debug("用户尝试登录: {}", login_data.username)
+        
+        # 限流检查，必须在查询用户和bcrypt校验之前
+        client_ip = get_client_ip(request)
+        check_login_allowed(login_data.username, client_ip)
         
         # 查找用户
         user = await User.filter(username=login_data.username).first()
         
         if not user:
-            logger.warning(f"登录失败: 用户名 {login_data.username} 不存在")
+            logger.warning("登录失败: 用户名 {} 不存在", login_data.username)
+            record_login_failure(login_data.username, client_ip)
             return error_response("用户名或密码错误")
         
-        # 验证密码
-        if not PasswordManager.verify(login_data.password, user.password):
-            logger.warning(f"登录失败: 用户 {login_data.username} 密码错误")
+        # 验证密码，哈希参数过时(如调整了BCRYPT_ROUNDS)时得到新哈希
+        verified, new_password_hash = await verify_and_update_password_async(login_data.password, user.password)
+        if not verified:
+            logger.warning("登录失败: 用户 {} 密码错误", login_data.username)
+            record_login_failure(login_data.username, client_ip)
             return error_response("用户名或密码错误")
         
+        record_login_success(login_data.username)
+        
         # 检查用户状态
         if user.user_status != UserStatus.ACTIVE:
-            logger.warning(f"登录失败: 用户 {login_data.username} 已被禁用")
+            logger.warning("登录失败: 用户 {} 已被禁用", login_data.username)
             return error_response("用户已被禁用")
         
         if user.user_type != UserType.ADMIN and user.user_type != UserType.SUPER_ADMIN:
-            logger.warning(f"登录失败: 用户 {login_data.username} 不是管理员")
+            logger.warning("登录失败: 用户 {} 不是管理员", login_data.username)
             return error_response("用户不是管理员")
         
         # 创建访问令牌
-        access_token = create_access_token(user_id=user.id, user_type=user.user_type)
-        logger.info(f"用户 {user.username} 登录成功")
+        access_token = create_access_token(
+            user_id=user.id,
+            user_type=user.user_type,
+            token_version=user.token_version,
+            username=user.username
+        )
+        logger.info("用户 {} 登录成功", user.username)
         
-        # 更新登录时间
+        # 更新登录时间，并透明地保存按当前参数重新生成的密码哈希
         user.login_time = datetime.now()
+        if new_password_hash:
+            user.password = new_password_hash
+            logger.info("用户 {} 的密码哈希已按当前参数更新", user.username)
         await user.save()
         
         # 返回令牌和用户信息
@@ -68,9 +94,12 @@ async def login_user(login_data: LoginRequest):
             message="登录成功",
             data=access_token    
         )
+    except BaseAPIException:
+        # 登录限流、密码哈希队列已满等需要直接返回给客户端的错误
+        raise
     except Exception as e:
         error_msg = f"登录处理时发生错误: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        error_tracker.report(e, error_msg)
         return error_response(error_msg)
 
 
@@ -87,18 +116,18 @@ async def create_user(user_data: CreateUserRequest):
         包含创建结果的响应
     """
     try:
-        logger.debug(f"创建用户: {user_data.username}") 
+        logger.debug("创建用户: {}", user_data.username) 
 
         # 检查用户是否已存在
         existing_user = await User.filter(username=user_data.username).first()
         if existing_user:
-            logger.warning(f"创建用户失败: 用户名 {user_data.username} 已存在")
+            logger.warning("创建用户失败: 用户名 {} 已存在", user_data.username)
             return error_response("用户名已存在")
         
         # 创建用户
         user = await User.create(
             username=user_data.username,
-            password=PasswordManager.hash(user_data.password),
+            password=await hash_password_async(user_data.password),
             user_email=user_data.user_email,
             user_phone=user_data.user_phone,      
             nickname=user_data.nickname,
@@ -108,15 +137,19 @@ async def create_user(user_data: CreateUserRequest):
             user_status=user_data.user_status,
         )
         
-        logger.info(f"用户 {user.username} 创建成功")
+        # 用户列表的缓存总数随之失效
+        count_cache.clear()
+        logger.info("用户 {} 创建成功", user.username)
         
         # 转换为 UserListItem 格式返回
         return success_response(
             message="用户创建成功"
         )
+    except BaseAPIException:
+        raise
     except Exception as e:
         error_msg = f"创建用户时发生错误: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        error_tracker.report(e, error_msg)
         return error_response(error_msg)
 
 
@@ -148,7 +181,7 @@ async def get_user(user_id: int):
         )
    
     except Exception as e:
-        logger.error(f"获取用户详情失败: {e}")
+        logger.error("获取用户详情失败: {}", e)
         raise DatabaseException(detail=f"获取用户详情失败: {e}")
 
 
@@ -165,14 +198,21 @@ async def update_user(user_id: int, user_data: UpdateUserRequest):
         包含更新结果的响应
     """
     try:
-        logger.debug(f"更新用户: {user_id}")
+        logger.debug("更新用户: {}", user_id)
 
         # 检查用户是否存在
         user = await User.get(id=user_id)
         if not user:
-            logger.warning(f"更新用户失败: 用户ID {user_id} 不存在")
+            logger.warning("更新用户失败: 用户ID {} 不存在", user_id)
             return error_response("用户不存在")
         
+        # 用户状态或类型变更时递增令牌版本，使已签发的令牌失效
+        revoke_tokens = (
+            user.user_status != user_data.user_status or user.user_type != user_data.user_type
+        )
+        if revoke_tokens:
+            user.token_version += 1
+
         # 更新用户信息
         user.username = user_data.username
         user.user_email = user_data.user_email
@@ -184,8 +224,13 @@ async def update_user(user_id: int, user_data: UpdateUserRequest):
         user.user_status = user_data.user_status
         user.client_host = user_data.client_host
         await user.save()
+        # 用户状态/类型可能已变更，使鉴权缓存和用户列表的缓存总数失效
+        invalidate_principal(user.id)
+        count_cache.clear()
+        if revoke_tokens:
+            revocation_filter.revoke(user.id)
         
-        logger.info(f"用户 {user.username} 更新成功")
+        logger.info("用户 {} 更新成功", user.username)
         
         return success_response(
             message="用户更新成功",
@@ -202,7 +247,7 @@ async def update_user(user_id: int, user_data: UpdateUserRequest):
         )
     except Exception as e:
         error_msg = f"更新用户时发生错误: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        error_tracker.report(e, error_msg)
         return error_response(error_msg)
 
 
@@ -220,22 +265,26 @@ async def delete_user(user_id: int):
     try:
         user = await User.get(id=user_id)
         if not user:
-            logger.warning(f"删除用户失败: 用户ID {user_id} 不存在")
+            logger.warning("删除用户失败: 用户ID {} 不存在", user_id)
             return error_response("用户不存在")
         
         await user.delete()
+        invalidate_principal(user_id)
+        revocation_filter.revoke(user_id)
+        count_cache.clear()
         
-        logger.info(f"用户 {user.username} 删除成功")
+        logger.info("用户 {} 删除成功", user.username)
         
         return success_response(
             message="用户删除成功"
         )
     except Exception as e:
         error_msg = f"删除用户时发生错误: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        error_tracker.report(e, error_msg)
         return error_response(error_msg)
 
 @router.get("/get_user_list", dependencies=[Depends(get_admin_user)])
+@audit_policy(AuditPolicy.NEVER)
 async def get_user_list(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页条数"),
@@ -245,7 +294,14 @@ async def get_user_list(
     user_status: Optional[int] = Query(None, description="用户状态过滤"),
     user_phone: Optional[str] = Query(None, description="手机号过滤"),
     user_email: Optional[str] = Query(None, description="邮箱过滤"),
-    sex: Optional[int] = Query(None, description="性别过滤")
+    sex: Optional[int] = Query(None, description="性别过滤"),
+    keyword: Optional[str] = Query(None, description="模糊搜索用户名/昵称/手机号/邮箱，结果按相似度排序"),
+    cursor: Optional[str] = Query(None, description="游标分页: 传入上次返回的游标，传空字符串从第一页开始；不传时按页码分页"),
+    fields: Optional[str] = Query(None, description="只返回指定字段，逗号分隔，如 id,username"),
+    count_strategy: str = Query(
+        CountStrategy.EXACT, pattern="^(exact|cached|estimated|has_more)$",
+        description="总数统计策略: exact 精确(默认)；cached 缓存若干秒，总数可能滞后且各worker不同"
+    )
 ):
     """
     获取用户列表
@@ -260,6 +316,10 @@ async def get_user_list(
         user_phone: 手机号过滤
         user_email: 邮箱过滤
         sex: 性别过滤
+        keyword: 模糊搜索关键词，不能与游标分页同时使用
+        cursor: 游标分页的游标，传入时忽略page且不返回总数
+        fields: 只返回的字段，逗号分隔
+        count_strategy: 总数统计策略，见 CountStrategy
 
     Returns:
         包含用户列表的响应
@@ -267,21 +327,25 @@ async def get_user_list(
     try:
         # 构建查询集
         query = User.all()
+        if keyword and keyword.strip():
+            if cursor is not None:
+                raise ValidationException(detail="关键词搜索按相似度排序，不支持游标分页")
+            query = fuzzy_search(query, keyword, USER_SEARCH_FIELDS)
         
-        # 构建过滤条件
+        # 构建过滤条件，包含匹配使用 icontains (PostgreSQL上为可走 pg_trgm 索引的 ILIKE)
         filters = {}
         if username:
-            filters["username__contains"] = username
+            filters["username__icontains"] = username
         if nickname:
-            filters["nickname__contains"] = nickname
+            filters["nickname__icontains"] = nickname
         if user_type is not None:
             filters["user_type"] = user_type
         if user_status is not None:
             filters["user_status"] = user_status
         if user_phone:
-            filters["user_phone__contains"] = user_phone
+            filters["user_phone__icontains"] = user_phone
         if user_email:
-            filters["user_email__contains"] = user_email
+            filters["user_email__icontains"] = user_email
         if sex is not None:
             filters["sex"] = sex
         
@@ -305,16 +369,23 @@ async def get_user_list(
             page_size=page_size,
             # transform_func=transform_user,
             filters=filters,
-            schema_model=UserListItem
+            schema_model=UserListItem,
+            cursor=cursor,
+            keyset=cursor is not None,
+            # 默认精确统计；调用方可选择 cached，总数缓存 PAGINATION_COUNT_CACHE_TTL 秒，本进程内增删改用户时清空
+            count_strategy=count_strategy,
+            fields=parse_fields(fields)
         )
         
         return success_response(
             message="用户列表获取成功",
             data=pagination_result
         )
+    except BaseAPIException:
+        raise
     except Exception as e:
         error_msg = f"获取用户列表时发生错误: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        error_tracker.report(e, error_msg)
         return error_response(error_msg)
 
 @router.post("/upload_avatar/{user_id}")
@@ -361,7 +432,7 @@ async def upload_avatar(
         user.avatar = avatar_url
         await user.save()
         
-        logger.info(f"用户 {user.username} 更新头像成功")
+        logger.info("用户 {} 更新头像成功", user.username)
         
         return success_response(
             message="头像上传成功",
@@ -369,7 +440,7 @@ async def upload_avatar(
         )
     except Exception as e:
         error_msg = f"头像上传失败: {str(e)}"
-        logger.error(error_msg, exc_info=True)
+        error_tracker.report(e, error_msg)
         return error_response(error_msg)
     finally:
         file.file.close()
@@ -0,0 +1,80 @@
+"""
+单请求日志开销基准测试
+
+模拟一个内部接口请求产生的日志: 一条DEBUG(生产环境被过滤)和两条INFO，对比:
+    1. 开发模式: 文本格式，DEBUG级别
+    2. 生产模式: JSON行，INFO级别
+    3. 生产模式下仍使用f-string(被过滤的DEBUG日志也会先格式化消息)
+
+控制台输出重定向到 /dev/null，文件写入临时目录，测得的是调用方线程的开销
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_logging [--number 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from config import config
+from core.loguru import logger, setup_logger
+
+
+class _LoginData:
+    username = "admin"
+    password = "secret"
+
+
+def _lazy_request(data, path: str, elapsed: float) -> None:
+    logger.debug("用户尝试登录: {}", data.username)
+    logger.info("开始请求: {} {}", "POST", path)
+    logger.info("完成请求: {} {} - 状态码: {} - 处理时间: {:.2f}ms", "POST", path, 200, elapsed)
+
+
+def _eager_request(data, path: str, elapsed: float) -> None:
+    logger.debug(f"用户尝试登录: {data.username}")
+    logger.info(f"开始请求: {'POST'} {path}")
+    logger.info(f"完成请求: {'POST'} {path} - 状态码: {200} - 处理时间: {elapsed:.2f}ms")
+
+
+def _bench(name: str, func, number: int) -> None:
+    data = _LoginData()
+    path = "/api/internal/users/login"
+    func(data, path, 1.23)  # 预热
+    start = time.perf_counter()
+    for _ in range(number):
+        func(data, path, 1.23)
+    elapsed = time.perf_counter() - start
+    logger.complete()
+    print(f"{name:<40} {number / elapsed:>10,.0f} req/s {elapsed / number * 1e6:>8.2f} us/req", file=sys.__stdout__)
+
+
+def _configure(log_dir: Path, json_mode: bool) -> None:
+    config.LOG_DIR = log_dir
+    config.LOG_JSON = json_mode
+    config.DEBUG = not json_mode
+    config.LOG_LEVEL = "INFO" if json_mode else "DEBUG"
+    setup_logger()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="单请求日志开销基准测试")
+    parser.add_argument("--number", type=int, default=20000, help="模拟的请求数")
+    args = parser.parse_args()
+
+    print(f"请求数: {args.number}", file=sys.__stdout__)
+    sys.stderr = open(os.devnull, "w")
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure(Path(tmp) / "dev", json_mode=False)
+        _bench("开发模式 (文本, DEBUG)", _lazy_request, args.number)
+
+        _configure(Path(tmp) / "prod", json_mode=True)
+        _bench("生产模式 (JSON, INFO)", _lazy_request, args.number)
+        _bench("生产模式 + f-string", _eager_request, args.number)
+        logger.remove()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+日志中间件单请求开销基准测试
+
+直接以ASGI调用驱动应用(不经过网络和HTTP客户端)，对比:
+    1. 无中间件
+    2. BaseHTTPMiddleware 直通 (改造前 app.middleware("http") 的最低开销)
+    3. InternalRequestLogMiddleware
+
+分别测试非内部路径(应直接透传)和内部路径(记录日志)
+日志处理器已移除，测得的是中间件本身的开销，不含日志落盘
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_middleware [--number 20000]
+"""
+import argparse
+import asyncio
+import time
+
+from loguru import logger
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from middleware.logger_middleware import InternalRequestLogMiddleware
+
+
+async def _endpoint(request):
+    return PlainTextResponse("ok")
+
+
+async def _passthrough(request, call_next):
+    return await call_next(request)
+
+
+def _build_app(middleware):
+    routes = [
+        Route("/api/public/ping", _endpoint),
+        Route("/api/internal/ping", _endpoint),
+    ]
+    return Starlette(routes=routes, middleware=middleware)
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+
+
+async def _request(app, path: str) -> None:
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # 与真实服务器一致: 请求体读完后，直到客户端断开前不再有消息
+        await asyncio.Event().wait()
+
+    async def send(message):
+        pass
+
+    await app(_scope(path), receive, send)
+
+
+async def _bench(name: str, app, path: str, number: int) -> None:
+    await _request(app, path)  # 预热
+    start = time.perf_counter()
+    for _ in range(number):
+        await _request(app, path)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<50} {number / elapsed:>10,.0f} req/s {elapsed / number * 1e6:>8.2f} us/req")
+
+
+async def _run(number: int) -> None:
+    apps = {
+        "无中间件": _build_app([]),
+        "BaseHTTPMiddleware 直通 (改造前)": _build_app([Middleware(BaseHTTPMiddleware, dispatch=_passthrough)]),
+        "InternalRequestLogMiddleware": _build_app([Middleware(InternalRequestLogMiddleware)]),
+    }
+    for path in ("/api/public/ping", "/api/internal/ping"):
+        print(f"\n路径: {path}")
+        for name, app in apps.items():
+            await _bench(name, app, path, number)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="日志中间件单请求开销基准测试")
+    parser.add_argument("--number", type=int, default=20000, help="每项测试的请求数")
+    args = parser.parse_args()
+
+    # 只测量中间件本身，不测量日志输出
+    logger.remove()
+    print(f"请求数: {args.number}")
+    asyncio.run(_run(args.number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+分页接口单页开销基准测试
+
+使用内存SQLite，对比 get_user_list 一页数据的两种处理方式:
+    1. 改造前: 查询完整的 User 行(含密码哈希、备注、时间戳)，逐行 model_validate
+    2. paginate_tortoise: 按 UserListItem 的字段只查询需要的列，model_construct 构造
+    3. paginate_tortoise + fields=id,username 稀疏字段集
+
+测得的是查询加转换的耗时和序列化后的响应体大小，不含网络和HTTP开销
+
+运行方式 (在项目根目录):
+    python -m benchmarks.bench_pagination [--rows 5000] [--page-size 100] [--number 200]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from tortoise import Tortoise
+
+from common.pagination import PageInfo, PaginationResponse, paginate_tortoise
+from model.user import User
+from schemas.internal.user import UserListItem
+
+
+async def _legacy_page(page_size: int) -> PaginationResponse:
+    db_items = await User.all().offset(page_size).limit(page_size)
+    items = [UserListItem.model_validate(item, from_attributes=True) for item in db_items]
+    return PaginationResponse(items=items, page_info=PageInfo(page=2, page_size=page_size))
+
+
+async def _projected_page(page_size: int, fields=None) -> PaginationResponse:
+    return await paginate_tortoise(
+        User.all(), page=2, page_size=page_size, schema_model=UserListItem,
+        count_strategy="has_more", fields=fields
+    )
+
+
+async def _bench(name: str, func, number: int) -> None:
+    result = await func()  # 预热
+    payload = len(json.dumps(jsonable_encoder(result), ensure_ascii=False).encode("utf-8"))
+    start = time.perf_counter()
+    for _ in range(number):
+        await func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {elapsed / number * 1e3:>8.3f} ms/page {payload:>8} bytes")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="分页接口单页开销基准测试")
+    parser.add_argument("--rows", type=int, default=5000, help="用户表行数")
+    parser.add_argument("--page-size", type=int, default=100, help="每页条数")
+    parser.add_argument("--number", type=int, default=200, help="每种方式的查询次数")
+    args = parser.parse_args()
+
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["model.user", "model.operation_log"]})
+    await Tortoise.generate_schemas()
+    await User.bulk_create([
+        User(
+            username=f"user{i}",
+            password="$2b$12$" + "x" * 53,
+            nickname=f"昵称{i}",
+            user_email=f"user{i}@example.com",
+            user_phone=f"138{i:08d}",
+            remarks="备注" * 50,
+        )
+        for i in range(args.rows)
+    ])
+
+    print(f"行数: {args.rows}  每页: {args.page_size}  次数: {args.number}")
+    await _bench("完整行 + model_validate", lambda: _legacy_page(args.page_size), args.number)
+    await _bench("列投影 + model_construct", lambda: _projected_page(args.page_size), args.number)
+    await _bench("列投影 + fields=id,username", lambda: _projected_page(args.page_size, ["id", "username"]), args.number)
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+用户列表子串/模糊搜索基准测试 (需要PostgreSQL)
+
+在配置的数据库中创建与 user 表搜索列相同的合成表 bench_user_search，写入 --rows 行数据后对比:
+    1. contains:   CAST(col AS VARCHAR) LIKE '%kw%'           (Tortoise 默认的 __contains)
+    2. upper-like: UPPER(CAST(col AS VARCHAR)) LIKE UPPER(...)  (Tortoise 默认的 __icontains)
+    3. ilike:      CAST(col AS VARCHAR) ILIKE '%kw%'          (database.asyncpg_backend 的 __icontains)
+    4. fuzzy:      kw <% col OR ... 按 WORD_SIMILARITY 排序取前20条 (common.search.fuzzy_search)
+每种查询先在只有btree索引时执行，再建立 gin_trgm_ops 索引后执行，输出 EXPLAIN ANALYZE 的执行时间
+
+运行方式 (在项目根目录，数据库连接取自 .env / TORTOISE_ORM.py):
+    python -m benchmarks.bench_user_search [--rows 2000000] [--repeat 5] [--keep]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+
+from tortoise import Tortoise
+
+from config import config
+
+TABLE = "bench_user_search"
+COLUMNS = ("username", "nickname", "user_phone", "user_email")
+
+QUERIES = {
+    "contains": "SELECT id FROM {table} WHERE CAST(username AS VARCHAR) LIKE '%{kw}%' LIMIT 20",
+    "upper-like": "SELECT id FROM {table} WHERE UPPER(CAST(username AS VARCHAR)) LIKE UPPER('%{kw}%') LIMIT 20",
+    "ilike": "SELECT id FROM {table} WHERE CAST(username AS VARCHAR) ILIKE '%{kw}%' LIMIT 20",
+    "ilike-count": "SELECT COUNT(*) FROM {table} WHERE CAST(user_email AS VARCHAR) ILIKE '%{kw}%'",
+    "fuzzy": (
+        "SELECT id FROM {table} WHERE ("
+        + " OR ".join(f"'{{kw}}' <% {column}" for column in COLUMNS)
+        + ") ORDER BY GREATEST("
+        + ",".join(f"WORD_SIMILARITY('{{kw}}', {column})" for column in COLUMNS)
+        + ") DESC, id LIMIT 20"
+    ),
+}
+
+
+async def _populate(conn, rows: int) -> None:
+    await conn.execute_script(f"""
+        DROP TABLE IF EXISTS {TABLE};
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(20) NOT NULL UNIQUE,
+            nickname VARCHAR(20),
+            user_phone VARCHAR(11) UNIQUE,
+            user_email VARCHAR(255) UNIQUE
+        );
+        INSERT INTO {TABLE} (username, nickname, user_phone, user_email)
+        SELECT
+            'u' || md5(i::text)::varchar(12),
+            '昵称' || (i % 100000),
+            (13000000000 + i)::text,
+            'user' || i || '@' || (ARRAY['example.com', 'mail.test', 'corp.local'])[1 + i % 3]
+        FROM generate_series(1, {rows}) AS s(i);
+        ANALYZE {TABLE};
+    """)
+
+
+async def _explain(conn, sql: str) -> float:
+    _, rows = await conn.execute_query(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+    plan = rows[0]["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"]
+
+
+async def _run(conn, label: str, keyword: str, repeat: int) -> None:
+    print(f"-- {label}")
+    for name, template in QUERIES.items():
+        sql = template.format(table=TABLE, kw=keyword)
+        timings = [await _explain(conn, sql) for _ in range(repeat)]
+        print(f"{name:<14} {statistics.median(timings):>10.2f} ms (中位数, {repeat} 次)")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="用户列表子串/模糊搜索基准测试")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="合成表行数")
+    parser.add_argument("--keyword", default="a3f9", help="搜索关键词")
+    parser.add_argument("--repeat", type=int, default=5, help="每条查询的执行次数")
+    parser.add_argument("--keep", action="store_true", help="结束后保留合成表")
+    args = parser.parse_args()
+
+    await Tortoise.init(config=config.DATABASE_CONFIG)
+    conn = Tortoise.get_connection("default")
+    try:
+        print(f"写入 {args.rows} 行...")
+        await _populate(conn, args.rows)
+        await _run(conn, "仅btree索引", args.keyword, args.repeat)
+
+        await conn.execute_script("CREATE EXTENSION IF NOT EXISTS pg_trgm;" + "".join(
+            f"CREATE INDEX ON {TABLE} USING GIN ({column} gin_trgm_ops);" for column in COLUMNS
+        ) + f"ANALYZE {TABLE};")
+        await _run(conn, "gin_trgm_ops 索引", args.keyword, args.repeat)
+    finally:
+        if not args.keep:
+            await conn.execute_script(f"DROP TABLE IF EXISTS {TABLE}")
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
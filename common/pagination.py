@@ -1,10 +1,23 @@
-from typing import TypeVar, Generic, List, Optional, Dict, Any, Callable, Union
+from typing import TypeVar, Generic, List, Optional, Dict, Any, Callable, Union, Tuple
 from tortoise.models import Model
 from tortoise.queryset import QuerySet
 from tortoise.expressions import Q
 from pydantic import BaseModel
 from math import ceil
 from fastapi import Query
+import asyncio
+import base64
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+from pypika.enums import Order
+from core.Exception import ValidationException
+from core.cache import TTLCache
+from common.tortoise_compat import query_set_db, query_set_orderings
+from config import config
 
 T = TypeVar('T')
 M = TypeVar('M', bound=Model)
@@ -20,11 +33,40 @@ class PageInfo(BaseModel):
         page: 当前页码
         page_size: 每页记录数
         total_pages: 总页数
+        next_cursor: 游标分页时下一页的游标，没有下一页时为None
+        prev_cursor: 游标分页时上一页的游标，没有上一页时为None
+        has_more: 是否还有下一页，使用 has_more 计数策略或游标分页时返回
+        estimated: total 是否为估算值
     """
     total: Optional[int] = None
     page: int = 1
     page_size: int = 10
     total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    has_more: Optional[bool] = None
+    estimated: bool = False
+
+
+class CountStrategy:
+    """
+    页码分页的总数统计策略
+        - EXACT: 精确 COUNT(*)，与分页查询并发执行
+        - ESTIMATED: 使用PostgreSQL规划器的行数估算，估算值较小时回退到精确统计
+        - CACHED: 精确统计结果按过滤条件缓存 PAGINATION_COUNT_CACHE_TTL 秒
+        - HAS_MORE: 不统计总数，多取一行判断是否有下一页
+    """
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    CACHED = "cached"
+    HAS_MORE = "has_more"
+
+
+# 总数缓存: 计数SQL的摘要 -> 总数
+count_cache = TTLCache(
+    maxsize=config.PAGINATION_COUNT_CACHE_MAXSIZE,
+    ttl=config.PAGINATION_COUNT_CACHE_TTL
+)
 
 
 class PaginationResponse(BaseModel, Generic[T]):
@@ -48,11 +90,17 @@ async def paginate_tortoise(
     page_size: int = 10,
     schema_model: Optional[type[S]] = None,
     transform_func: Optional[Callable[[M], Any]] = None,
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = None,
+    cursor: Optional[str] = None,
+    keyset: bool = False,
+    count_strategy: str = CountStrategy.EXACT,
+    fields: Optional[List[str]] = None
 ) -> PaginationResponse:
     """
     对Tortoise ORM的查询集进行分页处理
     
+    指定 schema_model 且其字段都是模型的列时，只查询这些列并跳过校验直接构造响应对象
+    
     Args:
         query_set: Tortoise ORM查询集
         page: 页码, 默认为1
@@ -60,60 +108,325 @@ async def paginate_tortoise(
         schema_model: 用于转换数据的Pydantic模型
         transform_func: 自定义的数据转换函数
         filters: 过滤条件字典
+        cursor: 游标分页时上一次返回的 next_cursor/prev_cursor，为空时返回第一页
+        keyset: 为True时使用游标(键集)分页，忽略page且不统计总数
+        count_strategy: 页码分页的总数统计策略，见 CountStrategy
+        fields: 只返回这些字段(客户端稀疏字段集)，必须是 schema_model 的字段
         
     Returns:
         PaginationResponse: 包含分页数据和分页信息的响应对象
+        
+    Raises:
+        ValidationException: fields 中包含 schema_model 没有的字段时抛出
     """
+    projection = _Projection(query_set.model, schema_model, transform_func, fields)
+    
     # 应用过滤条件
     if filters:
         filter_conditions = build_tortoise_filters(filters)
         if filter_conditions:
             query_set = query_set.filter(filter_conditions)
     
-    # 计算总记录数
-    total = await query_set.count()
-    total_pages = ceil(total / page_size) if total > 0 else 1
+    if keyset:
+        return await _paginate_keyset(query_set, cursor, page_size, projection)
     
-    # 纠正页码
     if page < 1:
         page = 1
+    
+    if count_strategy == CountStrategy.HAS_MORE:
+        # 不统计总数，多取一行判断是否有下一页
+        db_items = list(await projection.fetch(query_set.offset((page - 1) * page_size).limit(page_size + 1)))
+        has_more = len(db_items) > page_size
+        items = projection.convert(db_items[:page_size])
+        page_info = PageInfo(page=page, page_size=page_size, has_more=has_more)
+        return PaginationResponse(items=items, page_info=page_info)
+    
+    # 计算总记录数，估算值和缓存值直接取得；精确统计与分页查询并发执行
+    total, estimated, db_items = None, False, None
+    if count_strategy == CountStrategy.ESTIMATED:
+        total = await _estimate_count(query_set)
+        estimated = total is not None
+    elif count_strategy == CountStrategy.CACHED:
+        total = count_cache.get(_count_cache_key(query_set))
+    elif count_strategy != CountStrategy.EXACT:
+        raise ValueError(f"未知的计数策略: {count_strategy}")
+    
+    if total is None:
+        total, db_items = await asyncio.gather(
+            query_set.count(),
+            projection.fetch(query_set.offset((page - 1) * page_size).limit(page_size))
+        )
+        if count_strategy == CountStrategy.CACHED:
+            count_cache.set(_count_cache_key(query_set), total)
+    
+    total_pages = ceil(total / page_size) if total > 0 else 1
+    
+    # 纠正页码，超出末页时需要重新查询末页
     if page > total_pages and total > 0:
         page = total_pages
-    
-    # 应用分页
-    offset = (page - 1) * page_size
-    query_set = query_set.offset(offset).limit(page_size)
+        db_items = None
     
     # 获取数据
-    db_items = await query_set
+    if db_items is None:
+        db_items = await projection.fetch(query_set.offset((page - 1) * page_size).limit(page_size))
     
     # 转换数据
-    if transform_func:
-        items = [transform_func(item) for item in db_items]
-    elif schema_model:
-        items = [schema_model.model_validate(item, from_attributes=True) for item in db_items]
-    else:
-        items = db_items
+    items = projection.convert(db_items)
     
     # 创建分页信息
     page_info = PageInfo(
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        estimated=estimated
     )
     
     # 返回分页响应
     return PaginationResponse(items=items, page_info=page_info)
 
 
+def _count_cache_key(query_set: QuerySet[M]) -> str:
+    """以计数SQL的摘要作为缓存键，相同的表和过滤条件得到相同的键"""
+    sql = query_set.count().sql()
+    return hashlib.blake2b(sql.encode("utf-8"), digest_size=16).hexdigest()
+
+
+async def _estimate_count(query_set: QuerySet[M]) -> Optional[int]:
+    """
+    使用PostgreSQL规划器估算查询的行数 (EXPLAIN 不执行查询)
+    估算依赖表的统计信息(ANALYZE)，误差可能较大，仅适合展示"约N条"
+    
+    Returns:
+        Optional[int]: 估算行数；非PostgreSQL、估算失败或估算值小于
+                       PAGINATION_ESTIMATE_EXACT_BELOW 时返回None，由调用方精确统计
+    """
+    db = query_set_db(query_set)
+    if db.capabilities.dialect != "postgres":
+        return None
+    try:
+        _, rows = await db.execute_query(f"EXPLAIN (FORMAT JSON) {query_set.sql()}")
+        plan = rows[0]["QUERY PLAN"]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        return None
+    # 小结果集的估算误差相对更大，而精确统计本身很便宜
+    if estimate < config.PAGINATION_ESTIMATE_EXACT_BELOW:
+        return None
+    return estimate
+
+
+class _Projection:
+    """
+    根据目标schema决定查询哪些列以及如何构造响应数据
+        - 有 transform_func: 查询完整的模型对象，交给 transform_func 转换
+        - schema 的字段都是模型的列: 通过 .values() 只查询这些列，
+          用 model_construct 构造(数据来自数据库，不需要再次校验)；
+          指定 fields 时直接返回只含这些字段的字典
+        - 其他情况: 查询完整的模型对象并逐行 model_validate
+    """
+
+    def __init__(
+        self,
+        model: type[M],
+        schema_model: Optional[type[S]],
+        transform_func: Optional[Callable[[M], Any]],
+        fields: Optional[List[str]]
+    ):
+        self.schema_model = schema_model
+        self.transform_func = transform_func
+        self.fields = None
+        self.columns = None
+        if fields:
+            if schema_model is None:
+                raise ValueError("指定 fields 时必须提供 schema_model")
+            unknown = [name for name in fields if name not in schema_model.model_fields]
+            if unknown:
+                raise ValidationException(detail=f"不支持的字段: {', '.join(unknown)}")
+            # 按schema中的顺序去重
+            self.fields = [name for name in schema_model.model_fields if name in fields]
+        if schema_model is None or transform_func is not None:
+            return
+        schema_fields = list(schema_model.model_fields)
+        if all(name in model._meta.db_fields for name in schema_fields):
+            self.columns = self.fields or schema_fields
+
+    def fetch(self, query_set: QuerySet[M], extra_columns: Optional[List[str]] = None):
+        """
+        返回最终执行的查询
+        
+        Args:
+            query_set: 已排序、分页的查询集
+            extra_columns: 除输出字段外还需要查询的列，如游标分页的排序字段
+        """
+        if self.columns is None:
+            return query_set
+        columns = list(self.columns)
+        for name in extra_columns or ():
+            if name not in columns:
+                columns.append(name)
+        return query_set.values(*columns)
+
+    def convert(self, db_items: List[Any]) -> List[Any]:
+        """将查询结果转换为响应数据"""
+        if self.transform_func:
+            return [self.transform_func(item) for item in db_items]
+        if self.schema_model is None:
+            return db_items
+        if self.columns is not None:
+            columns = self.columns
+            if self.fields:
+                return [{name: row[name] for name in columns} for row in db_items]
+            construct = self.schema_model.model_construct
+            return [construct(**{name: row[name] for name in columns}) for row in db_items]
+        items = [self.schema_model.model_validate(item, from_attributes=True) for item in db_items]
+        if self.fields:
+            include = set(self.fields)
+            return [item.model_dump(include=include) for item in items]
+        return items
+
+
+# 游标中记录的翻页方向
+_CURSOR_NEXT = "n"
+_CURSOR_PREV = "p"
+
+
+def _keyset_orderings(query_set: QuerySet[M]) -> List[Tuple[str, Order]]:
+    """
+    获取游标分页使用的排序字段
+    优先使用查询集上的 order_by，其次是模型 Meta.ordering，最后追加主键保证排序唯一
+    排序字段必须是模型自身的非空字段
+    """
+    orderings = query_set_orderings(query_set) or list(query_set.model._meta.ordering)
+    pk_attr = query_set.model._meta.pk_attr
+    if not any(name == pk_attr for name, _ in orderings):
+        orderings.append((pk_attr, Order.asc))
+    return orderings
+
+
+def _keyset_condition(orderings: List[Tuple[str, Order]], values: List[Any], forward: bool) -> Q:
+    """
+    构建"排在游标之后"的条件，支持多列和混合升降序，例如 (a desc, id asc):
+        a < va OR (a = va AND id > vid)
+    另加首列的闭区间条件，便于规划器直接在索引上定位起点
+    """
+    condition = None
+    for index, (name, order) in enumerate(orderings):
+        ascending = (order == Order.asc) == forward
+        term = Q(**{f"{name}__{'gt' if ascending else 'lt'}": values[index]})
+        for prev_name, prev_value in zip([n for n, _ in orderings[:index]], values[:index]):
+            term &= Q(**{prev_name: prev_value})
+        condition = term if condition is None else condition | term
+    first_name, first_order = orderings[0]
+    first_ascending = (first_order == Order.asc) == forward
+    bound = Q(**{f"{first_name}__{'gte' if first_ascending else 'lte'}": values[0]})
+    return bound & condition
+
+
+def _to_cursor_value(value: Any) -> Any:
+    """将排序字段的值转换为可JSON序列化的形式"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def _make_cursor(direction: str, item: Union[M, dict], names: List[str]) -> str:
+    if isinstance(item, dict):
+        values = [item[name] for name in names]
+    else:
+        values = [getattr(item, name) for name in names]
+    return encode_cursor([direction] + [_to_cursor_value(value) for value in values])
+
+
+def _parse_cursor(cursor: str, model: type[M], names: List[str]) -> Tuple[bool, List[Any]]:
+    """
+    解析游标
+    
+    Returns:
+        Tuple[bool, List[Any]]: (是否向后翻页, 按字段类型还原的排序键)
+        
+    Raises:
+        ValidationException: 游标格式错误或与当前排序不匹配时抛出
+    """
+    decoded = decode_cursor(cursor, len(names) + 1)
+    direction, raw_values = decoded[0], decoded[1:]
+    if direction not in (_CURSOR_NEXT, _CURSOR_PREV):
+        raise ValidationException(detail="无效的分页游标")
+    values = []
+    try:
+        for name, raw in zip(names, raw_values):
+            field = model._meta.fields_map.get(name)
+            values.append(field.to_python_value(raw) if field is not None else raw)
+    except (TypeError, ValueError):
+        raise ValidationException(detail="无效的分页游标")
+    return direction == _CURSOR_NEXT, values
+
+
+async def _paginate_keyset(
+    query_set: QuerySet[M],
+    cursor: Optional[str],
+    page_size: int,
+    projection: _Projection
+) -> PaginationResponse:
+    """
+    游标(键集)分页
+    按最后一行的排序键定位下一页，任意深度的翻页只读取 page_size + 1 行
+    """
+    orderings = _keyset_orderings(query_set)
+    names = [name for name, _ in orderings]
+    
+    forward = True
+    if cursor:
+        forward, values = _parse_cursor(cursor, query_set.model, names)
+        query_set = query_set.filter(_keyset_condition(orderings, values, forward))
+    
+    # 向前翻页时反转排序取游标之前的行，取出后再恢复原顺序
+    order_by = []
+    for name, order in orderings:
+        descending = (order == Order.desc) == forward
+        order_by.append(f"-{name}" if descending else name)
+    
+    # 多取一行判断是否还有更多数据
+    db_items = list(await projection.fetch(query_set.order_by(*order_by).limit(page_size + 1), names))
+    has_more = len(db_items) > page_size
+    db_items = db_items[:page_size]
+    if not forward:
+        db_items.reverse()
+    
+    next_cursor = prev_cursor = None
+    if db_items:
+        if has_more or not forward:
+            next_cursor = _make_cursor(_CURSOR_NEXT, db_items[-1], names)
+        if (has_more and not forward) or (forward and cursor):
+            prev_cursor = _make_cursor(_CURSOR_PREV, db_items[0], names)
+    
+    page_info = PageInfo(
+        page_size=page_size,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        has_more=next_cursor is not None
+    )
+    items = projection.convert(db_items)
+    return PaginationResponse(items=items, page_info=page_info)
+
+
 async def get_paginated_response(
     query_set: QuerySet[M],
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页记录数"),
     schema_model: Optional[type[S]] = None,
     transform_func: Optional[Callable[[M], Any]] = None,
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = None,
+    cursor: Optional[str] = Query(None, description="游标分页的游标"),
+    keyset: bool = False,
+    count_strategy: str = CountStrategy.EXACT,
+    fields: Optional[List[str]] = None
 ) -> PaginationResponse:
     """
     获取分页响应的便捷函数，可直接在路由处理器中使用
@@ -125,9 +438,16 @@ async def get_paginated_response(
         schema_model: 用于转换数据的Pydantic模型
         transform_func: 自定义的数据转换函数
         filters: 过滤条件字典
+        cursor: 游标分页的游标
+        keyset: 是否使用游标分页
+        count_strategy: 总数统计策略
+        fields: 只返回这些字段(客户端稀疏字段集)，可由 parse_fields 解析查询参数得到
         
     Returns:
         PaginationResponse: 包含分页数据和分页信息的响应对象
+        
+    Raises:
+        ValidationException: fields 中包含 schema_model 没有的字段时抛出
     """
     return await paginate_tortoise(
         query_set=query_set,
@@ -135,10 +455,65 @@ async def get_paginated_response(
         page_size=page_size,
         schema_model=schema_model,
         transform_func=transform_func,
-        filters=filters
+        filters=filters,
+        cursor=cursor,
+        keyset=keyset,
+        count_strategy=count_strategy,
+        fields=fields
     )
 
 
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    解析逗号分隔的稀疏字段集参数，如 "id,username"
+    
+    Returns:
+        Optional[List[str]]: 字段名列表，参数为空时返回None
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    return names or None
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    将最后一行的排序键编码为不透明游标
+    
+    Args:
+        values: 排序键的值列表，需可JSON序列化(日期时间需先转为ISO字符串)
+        
+    Returns:
+        str: URL安全的base64游标
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> List[Any]:
+    """
+    解码游标
+    
+    Args:
+        cursor: encode_cursor 生成的游标
+        length: 排序键的个数
+        
+    Returns:
+        List[Any]: 排序键的值列表
+        
+    Raises:
+        ValidationException: 游标格式错误时抛出
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValidationException(detail="无效的分页游标")
+    if not isinstance(values, list) or len(values) != length:
+        raise ValidationException(detail="无效的分页游标")
+    return values
+
+
 def build_tortoise_filters(filters: Dict[str, Any]) -> Optional[Q]:
     """
     根据字典构建Tortoise ORM的过滤条件
@@ -147,6 +522,8 @@ def build_tortoise_filters(filters: Dict[str, Any]) -> Optional[Q]:
         filters: 过滤条件字典，格式为 {field__operator: value}
                 支持的操作符: eq, ne, gt, gte, lt, lte, in, not_in, contains, icontains,
                               startswith, istartswith, endswith, iendswith, isnull
+                在 database.asyncpg_backend 后端上 icontains/istartswith/iendswith 生成 ILIKE，
+                可以使用 gin_trgm_ops 索引；关键词相似度搜索见 common.search.fuzzy_search
                 
     Returns:
         Optional[Q]: Tortoise ORM的Q对象过滤条件
@@ -155,7 +532,8 @@ def build_tortoise_filters(filters: Dict[str, Any]) -> Optional[Q]:
         return None
     
     q_filters = Q()
-    for key, value in filters.items():
+    # 按键排序，相同的过滤条件总是生成相同的SQL(计数缓存以SQL为键)
+    for key, value in sorted(filters.items()):
         # 忽略None值的过滤条件，除非操作符是isnull
         if value is None and not key.endswith('__isnull'):
             continue
@@ -0,0 +1,89 @@
+from typing import List, Optional, Sequence
+
+from pypika.enums import Comparator
+from pypika.terms import BasicCriterion, Bracket, Field as PypikaField, Function as PypikaFunction, ValueWrapper
+from tortoise.expressions import Function, Q
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+from common.tortoise_compat import query_set_db
+
+# 短于三个字符的关键词没有完整的三元组，相似度没有意义，改用包含匹配
+MIN_TRIGRAM_TERM_LENGTH = 3
+
+
+class _TrigramComparator(Comparator):  # type: ignore
+    word_similar = " <% "
+
+
+class _WordSimilarity(PypikaFunction):  # type: ignore
+    def __init__(self, term: str, column: PypikaField):
+        super().__init__("WORD_SIMILARITY", ValueWrapper(term), column)
+
+
+class _Greatest(PypikaFunction):  # type: ignore
+    def __init__(self, *terms):
+        super().__init__("GREATEST", *terms)
+
+
+class _MultiColumnFunction(Function):
+    """作用于同一张表多个列的表达式，列名在构造时给出"""
+
+    def __init__(self, columns: Sequence[str], term: str):
+        super().__init__(columns[0], term)
+        self.columns = list(columns)
+
+    def _column_terms(self, field: PypikaField) -> List[PypikaField]:
+        return [PypikaField(column, table=field.table) for column in self.columns]
+
+
+class TrigramMatch(_MultiColumnFunction):
+    """
+    term <% 列: 任一列与关键词的词相似度超过 pg_trgm.word_similarity_threshold (默认0.6)
+    该运算符可以使用 gin_trgm_ops 索引，多列之间由规划器合并为 BitmapOr
+    """
+
+    def _get_function_field(self, field: PypikaField, term: str):
+        criterion = None
+        for column in self._column_terms(field):
+            match = BasicCriterion(_TrigramComparator.word_similar, ValueWrapper(term), column)
+            criterion = match if criterion is None else criterion | match
+        # 加括号，避免与过滤时追加的 "= true" 以及其他条件的优先级混淆
+        return Bracket(criterion)
+
+
+class TrigramRank(_MultiColumnFunction):
+    """各列词相似度的最大值，用于排序；NULL列被 GREATEST 忽略"""
+
+    def _get_function_field(self, field: PypikaField, term: str):
+        return _Greatest(*[_WordSimilarity(term, column) for column in self._column_terms(field)])
+
+
+def fuzzy_search(query_set: QuerySet, term: str, fields: Sequence[str]) -> QuerySet:
+    """
+    按关键词在多个字符串字段中模糊搜索
+        - PostgreSQL且关键词不短于 MIN_TRIGRAM_TERM_LENGTH: pg_trgm 词相似度匹配，
+          按相似度(search_rank)降序、主键升序排序
+        - 其他情况: 任一字段不区分大小写包含关键词，保持原有排序
+    
+    Args:
+        query_set: 查询集
+        term: 搜索关键词
+        fields: 参与搜索的字段，需建有 gin_trgm_ops 索引
+        
+    Returns:
+        QuerySet: 过滤并排序后的查询集
+    """
+    term = term.strip()
+    model: type[Model] = query_set.model
+    db = query_set_db(query_set)
+    if db.capabilities.dialect != "postgres" or len(term) < MIN_TRIGRAM_TERM_LENGTH:
+        return query_set.filter(Q(*[Q(**{f"{name}__icontains": term}) for name in fields], join_type="OR"))
+
+    columns = [model._meta.fields_db_projection[name] for name in fields]
+    return (
+        query_set
+        .annotate(search_match=TrigramMatch(columns, term), search_rank=TrigramRank(columns, term))
+        .filter(search_match=True)
+        .order_by("-search_rank", model._meta.pk_attr)
+    )
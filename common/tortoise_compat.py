@@ -0,0 +1,52 @@
+"""
+Tortoise ORM 私有API的集中封装
+
+分页与搜索需要的部分信息 Tortoise 没有公开接口，统一在此访问，升级 Tortoise 时只需复查本模块。
+已验证的版本为 TESTED_TORTOISE_VERSION (requirements.txt 锁定 tortoise-orm<0.22)，
+版本不一致时启动时记录警告，测试 test_tortoise_compat 会失败以提示复查。
+"""
+from typing import List, Tuple
+
+import tortoise
+from pypika.enums import Order
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.queryset import QuerySet
+
+from core.loguru import logger
+
+# 已验证私有API可用的 Tortoise 主次版本
+TESTED_TORTOISE_VERSION = (0, 21)
+TORTOISE_VERSION = tuple(int(part) for part in tortoise.__version__.split(".")[:2])
+
+if TORTOISE_VERSION != TESTED_TORTOISE_VERSION:
+    logger.warning(
+        "Tortoise ORM 版本 {} 未经验证(已验证 {}.{}.x)，请复查 common/tortoise_compat.py",
+        tortoise.__version__, *TESTED_TORTOISE_VERSION
+    )
+
+
+def query_set_db(query_set: QuerySet) -> BaseDBAsyncClient:
+    """
+    返回查询集实际使用的数据库连接 (考虑 using_db 和读写路由)
+
+    依赖私有方法 QuerySet._choose_db，不存在时回退到模型的默认连接
+    """
+    choose_db = getattr(query_set, "_choose_db", None)
+    if choose_db is None:
+        return query_set.model._meta.db
+    return choose_db()
+
+
+def query_set_orderings(query_set: QuerySet) -> List[Tuple[str, Order]]:
+    """
+    返回查询集上通过 order_by 指定的排序 [(字段名, 方向)]，未指定时为空列表
+
+    依赖私有属性 QuerySet._orderings，不存在时抛出 RuntimeError，避免游标分页静默使用错误的排序
+    """
+    try:
+        orderings = query_set._orderings
+    except AttributeError:
+        raise RuntimeError(
+            f"Tortoise ORM {tortoise.__version__} 的 QuerySet 没有 _orderings，请更新 common/tortoise_compat.py"
+        ) from None
+    return list(orderings)
@@ -22,14 +22,121 @@ class Config:
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 1280))
     ACCESS_TOKEN_EXPIRE = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # JWT编解码后端: jose(默认，兼容全部算法) / hmac(标准库实现，仅HS256/384/512，更快)
+    JWT_BACKEND = os.getenv("JWT_BACKEND", "jose").lower()
+    # 已验证Token缓存，条目在token过期时失效；TOKEN_CACHE_TTL仅用于没有exp声明的token
+    TOKEN_CACHE_MAXSIZE = int(os.getenv("TOKEN_CACHE_MAXSIZE", 10000))
+    TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 300))
+
+    # 认证主体缓存配置 (user_id -> 用户状态/类型)
+    PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 30))
+    PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", 10000))
+
+    # 令牌吊销过滤器配置
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", 10000))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", 0.01))
+    # 从数据库重建过滤器的间隔(秒)，即其他worker中的禁用/删除操作在本进程生效的最长延迟；
+    # 每个worker每次刷新都会查询 user 表(吊销用户 + 主键COUNT，有删除时全表窗口扫描)，
+    # 用户量大、worker多时不宜设得过小；普通接口的禁用/降级最多滞后该时间(管理员接口见 core/auth.py)
+    REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", 10))
+
+    # bcrypt成本参数，可用 python -m utils.bcrypt_calibration 在部署机器上校准
+    # 修改后旧哈希会在用户下次登录成功时自动重新哈希
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+    # 密码哈希进程池配置
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    # 排队+执行中的哈希任务上限，超过后直接返回503
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+
+    # 登录限流配置 (按用户名和客户端IP分别计算)
+    LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", 5))
+    LOGIN_USER_REFILL_SECONDS = float(os.getenv("LOGIN_USER_REFILL_SECONDS", 12))
+    LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 30))
+    LOGIN_IP_REFILL_SECONDS = float(os.getenv("LOGIN_IP_REFILL_SECONDS", 2))
+    # 连续失败超过该次数后开始渐进延迟
+    LOGIN_FREE_FAILURES = int(os.getenv("LOGIN_FREE_FAILURES", 3))
+    LOGIN_BASE_DELAY = float(os.getenv("LOGIN_BASE_DELAY", 1))
+    LOGIN_MAX_DELAY = float(os.getenv("LOGIN_MAX_DELAY", 60))
+    # 连续失败达到该次数后锁定
+    LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", 10))
+    LOGIN_LOCKOUT_SECONDS = float(os.getenv("LOGIN_LOCKOUT_SECONDS", 900))
+    LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", 100000))
+    # 受信任的反向代理IP/网段(逗号分隔)，来自这些地址的请求按 X-Forwarded-For 取客户端IP；
+    # 为空时使用TCP对端地址，部署在代理之后必须配置，否则所有用户共用代理的IP限流桶
+    TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
 
     # 日志配置
     LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
     LOG_DIR = Path(os.getenv("LOG_DIR", "logs"))
     LOG_RETENTION = os.getenv("LOG_RETENTION", "30 days")
     LOG_ROTATION = os.getenv("LOG_ROTATION", "00:00")
-    LOG_FORMAT = os.getenv("LOG_FORMAT", "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[request_id]} | {name}:{function}:{line} - {message}")
+    # 请求ID的请求/响应头，客户端或网关传入合法ID时沿用，否则生成新的ID
+    REQUEST_ID_HEADER = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
     LOG_COMPRESS = os.getenv("LOG_COMPRESS", "True").lower() == "true"
+    # 以紧凑JSON行输出日志(生产环境默认开启)
+    LOG_JSON = os.getenv("LOG_JSON", "False").lower() == "true"
+    # 异常堆栈扩展与局部变量诊断，开销大且diagnose可能把密码等局部变量写入日志，仅排查问题时开启
+    LOG_BACKTRACE = os.getenv("LOG_BACKTRACE", "False").lower() == "true"
+    LOG_DIAGNOSE = os.getenv("LOG_DIAGNOSE", "False").lower() == "true"
+    # 未处理异常按指纹聚合: 首次输出完整堆栈，重复出现时每隔该秒数最多输出一行汇总
+    ERROR_SUMMARY_INTERVAL = float(os.getenv("ERROR_SUMMARY_INTERVAL", 60))
+    ERROR_TRACKER_MAX_FINGERPRINTS = int(os.getenv("ERROR_TRACKER_MAX_FINGERPRINTS", 1000))
+
+    # 操作日志批量写入配置
+    OPLOG_BATCH_SIZE = int(os.getenv("OPLOG_BATCH_SIZE", 200))
+    OPLOG_FLUSH_INTERVAL = float(os.getenv("OPLOG_FLUSH_INTERVAL", 1.0))
+    # 内存队列上限，队列满时记录直接写入spool文件
+    OPLOG_MAX_QUEUE = int(os.getenv("OPLOG_MAX_QUEUE", 10000))
+    # 数据库不可用时的本地追加文件，恢复后按 OPLOG_REPLAY_INTERVAL 秒的间隔回放；
+    # 同一主机的多个worker共用该文件(文件锁保护)，无法写入的记录移入 <spool>.failed
+    OPLOG_SPOOL_PATH = Path(os.getenv("OPLOG_SPOOL_PATH", str(LOG_DIR / "operation_log.spool")))
+    OPLOG_REPLAY_INTERVAL = float(os.getenv("OPLOG_REPLAY_INTERVAL", 30))
+    OPLOG_SHUTDOWN_TIMEOUT = float(os.getenv("OPLOG_SHUTDOWN_TIMEOUT", 10))
+    # 操作日志导出: 每次从数据库预取的行数、每个响应块包含的行数
+    OPLOG_EXPORT_PREFETCH = int(os.getenv("OPLOG_EXPORT_PREFETCH", 1000))
+    OPLOG_EXPORT_CHUNK_ROWS = int(os.getenv("OPLOG_EXPORT_CHUNK_ROWS", 500))
+    # 每个worker同时进行的导出数上限，每个导出在整个下载期间占用一个连接(DB_POOL_MAXSIZE)，超出时返回503
+    OPLOG_EXPORT_MAX_CONCURRENT = int(os.getenv("OPLOG_EXPORT_MAX_CONCURRENT", 1))
+    # 操作日志按月分区: 提前创建的月数、保留的月数(<=0 不删除)、维护间隔(秒)
+    OPLOG_PARTITION_MONTHS_AHEAD = int(os.getenv("OPLOG_PARTITION_MONTHS_AHEAD", 2))
+    OPLOG_RETENTION_MONTHS = int(os.getenv("OPLOG_RETENTION_MONTHS", 6))
+    OPLOG_PARTITION_MAINTENANCE_SECONDS = float(os.getenv("OPLOG_PARTITION_MAINTENANCE_SECONDS", 6 * 3600))
+
+    # 分页总数统计: 计数缓存的存活秒数和容量；估算值低于该阈值时改为精确统计
+    PAGINATION_COUNT_CACHE_TTL = float(os.getenv("PAGINATION_COUNT_CACHE_TTL", 30))
+    PAGINATION_COUNT_CACHE_MAXSIZE = int(os.getenv("PAGINATION_COUNT_CACHE_MAXSIZE", 1024))
+    PAGINATION_ESTIMATE_EXACT_BELOW = int(os.getenv("PAGINATION_ESTIMATE_EXACT_BELOW", 1000))
+
+    # 连接池统计中，借出超过该秒数的连接列为长时间占用 (连接池参数见 TORTOISE_ORM.py)
+    DB_POOL_LONG_HELD_SECONDS = float(os.getenv("DB_POOL_LONG_HELD_SECONDS", 5))
+    # 查询统计: 超过该秒数的查询输出慢查询日志
+    QUERY_SLOW_SECONDS = float(os.getenv("QUERY_SLOW_SECONDS", 0.2))
+    # 单个请求的查询数超过预算、或同一语句(忽略参数)重复达到阈值(疑似 N+1)时输出警告
+    QUERY_BUDGET_PER_REQUEST = int(os.getenv("QUERY_BUDGET_PER_REQUEST", 20))
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))
+    # 每个请求最多保留的语句条数
+    QUERY_TRACK_MAX_STATEMENTS = int(os.getenv("QUERY_TRACK_MAX_STATEMENTS", 100))
+    # 就绪检查(/readyz): 结果缓存秒数、数据库检查超时(秒)、连接池使用率达到该比例且有等待时视为饱和
+    HEALTH_PROBE_TTL = float(os.getenv("HEALTH_PROBE_TTL", 2))
+    HEALTH_DB_TIMEOUT = float(os.getenv("HEALTH_DB_TIMEOUT", 1))
+    HEALTH_POOL_SATURATION = float(os.getenv("HEALTH_POOL_SATURATION", 0.9))
+    # 启动时按模型自动建表，仅用于开发环境，生产环境强制关闭(表结构由 Aerich 迁移管理)
+    DB_GENERATE_SCHEMAS = os.getenv("DB_GENERATE_SCHEMAS", "False").lower() == "true"
+    # 启动时预热连接池(建立 minsize 个连接并预编译常用语句)后再开始接收请求
+    DB_WARMUP = os.getenv("DB_WARMUP", "True").lower() == "true"
+
+    # 只读副本 (副本连接见 TORTOISE_ORM.py 的 DB_REPLICA_HOSTS)
+    # 用户写入后该秒数内其读查询走主库，应大于正常的复制延迟；记录的用户数上限
+    REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+    REPLICA_STICKY_MAXSIZE = int(os.getenv("REPLICA_STICKY_MAXSIZE", 10000))
+    # 健康检查间隔与超时(秒)；复制延迟超过 REPLICA_MAX_LAG_SECONDS 或连续失败 REPLICA_FAILURE_THRESHOLD 次时移出读轮询
+    REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", 5))
+    REPLICA_HEALTH_CHECK_TIMEOUT = float(os.getenv("REPLICA_HEALTH_CHECK_TIMEOUT", 2))
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 10))
+    REPLICA_FAILURE_THRESHOLD = int(os.getenv("REPLICA_FAILURE_THRESHOLD", 2))
 
     # CORS配置
     raw_origins = os.getenv("CORS_ORIGINS", "*")
@@ -45,6 +152,8 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     LOG_LEVEL = "INFO"
+    DB_GENERATE_SCHEMAS = False
+    LOG_JSON = os.getenv("LOG_JSON", "True").lower() == "true"
     raw_origins = os.getenv("CORS_ORIGINS", "https://yourfrontend.com,https://another.domain.com")
     CORS_ORIGINS = [origin.strip() for origin in raw_origins.split(',')]
     if Config.SECRET_KEY == "default-fallback-secret-key-CHANGE-ME":
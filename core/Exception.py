@@ -55,6 +55,27 @@ class InternalServerErrorException(BaseAPIException):
 
 
 
+class TooManyRequestsException(BaseAPIException):
+    """429 Too Many Requests Exception"""
+    def __init__(
+        self,
+        detail: Any = "请求过于频繁，请稍后再试",
+        headers: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        super().__init__(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=detail, headers=headers)
+
+
+class ServiceUnavailableException(BaseAPIException):
+    """503 Service Unavailable Exception"""
+    def __init__(
+        self,
+        detail: Any = "服务繁忙，请稍后再试",
+        headers: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail, headers=headers)
+
+
+
 class DatabaseException(BaseAPIException):
     """Custom database exception"""
     def __init__(
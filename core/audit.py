@@ -0,0 +1,131 @@
+import random
+from typing import Callable, Dict, Optional
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+from core.loguru import logger
+
+
+class AuditPolicy:
+    """
+    路由级操作审计策略
+        - ALWAYS: 每个请求都写入操作日志 (默认)
+        - NEVER: 从不写入，用于高频只读接口
+        - ERRORS: 只记录失败(状态码>=400)或异常的请求
+        - SAMPLE: 失败请求全部记录，成功请求按 rate 比例抽样记录
+    """
+    ALWAYS = "always"
+    NEVER = "never"
+    ERRORS = "errors"
+    SAMPLE = "sample"
+
+    __slots__ = ("mode", "rate")
+
+    def __init__(self, mode: str = ALWAYS, rate: float = 1.0):
+        if mode not in (self.ALWAYS, self.NEVER, self.ERRORS, self.SAMPLE):
+            raise ValueError(f"未知的审计策略: {mode}")
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"抽样比例必须在0到1之间: {rate}")
+        self.mode = mode
+        self.rate = rate
+
+    def should_audit(self, failed: bool) -> bool:
+        """
+        判断本次请求是否需要写入操作日志
+
+        Args:
+            failed: 请求是否失败(状态码>=400或抛出异常)
+
+        Returns:
+            bool: 是否写入
+        """
+        if self.mode == self.ALWAYS:
+            return True
+        if self.mode == self.NEVER:
+            return False
+        if failed:
+            return True
+        return self.mode == self.SAMPLE and random.random() < self.rate
+
+    def __repr__(self) -> str:
+        if self.mode == self.SAMPLE:
+            return f"AuditPolicy({self.mode}, rate={self.rate})"
+        return f"AuditPolicy({self.mode})"
+
+
+_DEFAULT_POLICY = AuditPolicy(AuditPolicy.ALWAYS)
+
+
+def audit_policy(mode: str, rate: float = 1.0) -> Callable:
+    """
+    路由审计策略装饰器，写在路由装饰器下方:
+
+        @router.get("/get_user_list")
+        @audit_policy(AuditPolicy.SAMPLE, rate=0.01)
+        async def get_user_list(...):
+
+    Args:
+        mode: 审计策略，见 AuditPolicy
+        rate: SAMPLE 策略下成功请求的抽样比例
+
+    Returns:
+        原样返回被装饰的函数
+    """
+    policy = AuditPolicy(mode, rate)
+
+    def decorator(func: Callable) -> Callable:
+        func.__audit_policy__ = policy
+        return func
+
+    return decorator
+
+
+class AuditPolicyRegistry:
+    """
+    启动时将各路由的审计策略编译为 endpoint -> AuditPolicy 的字典，
+    请求时日志中间件只做一次字典查找
+    """
+
+    def __init__(self):
+        self._policies: Dict[Callable, AuditPolicy] = {}
+
+    def compile(self, app: FastAPI) -> None:
+        """
+        编译应用中所有路由的审计策略，须在所有路由注册完成后调用
+
+        Args:
+            app: FastAPI应用
+        """
+        policies = {}
+        for route in app.routes:
+            if isinstance(route, APIRoute):
+                policies[route.endpoint] = getattr(route.endpoint, "__audit_policy__", _DEFAULT_POLICY)
+        self._policies = policies
+
+        custom = {
+            route.path: policies[route.endpoint]
+            for route in app.routes
+            if isinstance(route, APIRoute) and policies[route.endpoint] is not _DEFAULT_POLICY
+        }
+        logger.info("路由审计策略已编译: routes={}, custom={}", len(policies), custom)
+
+    def policy_for(self, endpoint: Optional[Callable]) -> AuditPolicy:
+        """
+        获取路由的审计策略
+
+        Args:
+            endpoint: 路由处理函数 (scope["endpoint"])，未匹配到路由时为None
+
+        Returns:
+            AuditPolicy: 未编译或未声明的路由使用默认策略 ALWAYS
+        """
+        policy = self._policies.get(endpoint)
+        if policy is None:
+            # 未编译(如测试中直接使用路由)时退回读取装饰器属性
+            policy = getattr(endpoint, "__audit_policy__", _DEFAULT_POLICY)
+        return policy
+
+
+# 全局审计策略注册表，在 core/lifespan.py 中注册路由后编译
+audit_policies = AuditPolicyRegistry()
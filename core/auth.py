@@ -1,8 +1,13 @@
-from fastapi import Depends
+from typing import NamedTuple, Optional, Tuple
+from fastapi import Depends, Request
 from core.jwtwoken import TokenPayload, verify_token
 from fastapi.security import OAuth2PasswordBearer
 from model.user import User
-from model.enum.user import UserType
+from model.enum.user import UserType, UserStatus
+from core.cache import TTLCache
+from core.revocation import revocation_filter
+from core.request_context import user_id_var
+from config import config
 from core.Exception import (
     NotFoundException,
     ForbiddenException,
@@ -12,103 +17,252 @@ from core.loguru import logger
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenPayload:
+
+class Principal(NamedTuple):
+    """已认证主体，鉴权所需的用户状态、类型与令牌版本，以及供操作日志使用的用户名"""
+    user_id: int
+    user_status: int
+    user_type: int
+    token_version: int = 0
+    username: Optional[str] = None
+
+
+# 进程级主体缓存: user_id -> Principal
+# 用户信息变更时须调用 invalidate_principal 使缓存失效
+principal_cache = TTLCache(
+    maxsize=config.PRINCIPAL_CACHE_MAXSIZE,
+    ttl=config.PRINCIPAL_CACHE_TTL
+)
+
+
+async def get_principal(user_id: int) -> Optional[Principal]:
+    """
+    获取用户的鉴权主体，优先读取进程级缓存
+    
+    Args:
+        user_id: 用户ID
+    
+    Returns:
+        Principal对象，用户不存在时返回None
+    """
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    row = await User.filter(id=user_id).first().values("user_status", "user_type", "token_version", "username")
+    if not row:
+        return None
+
+    principal = Principal(
+        user_id=user_id,
+        user_status=row["user_status"],
+        user_type=row["user_type"],
+        token_version=row["token_version"],
+        username=row["username"]
+    )
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id: int) -> None:
+    """
+    使指定用户的主体缓存失效
+    在更新、删除用户或修改用户状态后调用
+    
+    Args:
+        user_id: 用户ID
+    """
+    principal_cache.pop(user_id)
+
+
+async def _resolve_principal(request: Request, token_payload: TokenPayload, verified: bool = False) -> Principal:
+    """
+    解析当前请求的鉴权主体，同一请求内只解析一次
+    结果保存在 request.state.principal 中
+
+    令牌吊销过滤器未命中时直接信任JWT中的声明；
+    命中时回退到数据库(主体缓存)校验用户状态与令牌版本
+
+    过滤器按进程维护，每 REVOCATION_REFRESH_SECONDS 秒从数据库刷新一次:
+    在其他worker上被禁用或降级的用户，在本进程最多还能以JWT中的声明访问这么长时间。
+    管理员接口传入 verified=True，始终读取主体缓存(最多滞后 PRINCIPAL_CACHE_TTL 秒)，
+    不信任JWT中的用户类型
+
+    Args:
+        request: 当前请求
+        token_payload: 已验证的令牌负载
+        verified: 是否必须以数据库(主体缓存)中的用户状态与类型为准
+    """
+    user_id = token_payload.user_id
+    principal = getattr(request.state, "principal", None)
+    if principal is not None and principal.user_id == user_id:
+        if not verified or getattr(request.state, "principal_verified", False):
+            return principal
+
+    if not verified and not revocation_filter.might_be_revoked(user_id):
+        principal = Principal(
+            user_id=user_id,
+            user_status=UserStatus.ACTIVE,
+            user_type=token_payload.user_type,
+            token_version=token_payload.token_version,
+            username=token_payload.username
+        )
+        request.state.principal = principal
+        return principal
+
+    principal = await get_principal(user_id)
+    if principal is None:
+        logger.warning("用户不存在: user_id={}", user_id)
+        raise NotFoundException(detail=f"用户不存在: ID={user_id}")
+
+    if principal.token_version != token_payload.token_version:
+        logger.warning("令牌已失效: user_id={}, token_version={}", user_id, token_payload.token_version)
+        raise BadRequestException(detail="身份认证凭据已失效，请重新登录")
+
+    request.state.principal = principal
+    request.state.principal_verified = True
+    return principal
+
+
+def get_request_identity(state: Optional[dict]) -> Tuple[Optional[int], Optional[str]]:
+    """
+    读取鉴权依赖项在本次请求中已解析出的用户身份，供日志中间件使用，
+    无需再次解码Token或查询用户表
+    
+    Args:
+        state: ASGI scope 中的 state 字典 (即 request.state 的底层存储)
+    
+    Returns:
+        (user_id, username)，请求未经过鉴权依赖项时为 (None, None)；
+        旧版Token中没有用户名时 username 为 None
+    """
+    if not state:
+        return None, None
+    principal = state.get("principal")
+    if principal is not None:
+        return principal.user_id, principal.username
+    # 只经过 get_current_user，或在解析主体时被拒绝的请求
+    token_payload = state.get("token_payload")
+    if token_payload is not None:
+        return token_payload.user_id, token_payload.username
+    return None, None
+
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)) -> TokenPayload:
     """
     依赖项：获取当前用户信息
+    解析结果保存在 request.state.token_payload 中
     
     Args:
+        request: 当前请求
         token: JWT token (由FastAPI自动从请求头中提取)
-        
+    
     Returns:
         当前用户的TokenPayload对象
-        
+    
     Raises:
         BadRequestException: 当token验证失败时
     """
     try:
         token_payload = verify_token(token)
+        request.state.token_payload = token_payload
+        # 供只读副本路由判断读己之写，见 database/replica.py
+        user_id_var.set(token_payload.user_id)
         return token_payload
     except Exception as e:
-        logger.warning(f"无效的身份认证凭据: {str(e)}")
+        logger.warning("无效的身份认证凭据: {}", e)
         raise BadRequestException(detail="无效的身份认证凭据")
 
 
-async def get_current_active_user(current_user: TokenPayload = Depends(get_current_user)) -> TokenPayload:
+async def get_current_active_user(
+    request: Request,
+    current_user: TokenPayload = Depends(get_current_user)
+) -> TokenPayload:
     """
     依赖项：获取当前活跃用户
     检查用户是否被禁用
     
     Args:
+        request: 当前请求
         current_user: 当前用户信息
-        
+    
     Returns:
         当前用户的TokenPayload对象
-        
+    
     Raises:
         NotFoundException: 当用户不存在时
         ForbiddenException: 当用户被禁用时
     """
-    # 从数据库获取用户详细信息
-    user = await User.filter(id=current_user.user_id).first()
-    if not user:
-        logger.warning(f"用户不存在: user_id={current_user.user_id}")
-        raise NotFoundException(detail=f"用户不存在: ID={current_user.user_id}")
-    
+    principal = await _resolve_principal(request, current_user)
+
     # 检查用户状态
-    if user.user_status != 1:  # 1为正常状态
-        logger.warning(f"用户已被禁用: user_id={current_user.user_id}")
+    if principal.user_status != 1:  # 1为正常状态
+        logger.warning("用户已被禁用: user_id={}", current_user.user_id)
         raise ForbiddenException(detail="用户已被禁用")
-    
+
     return current_user
 
 
-async def get_admin_user(current_user: TokenPayload = Depends(get_current_active_user)) -> TokenPayload:
+async def get_admin_user(
+    request: Request,
+    current_user: TokenPayload = Depends(get_current_active_user)
+) -> TokenPayload:
     """
     依赖项：获取管理员用户
     检查用户是否拥有管理员权限
     
     Args:
+        request: 当前请求
         current_user: 当前用户信息
-        
+    
     Returns:
         当前用户的TokenPayload对象
-        
+    
     Raises:
         ForbiddenException: 当用户无管理员权限时
     """
-    # 从数据库获取用户详细信息，确保权限信息是最新的
-    user = await User.filter(id=current_user.user_id).first()
-    
+    # 不信任JWT中的用户类型: 以主体缓存(数据库)为准，其他worker中的禁用或降级也能及时生效
+    principal = await _resolve_principal(request, current_user, verified=True)
+    if principal.user_status != UserStatus.ACTIVE:
+        logger.warning("用户已被禁用: user_id={}", current_user.user_id)
+        raise ForbiddenException(detail="用户已被禁用")
+
     # 检查用户类型
-    if user.user_type not in [UserType.ADMIN, UserType.SUPER_ADMIN]:
-        logger.warning(f"权限不足: user_id={current_user.user_id}, user_type={user.user_type}")
+    if principal.user_type not in [UserType.ADMIN, UserType.SUPER_ADMIN]:
+        logger.warning("权限不足: user_id={}, user_type={}", current_user.user_id, principal.user_type)
         raise ForbiddenException(detail="权限不足，需要管理员权限")
-    
+
     return current_user
 
 
-async def get_super_admin_user(current_user: TokenPayload = Depends(get_current_active_user)) -> TokenPayload:
+async def get_super_admin_user(
+    request: Request,
+    current_user: TokenPayload = Depends(get_current_active_user)
+) -> TokenPayload:
     """
     依赖项：获取超级管理员用户
     检查用户是否拥有超级管理员权限
     
     Args:
+        request: 当前请求
         current_user: 当前用户信息
-        
+    
     Returns:
         当前用户的TokenPayload对象
-        
+    
     Raises:
         ForbiddenException: 当用户无超级管理员权限时
     """
-    # 从数据库获取用户详细信息，确保权限信息是最新的
-    user = await User.filter(id=current_user.user_id).first()
-    
+    # 不信任JWT中的用户类型: 以主体缓存(数据库)为准，其他worker中的禁用或降级也能及时生效
+    principal = await _resolve_principal(request, current_user, verified=True)
+    if principal.user_status != UserStatus.ACTIVE:
+        logger.warning("用户已被禁用: user_id={}", current_user.user_id)
+        raise ForbiddenException(detail="用户已被禁用")
+
     # 检查用户类型
-    if user.user_type != UserType.SUPER_ADMIN:
-        logger.warning(f"权限不足: user_id={current_user.user_id}, user_type={user.user_type}")
+    if principal.user_type != UserType.SUPER_ADMIN:
+        logger.warning("权限不足: user_id={}, user_type={}", current_user.user_id, principal.user_type)
         raise ForbiddenException(detail="权限不足，需要超级管理员权限")
-    
-    return current_user
 
+    return current_user
 
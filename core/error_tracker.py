@@ -0,0 +1,161 @@
+import hashlib
+import os
+import time
+import traceback
+from collections import OrderedDict
+from typing import List
+
+from config import config
+from core.loguru import logger
+
+# 参与指纹计算的最大帧数(取最内层)，递归过深时避免指纹随深度变化
+_MAX_FRAMES = 30
+# 保存的异常消息最大长度
+_MAX_MESSAGE_LENGTH = 500
+
+
+def _normalize_filename(filename: str) -> str:
+    """去掉部署路径和虚拟环境前缀，使不同机器上的同一异常得到相同指纹"""
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + len(marker):]
+    try:
+        return os.path.relpath(filename)
+    except ValueError:
+        return filename
+
+
+def fingerprint(exc: BaseException) -> str:
+    """
+    计算异常指纹: 异常类型 + 规范化后的调用帧(文件、函数、行号)
+    异常消息不参与计算，消息中的ID、参数不同的同类异常归为一组
+
+    Args:
+        exc: 异常对象
+
+    Returns:
+        str: 16位十六进制指纹
+    """
+    frames = traceback.extract_tb(exc.__traceback__)[-_MAX_FRAMES:]
+    parts = [f"{type(exc).__module__}.{type(exc).__qualname__}"]
+    parts.extend(f"{_normalize_filename(f.filename)}:{f.name}:{f.lineno}" for f in frames)
+    return hashlib.blake2b("\n".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class _Entry:
+    """单个指纹的统计信息"""
+    __slots__ = (
+        "fingerprint", "exc_type", "message", "location", "count",
+        "first_seen", "last_seen", "last_context", "window_count", "window_start",
+    )
+
+    def __init__(self, fp: str, exc: BaseException, context: str, now: float):
+        frames = traceback.extract_tb(exc.__traceback__)
+        last = frames[-1] if frames else None
+        self.fingerprint = fp
+        self.exc_type = type(exc).__qualname__
+        self.message = str(exc)[:_MAX_MESSAGE_LENGTH]
+        self.location = f"{_normalize_filename(last.filename)}:{last.name}:{last.lineno}" if last else ""
+        self.count = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.last_context = context
+        # 上次输出汇总以来的次数
+        self.window_count = 0
+        self.window_start = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "type": self.exc_type,
+            "message": self.message,
+            "location": self.location,
+            "count": self.count,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "last_context": self.last_context,
+        }
+
+
+class ErrorTracker:
+    """
+    按指纹聚合未处理异常，抑制重复的堆栈日志
+        - 每个指纹首次出现时输出完整堆栈
+        - 之后只计数，每 summary_interval 秒最多输出一行汇总
+    指纹数量超过 max_fingerprints 时淘汰最久未出现的指纹
+    """
+
+    def __init__(self, max_fingerprints: int, summary_interval: float):
+        self.max_fingerprints = max_fingerprints
+        self.summary_interval = summary_interval
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.suppressed = 0
+
+    def report(self, exc: BaseException, context: str) -> str:
+        """
+        记录一次异常并按需输出日志
+
+        Args:
+            exc: 异常对象
+            context: 日志中的上下文描述，如请求路径或错误信息
+
+        Returns:
+            str: 异常指纹
+        """
+        fp = fingerprint(exc)
+        now = time.time()
+        entry = self._entries.get(fp)
+        if entry is None:
+            entry = _Entry(fp, exc, context, now)
+            self._entries[fp] = entry
+            if len(self._entries) > self.max_fingerprints:
+                self._entries.popitem(last=False)
+            entry.count = 1
+            logger.opt(exception=exc).error("{} [异常指纹 {}]", context, fp)
+            return fp
+
+        self._entries.move_to_end(fp)
+        entry.count += 1
+        entry.window_count += 1
+        entry.last_seen = now
+        entry.last_context = context
+
+        elapsed = time.monotonic() - entry.window_start
+        if elapsed >= self.summary_interval:
+            logger.error(
+                "重复异常 [异常指纹 {}] {}: {} - 最近 {:.0f} 秒内 {} 次，累计 {} 次，最近一次: {}",
+                fp, entry.exc_type, entry.message, elapsed, entry.window_count, entry.count, context
+            )
+            entry.window_count = 0
+            entry.window_start = time.monotonic()
+        else:
+            self.suppressed += 1
+        return fp
+
+    def top(self, limit: int = 20) -> List[dict]:
+        """
+        按出现次数返回最多的异常指纹
+
+        Args:
+            limit: 返回条数
+
+        Returns:
+            list: 指纹统计信息列表
+        """
+        entries = sorted(self._entries.values(), key=lambda e: e.count, reverse=True)[:limit]
+        return [entry.to_dict() for entry in entries]
+
+    def stats(self) -> dict:
+        """返回聚合器统计信息"""
+        return {
+            "fingerprints": len(self._entries),
+            "suppressed": self.suppressed,
+        }
+
+
+# 全局异常聚合器
+error_tracker = ErrorTracker(
+    max_fingerprints=config.ERROR_TRACKER_MAX_FINGERPRINTS,
+    summary_interval=config.ERROR_SUMMARY_INTERVAL,
+)
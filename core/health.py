@@ -0,0 +1,123 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from tortoise import connections
+
+from config import config
+from core.loguru import logger
+from core.operation_log_writer import operation_log_writer
+from database.asyncpg_backend import pool_stats
+
+# 检查函数: 返回带 ok 字段的检查结果
+Check = Callable[[], Awaitable[dict]]
+
+
+class ReadinessProbe:
+    """
+    就绪探针，检查数据库可达性、连接池饱和度和操作日志写入器状态
+
+    检查结果缓存 ttl 秒，缓存过期后同时到达的请求共享同一次检查，
+    负载均衡器多节点高频探测也不会给数据库增加负载；
+    连接池没有空闲连接时不发起数据库检查，避免探针排在真实请求之后等待连接
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        db_timeout: float,
+        saturation_threshold: float,
+        checks: Optional[Dict[str, Check]] = None,
+        advisory: Iterable[str] = ("pool",),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            ttl: 检查结果的缓存秒数
+            db_timeout: 数据库检查的超时秒数
+            saturation_threshold: 连接池使用率达到该值且有等待者时视为饱和
+            checks: 检查项名称到检查函数的映射，检查函数返回带 ok 字段的 dict；默认检查数据库、连接池和操作日志写入器
+            advisory: 只报告、不影响就绪结果的检查项
+            clock: 计算缓存过期的单调时钟
+        """
+        self.ttl = ttl
+        self.db_timeout = db_timeout
+        self.saturation_threshold = saturation_threshold
+        self.checks: Dict[str, Check] = checks if checks is not None else {
+            "database": self._check_database,
+            "pool": self._check_pool,
+            "operation_log_writer": self._check_writer,
+        }
+        self.advisory = frozenset(advisory)
+        self._clock = clock
+        self._result: Optional[dict] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    async def check(self) -> dict:
+        """
+        返回最近一次的检查结果，过期时重新检查
+
+        Returns:
+            dict: ready(是否就绪)、checked_at(检查时间)和各项检查结果
+        """
+        if self._result is not None and self._clock() < self._expires_at:
+            return self._result
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._run())
+        # shield: 单个探测请求断开时不取消其他请求共享的检查
+        return await asyncio.shield(self._inflight)
+
+    async def _run(self) -> dict:
+        checks = {name: await check() for name, check in self.checks.items()}
+        result = {
+            # 连接池饱和只说明负载高，不影响就绪，避免所有实例同时摘除
+            "ready": all(item["ok"] for name, item in checks.items() if name not in self.advisory),
+            "checked_at": time.time(),
+            "checks": checks,
+        }
+        self._result = result
+        self._expires_at = self._clock() + self.ttl
+        return result
+
+    async def _check_database(self) -> dict:
+        pool = pool_stats(config.DB_POOL_LONG_HELD_SECONDS).get("default")
+        # 没有空闲连接且连接池已满: 真实请求正在使用数据库，说明可达，无需再排队检查
+        if pool is not None and pool["idle"] == 0 and pool["size"] >= pool["max_size"]:
+            return {"ok": True, "skipped": "连接池已满"}
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(connections.get("default").execute_query("SELECT 1"), self.db_timeout)
+        except Exception as e:
+            logger.warning("就绪检查: 数据库不可达: {}", e)
+            return {"ok": False, "error": str(e) or type(e).__name__}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    async def _check_pool(self) -> dict:
+        result = {}
+        for name, stats in pool_stats(config.DB_POOL_LONG_HELD_SECONDS).items():
+            result[name] = {
+                "saturated": stats["utilization"] >= self.saturation_threshold and stats["waiting"] > 0,
+                "utilization": stats["utilization"],
+                "waiting": stats["waiting"],
+            }
+        return {"ok": not any(item["saturated"] for item in result.values()), "connections": result}
+
+    @staticmethod
+    async def _check_writer() -> dict:
+        stats = operation_log_writer.stats()
+        return {
+            "ok": stats["running"],
+            "queue_size": stats["queue_size"],
+            "queue_max": stats["queue_max"],
+            "spool_bytes": stats["spool_bytes"],
+            "last_error": stats["last_error"],
+        }
+
+
+# 全局就绪探针
+readiness_probe = ReadinessProbe(
+    ttl=config.HEALTH_PROBE_TTL,
+    db_timeout=config.HEALTH_DB_TIMEOUT,
+    saturation_threshold=config.HEALTH_POOL_SATURATION,
+)
@@ -1,10 +1,19 @@
+import abc
+import base64
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from jose import jwt, JWTError
 from fastapi import HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from config import config
+from core.cache import TTLCache
+from core.metrics import jwt_verify_duration_seconds
 from core.loguru import logger
 
 # Token获取方式
@@ -14,10 +23,172 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 class TokenPayload(BaseModel):
     user_id: int
     user_type: int
+    token_version: int = 0
+    username: Optional[str] = None
     exp: Optional[datetime] = None
 
 
-def create_token(user_id: int, user_type: int, expires_delta: Optional[timedelta] = None) -> str:
+class TokenCodec(abc.ABC):
+    """
+    JWT 编解码后端接口
+    decode 在签名或声明校验失败时必须抛出 JWTError
+    """
+    name = "base"
+
+    @abc.abstractmethod
+    def encode(self, payload: Dict[str, Any]) -> str:
+        ...
+
+    @abc.abstractmethod
+    def decode(self, token: str) -> Dict[str, Any]:
+        ...
+
+
+def _is_numeric_date(value: Any) -> bool:
+    """exp 必须是 JSON 数字(RFC 7519 NumericDate)，布尔值和字符串都不接受"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class JoseTokenCodec(TokenCodec):
+    """基于 python-jose 的默认实现，支持 jose 的全部算法"""
+    name = "jose"
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except TypeError as e:
+            # jose 校验 exp/nbf 等声明时只处理 ValueError，非数字类型会抛出 TypeError
+            raise JWTError(f"Token声明格式错误: {e}")
+
+
+class HMACTokenCodec(TokenCodec):
+    """
+    基于标准库 hmac 的 HS256/HS384/HS512 快速实现
+    密钥在初始化时预先构建为 hmac 对象，每次签名只复制其内部状态
+    """
+    name = "hmac"
+
+    _DIGESTS = {
+        "HS256": hashlib.sha256,
+        "HS384": hashlib.sha384,
+        "HS512": hashlib.sha512,
+    }
+
+    def __init__(self, secret_key: str, algorithm: str):
+        if algorithm not in self._DIGESTS:
+            raise ValueError(f"HMACTokenCodec 不支持算法: {algorithm}")
+        self.algorithm = algorithm
+        self._mac = hmac.new(secret_key.encode("utf-8"), digestmod=self._DIGESTS[algorithm])
+        header = {"alg": algorithm, "typ": "JWT"}
+        self._header_segment = self._b64encode(self._dumps(header))
+
+    @staticmethod
+    def _dumps(data: Dict[str, Any]) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def _b64encode(data: bytes) -> bytes:
+        return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+    @staticmethod
+    def _b64decode(data: bytes) -> bytes:
+        return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        claims = dict(payload)
+        if isinstance(claims.get("exp"), datetime):
+            claims["exp"] = timegm(claims["exp"].utctimetuple())
+        signing_input = self._header_segment + b"." + self._b64encode(self._dumps(claims))
+        signature = self._b64encode(self._sign(signing_input))
+        return (signing_input + b"." + signature).decode("ascii")
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            raw = token.encode("ascii")
+            signing_input, signature_segment = raw.rsplit(b".", 1)
+            header_segment, claims_segment = signing_input.split(b".", 1)
+            header = json.loads(self._b64decode(header_segment))
+            signature = self._b64decode(signature_segment)
+        except (ValueError, UnicodeError) as e:
+            raise JWTError(f"Token格式错误: {e}")
+
+        if not isinstance(header, dict) or header.get("alg") != self.algorithm:
+            raise JWTError("The specified alg value is not allowed")
+        if not hmac.compare_digest(self._sign(signing_input), signature):
+            raise JWTError("Signature verification failed.")
+
+        try:
+            claims = json.loads(self._b64decode(claims_segment))
+        except ValueError as e:
+            raise JWTError(f"Token负载格式错误: {e}")
+        if not isinstance(claims, dict):
+            raise JWTError("Invalid payload string: must be a json object")
+
+        if "exp" in claims:
+            if not _is_numeric_date(claims["exp"]):
+                raise JWTError("Expiration Time claim (exp) must be an integer.")
+            if int(claims["exp"]) < int(time.time()):
+                raise JWTError("Signature has expired.")
+        return claims
+
+
+# 可用的编解码后端: 名称 -> 工厂函数(secret_key, algorithm)
+TOKEN_CODECS: Dict[str, Callable[[str, str], TokenCodec]] = {
+    JoseTokenCodec.name: JoseTokenCodec,
+    HMACTokenCodec.name: HMACTokenCodec,
+}
+
+_token_codec: TokenCodec = TOKEN_CODECS[config.JWT_BACKEND](config.SECRET_KEY, config.ALGORITHM)
+
+# 已验证Token缓存: token摘要 -> TokenPayload，条目在token的exp时刻过期
+_verified_token_cache = TTLCache(
+    maxsize=config.TOKEN_CACHE_MAXSIZE,
+    ttl=config.TOKEN_CACHE_TTL
+)
+
+
+def get_token_codec() -> TokenCodec:
+    """获取当前使用的JWT编解码后端"""
+    return _token_codec
+
+
+def set_token_codec(codec: TokenCodec) -> None:
+    """
+    替换JWT编解码后端，并清空已验证Token缓存
+    
+    Args:
+        codec: 新的编解码后端实例
+    """
+    global _token_codec
+    _token_codec = codec
+    _verified_token_cache.clear()
+    logger.info("JWT编解码后端已切换为: {}", codec.name)
+
+
+def _token_digest(token: str) -> bytes:
+    """计算token的缓存键，避免在内存中长期保存原始token"""
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+def create_token(
+    user_id: int,
+    user_type: int,
+    expires_delta: Optional[timedelta] = None,
+    token_version: int = 0,
+    username: Optional[str] = None
+) -> str:
     """
     创建JWT Token
     
@@ -25,7 +196,9 @@ def create_token(user_id: int, user_type: int, expires_delta: Optional[timedelta
         user_id: 用户ID
         user_type: 用户类型
         expires_delta: 过期时间增量
-        
+        token_version: 用户当前的令牌版本
+        username: 用户名，供操作日志使用，避免每次请求查询用户表
+    
     Returns:
         生成的token字符串
     """
@@ -34,59 +207,83 @@ def create_token(user_id: int, user_type: int, expires_delta: Optional[timedelta
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + config.ACCESS_TOKEN_EXPIRE
-    
+
     # 构建payload
     payload = {
         "user_id": user_id,
         "user_type": user_type,
-        "exp": expire
+        "ver": token_version,
+        "username": username,
+        "exp": timegm(expire.utctimetuple())
     }
-    
+
     # 编码并返回token
     try:
-        encoded_jwt = jwt.encode(payload, config.SECRET_KEY, algorithm=config.ALGORITHM)
+        encoded_jwt = _token_codec.encode(payload)
         return encoded_jwt
     except Exception as e:
-        logger.error(f"创建JWT Token失败: {str(e)}")
+        logger.error("创建JWT Token失败: {}", e)
         raise
 
 
-def create_access_token(user_id: int, user_type: int) -> Dict[str, str]:
+def create_access_token(
+    user_id: int,
+    user_type: int,
+    token_version: int = 0,
+    username: Optional[str] = None
+) -> Dict[str, str]:
     """
     创建访问令牌
     
     Args:
         user_id: 用户ID
         user_type: 用户类型
-        
+        token_version: 用户当前的令牌版本
+        username: 用户名
+    
     Returns:
         包含token的字典
     """
-    token = create_token(user_id, user_type, expires_delta=config.ACCESS_TOKEN_EXPIRE)
+    token = create_token(
+        user_id,
+        user_type,
+        expires_delta=config.ACCESS_TOKEN_EXPIRE,
+        token_version=token_version,
+        username=username
+    )
     return token
 
 
 def verify_token(token: str) -> TokenPayload:
     """
     验证JWT Token
+    已验证过的token直接从缓存返回，缓存条目在token过期时失效
     
     Args:
         token: JWT token
-        
+    
     Returns:
         解析后的token payload
-        
+    
     Raises:
         HTTPException: 当token无效或已过期时
     """
+    start = time.perf_counter()
+    cache_key = _token_digest(token)
+    token_data = _verified_token_cache.get(cache_key)
+    if token_data is not None:
+        jwt_verify_duration_seconds.observe(time.perf_counter() - start, "cache_hit")
+        return token_data
+
+    result = "error"
     try:
         # 解码token
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        
+        payload = _token_codec.decode(token)
+
         # 获取用户ID和类型
         user_id = payload.get("user_id")
         user_type = payload.get("user_type")
-        
+
         # 验证必要字段是否存在
         if user_id is None or user_type is None:
             logger.warning("验证Token失败: Token无效")
@@ -95,21 +292,33 @@ def verify_token(token: str) -> TokenPayload:
                 detail="Token无效",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        
-        # 返回令牌负载
+
+        # 返回令牌负载; jose 接受字符串形式的 exp，这里统一要求为数字
+        exp = payload.get("exp")
+        if exp is not None and not _is_numeric_date(exp):
+            raise JWTError("Expiration Time claim (exp) must be an integer.")
         token_data = TokenPayload(
             user_id=user_id,
             user_type=user_type,
-            exp=datetime.fromtimestamp(payload.get("exp")) if "exp" in payload else None
+            token_version=payload.get("ver", 0),
+            username=payload.get("username"),
+            exp=datetime.fromtimestamp(exp) if exp is not None else None
         )
+
+        # 缓存至token过期时刻
+        ttl = exp - time.time() if exp is not None else None
+        _verified_token_cache.set(cache_key, token_data, ttl=ttl)
+        result = "decoded"
         return token_data
-    
+
     except JWTError as e:
         # JWT解析错误
-        logger.warning(f"验证Token失败: JWT解析错误 - {str(e)}")
+        logger.warning("验证Token失败: JWT解析错误 - {}", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无法验证凭据",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    finally:
+        jwt_verify_duration_seconds.observe(time.perf_counter() - start, result)
 
@@ -1,48 +1,22 @@
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI
 import time
 import os
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 # Import database and logging modules
-from database.pgsql import init_db, close_db
+from database.pgsql import init_db, close_db, warm_up_db
 from core.loguru import app_logger as logger
 from config import config
-from api import api_router
-from core.Exception import DatabaseException, InternalServerErrorException
-
-async def check_db_connection():
-    """
-    检查数据库连接是否可用，使用自定义异常处理
-    
-    Raises:
-        DatabaseException: 当数据库连接失败时抛出
-        InternalServerErrorException: 当发生其他内部错误时抛出
-    """
-    try:
-        # 尝试初始化数据库连接
-        app = FastAPI()
-        await init_db(app)
-        
-        # 如果成功连接，关闭连接
-        await close_db()
-        logger.info("数据库连接检查成功")
-        return True
-        
-    except Exception as e:
-        error_msg = f"数据库连接检查失败: {str(e)}"
-        logger.error(error_msg)
-        
-        if "database" in str(e).lower():
-            raise DatabaseException(detail=error_msg)
-        else:
-            raise InternalServerErrorException(detail=error_msg)
-            
-    finally:
-        try:
-            await close_db()
-        except Exception as e:
-            logger.warning(f"关闭数据库连接时出现警告: {str(e)}")
+from api import api_router, health_router
+from core.password_executor import password_executor
+from core.revocation import revocation_filter, refresh_revocation_filter_periodically
+from core.operation_log_writer import operation_log_writer
+from core.audit import audit_policies
+from database.partition import maintain_operation_log_partitions_periodically
+from database.replica import replica_set, check_replicas_periodically
+import asyncio
 
 # Check and create necessary directories
 def ensure_directories():
@@ -50,13 +24,13 @@ def ensure_directories():
     # 日志目录
     if not os.path.exists(config.LOG_DIR):
         Path(config.LOG_DIR).mkdir(parents=True, exist_ok=True)
-        logger.info(f"创建日志目录: {config.LOG_DIR}")
+        logger.info("创建日志目录: {}", config.LOG_DIR)
     
     # 上传文件目录
     static_dir = Path("static")
     if not static_dir.exists():
         static_dir.mkdir(parents=True, exist_ok=True)
-        logger.info(f"创建上传目录: {static_dir}")
+        logger.info("创建上传目录: {}", static_dir)
 
 
 # Log system information
@@ -68,13 +42,57 @@ def log_system_info():
     # 获取当前环境
     env = os.getenv("FASTAPI_ENV", "development")
     
-    logger.info(f"系统信息: {platform.system()} {platform.release()} ({platform.version()})")
-    logger.info(f"Python版本: {sys.version}")
-    logger.info(f"运行环境: {env}")
-    logger.info(f"调试模式: {'启用' if config.DEBUG else '禁用'}")
+    logger.info("系统信息: {} {} ({})", platform.system(), platform.release(), platform.version())
+    logger.info("Python版本: {}", sys.version)
+    logger.info("运行环境: {}", env)
+    logger.info("调试模式: {}", '启用' if config.DEBUG else '禁用')
+
+
+
+
+
+async def _cancel_task(task: Optional[asyncio.Task]) -> None:
+    """取消后台任务并等待其结束"""
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.error("后台任务退出时出错: {}", e)
 
 
+class StartupTimer:
+    """记录启动各阶段的耗时，用于分析冷启动和滚动重启的时间"""
 
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        计时一个启动阶段，阶段失败时同样记录耗时
+
+        Args:
+            name: 阶段名称
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.phases.append((name, elapsed))
+            logger.info("启动阶段 [{}] 耗时 {:.1f}ms", name, elapsed)
+
+    def summary(self) -> dict:
+        """返回总耗时与各阶段耗时(毫秒)"""
+        return {
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 1),
+            "phases": {name: round(elapsed, 1) for name, elapsed in self.phases},
+        }
 
 
 # FastAPI lifespan context manager
@@ -83,46 +101,103 @@ async def lifespan(app: FastAPI):
     """
     FastAPI应用的生命周期管理
     在应用启动时初始化资源，在应用关闭时释放资源
+    所有初始化都在此完成，全部完成后 app.state.ready 才置为 True
     """
+    timer = StartupTimer()
+    app.state.ready = False
+
     # 应用启动前执行的操作
     logger.info("=== 应用启动 ===")
-    logger.info(f"应用名称: {config.PROJECT_NAME} v{config.VERSION}")
+    logger.info("应用名称: {} v{}", config.PROJECT_NAME, config.VERSION)
     
     # 确保目录存在
     ensure_directories()
     # 记录系统信息
     log_system_info()
 
-    # 注册API路由
-    app.include_router(api_router, prefix="/api")
-    logger.info("API路由注册成功")
+    with timer.phase("注册路由"):
+        app.include_router(api_router, prefix="/api")
+        # 健康检查挂载在根路径: /healthz、/readyz
+        app.include_router(health_router)
+        # 编译路由审计策略，须在所有路由注册之后
+        audit_policies.compile(app)
     
-    # 初始化数据库
+    # 初始化数据库: 整个进程只初始化一次，生产环境不自动建表
     try:
-        # init_db现在是异步函数，需要使用await
-        await init_db(app)
-        logger.info("数据库连接初始化成功")
+        with timer.phase("初始化数据库"):
+            await init_db(generate_schemas=config.DB_GENERATE_SCHEMAS)
+        if config.DB_WARMUP:
+            with timer.phase("预热连接池"):
+                await warm_up_db()
     except Exception as e:
-        logger.error(f"数据库连接初始化失败: {str(e)}")
+        logger.error("数据库连接初始化失败: {}", e)
         # 严重错误，无法继续运行，记录错误并抛出异常
         logger.critical("应用无法正常启动，请检查数据库配置")
+        await close_db()
         raise
     
+    # 启动密码哈希进程池
+    with timer.phase("启动密码哈希进程池"):
+        password_executor.start()
+    
+    # 加载令牌吊销过滤器，加载失败时所有请求回退到数据库校验
+    with timer.phase("加载令牌吊销过滤器"):
+        try:
+            await revocation_filter.load_from_db()
+        except Exception as e:
+            logger.error("加载令牌吊销过滤器失败: {}", e)
+    revocation_refresh_task = asyncio.create_task(
+        refresh_revocation_filter_periodically(config.REVOCATION_REFRESH_SECONDS)
+    )
+    
+    # 启动操作日志批量写入器
+    operation_log_writer.start()
+    
+    # 操作日志分区维护: 提前创建分区并删除过期分区
+    partition_maintenance_task = asyncio.create_task(
+        maintain_operation_log_partitions_periodically(
+            config.OPLOG_PARTITION_MAINTENANCE_SECONDS,
+            config.OPLOG_PARTITION_MONTHS_AHEAD,
+            config.OPLOG_RETENTION_MONTHS,
+        )
+    )
+    
+    # 只读副本健康检查: 不健康的副本移出读轮询
+    replica_health_task = None
+    if replica_set.enabled:
+        replica_health_task = asyncio.create_task(
+            check_replicas_periodically(config.REPLICA_HEALTH_CHECK_SECONDS, config.REPLICA_HEALTH_CHECK_TIMEOUT)
+        )
+    
     # 其他初始化操作
+    app.state.startup = timer.summary()
+    app.state.ready = True
     logger.info("所有资源初始化完成")
-    logger.info("=== 应用启动完成 ===")
+    logger.info("=== 应用启动完成 === 总耗时 {:.1f}ms", app.state.startup["total_ms"])
     
     yield  # 此处FastAPI接管，处理请求
     
     # 应用关闭时执行的操作
+    app.state.ready = False
     logger.info("=== 应用正在关闭 ===")
     
+    # 停止后台任务并等待其退出，避免关闭数据库连接后仍有任务在查询
+    await _cancel_task(revocation_refresh_task)
+    await _cancel_task(partition_maintenance_task)
+    await _cancel_task(replica_health_task)
+    
+    # 排空操作日志队列，必须在关闭数据库连接之前
+    await operation_log_writer.stop(timeout=config.OPLOG_SHUTDOWN_TIMEOUT)
+    
     # 关闭数据库连接
     try:
         await close_db()
         logger.info("数据库连接已关闭")
     except Exception as e:
-        logger.error(f"关闭数据库连接时出错: {str(e)}")
+        logger.error("关闭数据库连接时出错: {}", e)
+    
+    # 关闭密码哈希进程池
+    await password_executor.stop()
     
     # 清理其他资源
     logger.info("所有资源已释放")
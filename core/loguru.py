@@ -1,9 +1,35 @@
 import sys
 import os
+import json
+import traceback
 from datetime import datetime
 from loguru import logger
 from pathlib import Path
 from config import config
+from core.request_context import get_request_id
+
+
+def _add_request_id(record):
+    """为每条日志记录附加当前请求ID，请求之外为 "-" """
+    record["extra"]["request_id"] = get_request_id()
+
+
+def _json_formatter(record):
+    """
+    生产环境的紧凑JSON行格式，每条日志一行，便于日志系统采集
+    异常堆栈用标准库格式化，不展开帧内的局部变量
+    """
+    payload = {
+        "time": record["time"].isoformat(timespec="milliseconds"),
+        "level": record["level"].name,
+        "request_id": record["extra"].get("request_id", "-"),
+        "logger": f"{record['name']}:{record['function']}:{record['line']}",
+        "message": record["message"],
+    }
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"])).rstrip()
+    record["extra"]["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
 
 
 def setup_logger():
@@ -13,52 +39,73 @@ def setup_logger():
     # 移除默认的日志处理器
     logger.remove()
     
+    # 所有日志记录自动带上请求ID，可直接 grep 请求ID 追踪单个请求
+    logger.configure(patcher=_add_request_id)
+    
     # 创建日志目录
     config.LOG_DIR.mkdir(exist_ok=True)
     
     # 获取当前日期作为日志文件名的一部分
     current_date = datetime.now().strftime("%Y-%m-%d")
     
-    # 添加控制台输出处理器 - 常规日志
-    logger.add(
-        sys.stderr,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        level="INFO" if not config.DEBUG else "DEBUG",
-        colorize=True,
-        backtrace=False,  # 关闭常规日志的堆栈跟踪
-        diagnose=False
-    )
+    # 文件日志格式: 生产环境为JSON行，开发环境为文本
+    file_format = _json_formatter if config.LOG_JSON else config.LOG_FORMAT
     
-    # 添加控制台错误处理器 - 只处理错误和更高级别，并显示完整堆栈
-    logger.add(
-        sys.stderr,
-        format="<red>{time:YYYY-MM-DD HH:mm:ss.SSS}</red> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>\n{exception}",
-        level="ERROR",
-        colorize=True,
-        backtrace=True,  # 开启错误日志的堆栈跟踪
-        diagnose=True,   # 显示更详细的诊断信息
-        filter=lambda record: record["level"].no >= logger.level("ERROR").no
-    )
+    if config.LOG_JSON:
+        # 生产环境: 单个控制台处理器输出JSON行，错误日志不再重复输出
+        logger.add(
+            sys.stderr,
+            format=_json_formatter,
+            level=config.LOG_LEVEL,
+            backtrace=config.LOG_BACKTRACE,
+            diagnose=config.LOG_DIAGNOSE
+        )
+    else:
+        # 添加控制台输出处理器 - 常规日志
+        logger.add(
+            sys.stderr,
+            format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <magenta>{extra[request_id]}</magenta> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+            level="INFO" if not config.DEBUG else "DEBUG",
+            colorize=True,
+            backtrace=False,  # 关闭常规日志的堆栈跟踪
+            diagnose=False
+        )
+        
+        # 添加控制台错误处理器 - 只处理错误和更高级别，并显示堆栈
+        error_no = logger.level("ERROR").no
+        logger.add(
+            sys.stderr,
+            format="<red>{time:YYYY-MM-DD HH:mm:ss.SSS}</red> | <level>{level: <8}</level> | <magenta>{extra[request_id]}</magenta> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>\n{exception}",
+            level="ERROR",
+            colorize=True,
+            backtrace=config.LOG_BACKTRACE,  # 扩展堆栈到捕获点之外，按需开启
+            diagnose=config.LOG_DIAGNOSE,    # 展开各帧局部变量，开销大且可能泄露敏感数据，按需开启
+            filter=lambda record: record["level"].no >= error_no
+        )
     
     # 添加文件输出处理器，记录所有日志
     logger.add(
         f"{config.LOG_DIR}/app_{current_date}.log",
-        format=config.LOG_FORMAT,
+        format=file_format,
         level=config.LOG_LEVEL,
         rotation=config.LOG_ROTATION,
         retention=config.LOG_RETENTION,
         compression="zip" if config.LOG_COMPRESS else None,
+        backtrace=config.LOG_BACKTRACE,
+        diagnose=config.LOG_DIAGNOSE,
         enqueue=True
     )
     
     # 添加错误日志文件处理器，只记录错误和更高级别的日志
     logger.add(
         f"{config.LOG_DIR}/error_{current_date}.log",
-        format=config.LOG_FORMAT,
+        format=file_format,
         level="ERROR",
         rotation=config.LOG_ROTATION,
         retention=config.LOG_RETENTION,
         compression="zip" if config.LOG_COMPRESS else None,
+        backtrace=config.LOG_BACKTRACE,
+        diagnose=config.LOG_DIAGNOSE,
         enqueue=True
     )
     
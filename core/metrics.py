@@ -0,0 +1,225 @@
+import bisect
+import math
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# 延迟直方图的默认桶边界(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+DB_POOL_ACQUIRE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+PASSWORD_HASH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+JWT_VERIFY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """单调递增计数器，按标签值元组分别计数"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """
+        增加计数
+
+        Args:
+            *labels: 按 labelnames 顺序给出的标签值
+            amount: 增加量
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in list(self._values.items())
+        ]
+
+
+class Histogram:
+    """
+    固定桶直方图
+    每组标签只保存各桶的计数、总和与总数，记录一次为一次二分查找加两次加法
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数(最后一个为+Inf), 总和]
+        self._data: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        记录一次观测值
+
+        Args:
+            value: 观测值(秒)
+            *labels: 按 labelnames 顺序给出的标签值
+        """
+        data = self._data.get(labels)
+        if data is None:
+            data = [[0] * (len(self.buckets) + 1), 0.0]
+            self._data[labels] = data
+        data[0][bisect.bisect_left(self.buckets, value)] += 1
+        data[1] += value
+
+    def count(self, *labels: str) -> int:
+        data = self._data.get(labels)
+        return sum(data[0]) if data else 0
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in list(self._data.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class GaugeCallback:
+    """抓取时才读取的仪表盘值，用于队列深度等已有状态，不占用请求路径"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+        labelnames: Sequence[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.func = func
+
+    def render(self) -> List[str]:
+        value = self.func()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+            for labels, v in value.items()
+        ]
+
+
+class MetricsRegistry:
+    """
+    指标注册表，以Prometheus文本格式输出
+
+    所有记录都在事件循环线程中进行，只有字典和列表操作，不需要加锁；
+    即使偶尔从线程池中记录，GIL下最坏情况也只是丢失个别计数
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, GaugeCallback]] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+        labelnames: Sequence[str] = (),
+    ) -> GaugeCallback:
+        return self._register(GaugeCallback(name, documentation, func, labelnames))
+
+    def render(self) -> str:
+        """
+        以Prometheus文本格式(0.0.4)输出所有指标
+
+        Returns:
+            str: 指标文本
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+http_requests_total = metrics.counter(
+    "http_requests_total", "HTTP请求数", ("route", "method", "status_class")
+)
+http_request_duration_seconds = metrics.histogram(
+    "http_request_duration_seconds", "HTTP请求处理耗时(到响应头发出)", ("route", "method")
+)
+db_queries_total = metrics.counter(
+    "db_queries_total", "数据库查询数", ("operation",)
+)
+db_query_duration_seconds = metrics.histogram(
+    "db_query_duration_seconds", "数据库查询耗时", ("operation",), DB_QUERY_BUCKETS
+)
+db_queries_per_request = metrics.histogram(
+    "db_queries_per_request", "单个HTTP请求执行的数据库查询数", (), QUERY_COUNT_BUCKETS
+)
+db_pool_acquire_duration_seconds = metrics.histogram(
+    "db_pool_acquire_duration_seconds", "从连接池获取连接的等待时间", ("connection",), DB_POOL_ACQUIRE_BUCKETS
+)
+password_hash_duration_seconds = metrics.histogram(
+    "password_hash_duration_seconds", "密码哈希耗时(含排队)", ("operation",), PASSWORD_HASH_BUCKETS
+)
+jwt_verify_duration_seconds = metrics.histogram(
+    "jwt_verify_duration_seconds", "JWT验证耗时", ("result",), JWT_VERIFY_BUCKETS
+)
@@ -0,0 +1,511 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager, suppress
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from tortoise import connections, timezone
+from tortoise.exceptions import IntegrityError
+
+from config import config
+from core.loguru import logger
+from core.metrics import metrics
+from model.operation_log import OperationLog
+
+try:
+    import fcntl
+except ImportError:  # Windows: 没有跨进程文件锁，多个进程不能共用同一个spool文件
+    fcntl = None
+
+# 与 OperationLog 字段长度保持一致，超长内容会导致整批写入失败
+_FIELD_LIMITS = {"username": 50, "operation": 255, "result": 255, "request_id": 64}
+
+
+class OperationLogWriter:
+    """
+    操作日志异步批量写入器
+
+    请求路径只调用 enqueue 把记录放入内存队列，后台任务按数量或时间阈值
+    使用 bulk_create 批量写入数据库:
+        - 队列已满时记录交给后台任务追加到本地spool文件，请求永远不会因写日志而等待，
+          也不会在请求路径上访问文件系统
+        - 数据库不可用时整批写入spool文件，恢复后自动回放
+        - 关闭时排空队列，超时未写完的记录写入spool文件
+        - 回放时数据库可用但整批写入失败的记录移入隔离文件(.failed)，不阻塞后续回放
+
+    多个worker共用同一个spool文件: 追加与改名在 .lock 文件锁下进行，
+    回放持有 .replay.lock 文件锁，同一时间只有一个进程回放
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        spool_path: Path,
+        replay_interval: float,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = Path(spool_path)
+        self.replay_path = self.spool_path.with_name(self.spool_path.name + ".replay")
+        self.quarantine_path = self.spool_path.with_name(self.spool_path.name + ".failed")
+        self._spool_lock_path = self.spool_path.with_name(self.spool_path.name + ".lock")
+        self._replay_lock_path = self.spool_path.with_name(self.spool_path.name + ".replay.lock")
+        self.replay_interval = replay_interval
+        self._queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        # 待落盘的记录，由 _spool_task 在线程中写入spool文件，请求路径不接触文件系统
+        self._overflow: List[Dict[str, Any]] = []
+        self._overflow_max = max_queue
+        self._spool_task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_replay = 0.0
+
+        # 指标
+        self.enqueued = 0
+        self.written = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.quarantined = 0
+        self.flush_errors = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """启动后台写入任务"""
+        if self.running:
+            return
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info("操作日志写入器已启动: batch_size={}, flush_interval={}s", self.batch_size, self.flush_interval)
+
+    async def stop(self, timeout: float) -> None:
+        """
+        停止后台写入任务并排空队列
+
+        Args:
+            timeout: 等待排空的最长秒数，超时后剩余记录写入spool文件
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        try:
+            # 唤醒等待中的后台任务；队列已满时后台任务本就在忙
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("操作日志写入器排空超时，剩余记录写入spool文件")
+        finally:
+            self._task = None
+
+        self._overflow.extend(self._drain_nowait())
+        if self._spool_task is not None and not self._spool_task.done():
+            await self._spool_task
+        await self._spool_overflow()
+        logger.info("操作日志写入器已停止: written={}, spooled={}", self.written, self.spooled)
+
+    def enqueue(
+        self,
+        user_id: int,
+        username: str,
+        operation: str,
+        result: str,
+        **extra: Any,
+    ) -> None:
+        """
+        提交一条操作日志，不会阻塞调用方
+
+        Args:
+            user_id: 用户ID
+            username: 用户名
+            operation: 操作描述
+            result: 操作结果
+            **extra: OperationLog的其他字段
+        """
+        record = {
+            "user_id": user_id,
+            "username": username,
+            "operation": operation,
+            "result": result,
+            "create_time": timezone.now(),
+            **extra,
+        }
+        for field, limit in _FIELD_LIMITS.items():
+            if isinstance(record.get(field), str) and len(record[field]) > limit:
+                record[field] = record[field][:limit]
+
+        self.enqueued += 1
+        if self._closing or not self.running:
+            self._spool_later(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            # 背压: 不让请求等待，溢出的记录落盘，稍后回放
+            self._spool_later(record)
+
+    def _spool_later(self, record: Dict[str, Any]) -> None:
+        """
+        把记录交给后台落盘任务，立即返回
+        文件锁和写文件都在线程中进行，磁盘慢或其他worker持有锁时请求也不会等待；
+        待落盘的记录同样有上限，超出时丢弃
+        """
+        if len(self._overflow) >= self._overflow_max:
+            self.dropped += 1
+            return
+        self._overflow.append(record)
+        if self._spool_task is None or self._spool_task.done():
+            self._spool_task = asyncio.create_task(self._spool_overflow())
+
+    async def _spool_overflow(self) -> None:
+        while self._overflow:
+            records, self._overflow = self._overflow, []
+            await self._spool_async(records)
+
+    async def _run(self) -> None:
+        replay_due = True
+        while True:
+            try:
+                if replay_due:
+                    await self._replay_spool()
+                batch = await self._next_batch()
+                if batch:
+                    await self._flush(batch)
+                if self._closing and self._queue.empty():
+                    break
+                replay_due = time.monotonic() - self._last_replay >= self.replay_interval
+            except Exception as e:
+                # 任何意外异常都不能结束后台任务，否则之后的记录只能落盘且就绪检查一直失败
+                self.last_error = str(e)
+                logger.opt(exception=e).error("操作日志写入器异常: {}", e)
+                if self._closing:
+                    break
+                await asyncio.sleep(self.flush_interval)
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        """等待第一条记录，然后在flush_interval内收集至多batch_size条"""
+        loop = asyncio.get_running_loop()
+        try:
+            # 空闲时也定期醒来，以便数据库恢复后回放spool文件
+            first = await asyncio.wait_for(self._queue.get(), self.replay_interval)
+        except asyncio.TimeoutError:
+            return []
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = loop.time() + self.flush_interval
+        try:
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0 or self._closing:
+                        break
+                    try:
+                        record = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if record is None:
+                    break
+                batch.append(record)
+        except asyncio.CancelledError:
+            # 关闭超时被取消: 已从队列取出的记录落盘
+            self._spool(batch)
+            raise
+        return batch
+
+    def _drain_nowait(self) -> List[Dict[str, Any]]:
+        records = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return records
+            if record is not None:
+                records.append(record)
+
+    async def _write(self, records: List[Dict[str, Any]]) -> None:
+        """
+        批量写入数据库
+        批内存在约束冲突(如用户已被删除)时逐条重试，丢弃无法写入的记录
+        """
+        try:
+            await OperationLog.bulk_create([OperationLog(**record) for record in records])
+            self.written += len(records)
+        except IntegrityError:
+            for record in records:
+                try:
+                    await OperationLog.create(**record)
+                    self.written += 1
+                except IntegrityError as e:
+                    self.dropped += 1
+                    logger.warning("丢弃无法写入的操作日志: {} - {}", record.get('operation'), e)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await self._write(batch)
+            self.last_flush_at = time.time()
+            self.last_error = None
+        except asyncio.CancelledError:
+            # 关闭超时被取消: 无法确认本批是否已提交，落盘回放(可能重复，但不丢失)
+            self._spool(batch)
+            raise
+        except Exception as e:
+            # 数据库不可用: 落盘，恢复后回放
+            self.flush_errors += 1
+            self.last_error = str(e)
+            logger.error("批量写入操作日志失败，{} 条记录写入spool文件: {}", len(batch), e)
+            await self._spool_async(batch)
+
+    async def _spool_async(self, records: List[Dict[str, Any]]) -> None:
+        """在线程中将记录落盘，稍后回放"""
+        lines = [json.dumps(record, ensure_ascii=False, default=_json_default) + "\n" for record in records]
+        try:
+            await asyncio.to_thread(self._append_lines, self.spool_path, lines)
+            self.spooled += len(records)
+        except OSError as e:
+            logger.error("写入操作日志spool文件失败，丢弃 {} 条记录: {}", len(records), e)
+            self.dropped += len(records)
+
+    def _spool(self, records: List[Dict[str, Any]]) -> None:
+        """
+        同步落盘，只在后台任务被取消时使用(此时不能再等待线程)
+        """
+        lines = [json.dumps(record, ensure_ascii=False, default=_json_default) + "\n" for record in records]
+        try:
+            self._append_lines(self.spool_path, lines)
+            self.spooled += len(records)
+        except OSError as e:
+            logger.error("写入操作日志spool文件失败，丢弃 {} 条记录: {}", len(records), e)
+            self.dropped += len(records)
+
+    def _append_lines(self, path: Path, lines: List[str]) -> None:
+        """在spool文件锁下追加JSON行，阻塞调用，不能在事件循环中直接执行"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _file_lock(self._spool_lock_path), open(path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    async def _replay_spool(self) -> None:
+        """回放spool文件中的记录，其他进程正在回放时跳过"""
+        self._last_replay = time.monotonic()
+        with _file_lock(self._replay_lock_path, blocking=False) as acquired:
+            if acquired:
+                await self._replay_locked()
+
+    async def _replay_locked(self) -> None:
+        # 文件操作都在线程中执行，不阻塞事件循环
+        try:
+            if not await asyncio.to_thread(self._claim_spool):
+                return
+            f = await asyncio.to_thread(open, self.replay_path, "r", encoding="utf-8")
+        except OSError as e:
+            logger.error("读取操作日志spool文件失败: {}", e)
+            return
+
+        replayed = 0
+        with f:
+            # 每次只读取 batch_size 行，内存占用与spool文件大小无关
+            while True:
+                lines = await asyncio.to_thread(_read_lines, f, self.batch_size)
+                if not lines:
+                    break
+                lines, batch = await self._parse_lines(lines)
+                if not batch:
+                    continue
+                try:
+                    await self._write(batch)
+                    replayed += len(batch)
+                except Exception as e:
+                    self.last_error = str(e)
+                    if await _database_available():
+                        # 数据库可用但整批失败: 批内有无法写入的记录，逐条写入并隔离失败的记录
+                        logger.warning("回放操作日志整批失败，逐条写入: {}", e)
+                        replayed += await self._write_or_quarantine(batch)
+                        continue
+                    logger.warning("回放操作日志失败，剩余记录保留在spool文件: {}", e)
+                    try:
+                        await asyncio.to_thread(self._requeue, lines, f)
+                    except OSError as requeue_error:
+                        # 保留回放文件，下次回放重新处理(已写入的部分会重复)
+                        logger.error("剩余记录写回spool文件失败: {}", requeue_error)
+                        return
+                    break
+
+        with suppress(FileNotFoundError):
+            await asyncio.to_thread(os.remove, self.replay_path)
+        self.replayed += replayed
+        if replayed:
+            logger.info("已回放spool文件中的操作日志: {} 条", replayed)
+
+    def _claim_spool(self) -> bool:
+        """
+        准备回放文件，返回是否有需要回放的记录
+        先改名再读取，回放期间新落盘的记录写入新文件；上次回放中途退出留下的文件优先处理
+        """
+        if self.replay_path.exists():
+            return True
+        with _file_lock(self._spool_lock_path):
+            if not self.spool_path.exists():
+                return False
+            os.replace(self.spool_path, self.replay_path)
+        return True
+
+    def _requeue(self, lines: List[str], rest) -> None:
+        """把当前批次和回放文件中未读取的部分写回spool文件"""
+        with _file_lock(self._spool_lock_path), open(self.spool_path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+            for line in rest:
+                if line.strip():
+                    f.write(line if line.endswith("\n") else line + "\n")
+
+    async def _parse_lines(self, lines: List[str]) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """解析JSON行，返回可解析的原始行与记录；损坏的行(如进程崩溃时写了一半)原样移入隔离文件"""
+        good, records, bad = [], [], []
+        for line in lines:
+            try:
+                records.append(_load_record(line))
+                good.append(line)
+            except ValueError as e:
+                logger.error("操作日志spool文件中的记录无法解析，移入隔离文件: {}", e)
+                bad.append(line)
+        if bad:
+            await self._quarantine(bad)
+        return good, records
+
+    async def _write_or_quarantine(self, records: List[Dict[str, Any]]) -> int:
+        """逐条写入，失败的记录移入隔离文件，返回写入成功的条数"""
+        written = 0
+        failed = []
+        for record in records:
+            try:
+                await self._write([record])
+                written += 1
+            except Exception as e:
+                logger.error("操作日志无法写入，移入隔离文件 {}: {} - {}", self.quarantine_path, record.get('operation'), e)
+                failed.append(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+        if failed:
+            await self._quarantine(failed)
+        return written
+
+    async def _quarantine(self, lines: List[str]) -> None:
+        """追加到隔离文件，需要人工排查后处理"""
+        try:
+            await asyncio.to_thread(self._append_lines, self.quarantine_path, lines)
+            self.quarantined += len(lines)
+        except OSError as e:
+            logger.error("写入操作日志隔离文件失败，丢弃 {} 条记录: {}", len(lines), e)
+            self.dropped += len(lines)
+
+    def stats(self) -> dict:
+        """返回写入器状态与统计信息"""
+        try:
+            spool_bytes = self.spool_path.stat().st_size
+        except OSError:
+            spool_bytes = 0
+        return {
+            "running": self.running,
+            "queue_size": self._queue.qsize(),
+            "queue_max": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "quarantined": self.quarantined,
+            "flush_errors": self.flush_errors,
+            "spool_pending": len(self._overflow),
+            "spool_bytes": spool_bytes,
+            "last_flush_at": self.last_flush_at,
+            "last_error": self.last_error,
+        }
+
+
+@contextmanager
+def _file_lock(path: Path, blocking: bool = True):
+    """
+    跨进程的排他文件锁(fcntl.flock)
+
+    Args:
+        path: 锁文件路径
+        blocking: False 时获取失败立即返回
+
+    Yields:
+        bool: 是否获得锁；没有 fcntl 的平台总是 True
+    """
+    if fcntl is None:
+        yield True
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            acquired = True
+        except BlockingIOError:
+            acquired = False
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+async def _database_available() -> bool:
+    try:
+        await asyncio.wait_for(connections.get("default").execute_query("SELECT 1"), config.HEALTH_DB_TIMEOUT)
+        return True
+    except Exception:
+        return False
+
+
+def _read_lines(f, limit: int) -> List[str]:
+    """读取至多 limit 个非空行"""
+    lines = []
+    while len(lines) < limit:
+        line = f.readline()
+        if not line:
+            break
+        if line.strip():
+            # 进程崩溃时最后一行可能没有换行符，补上以免写回时与下一条记录连在一起
+            lines.append(line if line.endswith("\n") else line + "\n")
+    return lines
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value)}")
+
+
+def _load_record(line: str) -> Dict[str, Any]:
+    record = json.loads(line)
+    if record.get("create_time"):
+        record["create_time"] = datetime.fromisoformat(record["create_time"])
+    return record
+
+
+# 全局操作日志写入器，在 core/lifespan.py 中启动和关闭
+operation_log_writer = OperationLogWriter(
+    batch_size=config.OPLOG_BATCH_SIZE,
+    flush_interval=config.OPLOG_FLUSH_INTERVAL,
+    max_queue=config.OPLOG_MAX_QUEUE,
+    spool_path=config.OPLOG_SPOOL_PATH,
+    replay_interval=config.OPLOG_REPLAY_INTERVAL,
+)
+metrics.gauge_callback(
+    "operation_log_queue_size", "等待写入的操作日志数", lambda: operation_log_writer._queue.qsize()
+)
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple
+
+from config import config
+from core.Exception import ServiceUnavailableException
+from core.loguru import logger
+from core.metrics import metrics, password_hash_duration_seconds
+from utils.crypto import hash_password, verify_password, verify_and_update_password
+
+
+class PasswordExecutor:
+    """
+    密码哈希专用的CPU进程池
+    将bcrypt计算移出事件循环，并对排队任务数做准入控制:
+    排队+执行中的任务达到上限时立即拒绝，避免登录洪峰拖垮整个worker
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        # 指标
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def start(self) -> None:
+        """启动进程池"""
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info("密码哈希进程池已启动: workers={}, max_pending={}", self.max_workers, self.max_pending)
+
+    async def stop(self) -> None:
+        """关闭进程池，取消尚未开始的任务，在线程中等待子进程退出，不阻塞事件循环"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+            logger.info("密码哈希进程池已关闭")
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        在进程池中执行CPU密集型函数
+
+        Args:
+            func: 可被pickle的模块级函数
+            *args: 函数参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            ServiceUnavailableException: 排队任务已达上限时
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("密码哈希队列已满，拒绝请求: pending={}", self.pending)
+            raise ServiceUnavailableException(headers={"Retry-After": str(self.retry_after)})
+
+        self.pending += 1
+        self.submitted += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        start = time.perf_counter()
+        try:
+            result = await self._submit(func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.pending -= 1
+            elapsed = time.perf_counter() - start
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            password_hash_duration_seconds.observe(elapsed, func.__name__)
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            # 进程池未启动时(脚本、测试)退回默认线程池，同样不阻塞事件循环
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            # 子进程被杀死(如OOM)后进程池不可再用，重建后重试一次
+            self._rebuild(pool)
+            return await loop.run_in_executor(self._pool, func, *args)
+
+    def _rebuild(self, broken: ProcessPoolExecutor) -> None:
+        """
+        替换已损坏的进程池
+        同时失败的任务都会调用，只有第一个(进程池仍是 broken 时)执行重建，
+        其余直接使用新进程池重试，不会相互取消对方的任务
+        """
+        if self._pool is not broken:
+            return
+        logger.error("密码哈希进程池异常退出，正在重建")
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        # 损坏的进程池中的任务已全部失败，不需要等待
+        broken.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        """返回队列深度与延迟统计"""
+        finished = self.completed + self.failed
+        return {
+            "started": self.started,
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "max_pending_seen": self.max_pending_seen,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "latency_avg_ms": round(self.latency_total / finished * 1000, 2) if finished else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+        }
+
+
+# 全局密码哈希执行器，在 core/lifespan.py 中启动和关闭
+password_executor = PasswordExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS,
+    max_pending=config.PASSWORD_HASH_MAX_PENDING,
+    retry_after=config.PASSWORD_HASH_RETRY_AFTER,
+)
+metrics.gauge_callback(
+    "password_hash_pending", "排队+执行中的密码哈希任务数", lambda: password_executor.pending
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """在进程池中对密码进行bcrypt哈希"""
+    return await password_executor.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在进程池中验证密码"""
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """在进程池中验证密码，哈希参数过时时同时生成新哈希"""
+    return await password_executor.run(verify_and_update_password, plain_password, hashed_password)
@@ -0,0 +1,274 @@
+import ipaddress
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import Request
+
+from config import config
+from core.Exception import TooManyRequestsException
+from core.loguru import logger
+from core.metrics import metrics
+
+# 淘汰时最多跳过的锁定中的键数
+_EVICT_SCAN = 64
+
+
+class _KeyState:
+    """单个限流键的状态，固定大小"""
+    __slots__ = ("tokens", "updated", "failures", "blocked_until")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.failures = 0
+        self.blocked_until = 0.0
+
+
+class KeyedThrottle:
+    """
+    按键限流器: 令牌桶 + 失败渐进延迟 + 锁定
+
+    - 每次尝试消耗一个令牌，令牌按 refill_seconds 匀速恢复，最多 burst 个
+    - 连续失败超过 free_failures 次后，下一次尝试需等待 base_delay * 2^n 秒(不超过max_delay)
+    - 连续失败达到 max_failures 次后锁定 lockout_seconds 秒
+    每个键占用常量内存，键数量超过 max_keys 时优先淘汰最久未访问且未被锁定/延迟的键，
+    攻击者无法通过制造大量新键把已锁定的键挤出去
+    """
+
+    def __init__(
+        self,
+        name: str,
+        burst: int,
+        refill_seconds: float,
+        free_failures: int,
+        base_delay: float,
+        max_delay: float,
+        max_failures: int,
+        lockout_seconds: float,
+        max_keys: int,
+    ):
+        self.name = name
+        self.burst = burst
+        self.refill_seconds = refill_seconds
+        self.free_failures = free_failures
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_failures = max_failures
+        self.lockout_seconds = lockout_seconds
+        self.max_keys = max_keys
+        self._states: "OrderedDict[str, _KeyState]" = OrderedDict()
+
+        # 指标
+        self.allowed = 0
+        self.rejected_rate = 0
+        self.rejected_blocked = 0
+        self.lockouts = 0
+
+    def _get_state(self, key: str, now: float) -> _KeyState:
+        state = self._states.get(key)
+        if state is None:
+            state = _KeyState(float(self.burst), now)
+            self._states[key] = state
+            if len(self._states) > self.max_keys:
+                self._evict(now)
+        else:
+            self._states.move_to_end(key)
+            # 按流逝时间恢复令牌
+            state.tokens = min(self.burst, state.tokens + (now - state.updated) / self.refill_seconds)
+            state.updated = now
+        return state
+
+    def _evict(self, now: float) -> None:
+        """淘汰一个键: 跳过仍在锁定/延迟中的键(移到队尾)，最多跳过 _EVICT_SCAN 个"""
+        for _ in range(min(_EVICT_SCAN, len(self._states) - 1)):
+            key, state = next(iter(self._states.items()))
+            if state.blocked_until <= now:
+                break
+            self._states.move_to_end(key)
+        self._states.popitem(last=False)
+
+    def retry_after(self, key: str) -> Optional[float]:
+        """
+        检查键是否允许一次新的尝试，允许时消耗一个令牌
+
+        Returns:
+            None 表示允许；否则为需要等待的秒数
+        """
+        now = time.monotonic()
+        state = self._get_state(key, now)
+
+        if state.blocked_until > now:
+            self.rejected_blocked += 1
+            return state.blocked_until - now
+
+        if state.tokens < 1:
+            self.rejected_rate += 1
+            return (1 - state.tokens) * self.refill_seconds
+
+        state.tokens -= 1
+        self.allowed += 1
+        return None
+
+    def record_failure(self, key: str) -> None:
+        """记录一次失败尝试，计算渐进延迟或锁定"""
+        now = time.monotonic()
+        state = self._get_state(key, now)
+        state.failures += 1
+
+        if state.failures >= self.max_failures:
+            state.blocked_until = now + self.lockout_seconds
+            state.failures = 0
+            self.lockouts += 1
+            logger.warning("登录限流: {} {} 连续失败次数过多，锁定 {} 秒", self.name, key, self.lockout_seconds)
+        elif state.failures > self.free_failures:
+            delay = self.base_delay * 2 ** (state.failures - self.free_failures - 1)
+            state.blocked_until = now + min(delay, self.max_delay)
+
+    def record_success(self, key: str) -> None:
+        """登录成功后清除失败计数"""
+        state = self._states.get(key)
+        if state is not None:
+            state.failures = 0
+            state.blocked_until = 0.0
+
+    def stats(self) -> dict:
+        """返回限流统计信息"""
+        now = time.monotonic()
+        return {
+            "keys": len(self._states),
+            "blocked_keys": sum(1 for state in self._states.values() if state.blocked_until > now),
+            "allowed": self.allowed,
+            "rejected_rate": self.rejected_rate,
+            "rejected_blocked": self.rejected_blocked,
+            "lockouts": self.lockouts,
+        }
+
+
+def _build_throttle(name: str, burst: int, refill_seconds: float) -> KeyedThrottle:
+    return KeyedThrottle(
+        name=name,
+        burst=burst,
+        refill_seconds=refill_seconds,
+        free_failures=config.LOGIN_FREE_FAILURES,
+        base_delay=config.LOGIN_BASE_DELAY,
+        max_delay=config.LOGIN_MAX_DELAY,
+        max_failures=config.LOGIN_MAX_FAILURES,
+        lockout_seconds=config.LOGIN_LOCKOUT_SECONDS,
+        max_keys=config.LOGIN_THROTTLE_MAX_KEYS,
+    )
+
+
+# 按用户名和客户端IP分别限流
+login_user_throttle = _build_throttle("username", config.LOGIN_USER_BURST, config.LOGIN_USER_REFILL_SECONDS)
+login_ip_throttle = _build_throttle("ip", config.LOGIN_IP_BURST, config.LOGIN_IP_REFILL_SECONDS)
+
+# 用户名键的最大长度，避免超长用户名占用内存
+_MAX_KEY_LENGTH = 64
+
+
+def _parse_networks(value: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            networks.append(ipaddress.ip_network(item, strict=False))
+    return networks
+
+
+# 受信任的反向代理，只有来自这些地址的 X-Forwarded-For 才会被采信
+_TRUSTED_PROXIES = _parse_networks(config.TRUSTED_PROXIES)
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _TRUSTED_PROXIES)
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    获取用于限流的客户端IP
+
+    直连对端是受信任的代理(TRUSTED_PROXIES)时，从右向左取 X-Forwarded-For 中
+    第一个不受信任的地址，客户端自己伪造的左侧部分不会被采信；
+    未配置 TRUSTED_PROXIES 时直接使用对端地址，部署在代理之后时所有用户共用代理的限流桶
+
+    Args:
+        request: 当前请求
+
+    Returns:
+        str: 客户端IP，无法获取时为 "unknown"
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not _TRUSTED_PROXIES or not _is_trusted_proxy(peer):
+        return peer
+    forwarded = [item.strip() for item in request.headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    for host in reversed(forwarded):
+        if not _is_trusted_proxy(host):
+            return host
+    return forwarded[0] if forwarded else peer
+
+
+def check_login_allowed(username: str, client_ip: str) -> None:
+    """
+    登录前检查限流，必须在查询用户和校验密码之前调用
+
+    Args:
+        username: 登录用户名
+        client_ip: 客户端IP
+
+    Raises:
+        TooManyRequestsException: 用户名或IP被限流/锁定时
+    """
+    wait = login_ip_throttle.retry_after(client_ip)
+    if wait is None:
+        wait = login_user_throttle.retry_after(username[:_MAX_KEY_LENGTH])
+    if wait is not None:
+        raise TooManyRequestsException(
+            detail="登录尝试过于频繁，请稍后再试",
+            headers={"Retry-After": str(max(1, int(wait + 0.999)))}
+        )
+
+
+def record_login_failure(username: str, client_ip: str) -> None:
+    """记录一次登录失败"""
+    login_ip_throttle.record_failure(client_ip)
+    login_user_throttle.record_failure(username[:_MAX_KEY_LENGTH])
+
+
+def record_login_success(username: str) -> None:
+    """
+    记录一次登录成功
+    只清除用户名的失败计数，避免攻击者用自己的账号重置IP计数
+    """
+    login_user_throttle.record_success(username[:_MAX_KEY_LENGTH])
+
+
+def login_throttle_stats() -> dict:
+    """返回登录限流统计信息"""
+    return {
+        "username": login_user_throttle.stats(),
+        "ip": login_ip_throttle.stats(),
+    }
+
+
+def _throttle_gauge(*fields: str):
+    def collect() -> Dict[Tuple[str, ...], float]:
+        values = {}
+        for throttle, stats in login_throttle_stats().items():
+            for field in fields:
+                values[(throttle, field)] = stats[field]
+        return values
+    return collect
+
+
+metrics.gauge_callback(
+    "login_throttle_keys", "登录限流跟踪的键数", _throttle_gauge("keys", "blocked_keys"), ("throttle", "state")
+)
+metrics.gauge_callback(
+    "login_throttle_attempts", "登录限流累计的尝试与拒绝次数",
+    _throttle_gauge("allowed", "rejected_rate", "rejected_blocked", "lockouts"), ("throttle", "result")
+)
@@ -0,0 +1,38 @@
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前请求的ID，请求之外(启动、后台任务)为 "-"
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+# 当前请求的已认证用户ID，由鉴权依赖项设置，未认证或请求之外为 None
+user_id_var: ContextVar[Optional[int]] = ContextVar("user_id", default=None)
+
+# 接受客户端/网关传入的请求ID的格式，其余情况重新生成，避免日志注入
+_REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._\-]{1,64}")
+
+
+def get_request_id() -> str:
+    """获取当前请求的ID"""
+    return request_id_var.get()
+
+
+def get_user_id() -> Optional[int]:
+    """获取当前请求的已认证用户ID"""
+    return user_id_var.get()
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """
+    生成请求ID，传入的ID合法时原样沿用
+    
+    Args:
+        incoming: 请求头中携带的请求ID
+    
+    Returns:
+        str: 请求ID
+    """
+    # fullmatch: "$" 允许末尾带一个换行符
+    if incoming and _REQUEST_ID_PATTERN.fullmatch(incoming):
+        return incoming
+    return uuid.uuid4().hex
@@ -0,0 +1,201 @@
+import asyncio
+import bisect
+import hashlib
+import math
+from typing import Iterable, List, Optional, Tuple
+
+from tortoise import Tortoise
+from tortoise.expressions import Q
+
+from config import config
+from core.loguru import logger
+from model.enum.user import UserStatus
+from model.user import User
+
+
+class BloomFilter:
+    """
+    整数键的布隆过滤器
+    使用 blake2b 双重哈希生成k个位置，只会误报不会漏报
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: int) -> Iterable[int]:
+        digest = hashlib.blake2b(key.to_bytes(8, "little", signed=True), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: int) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationFilter:
+    """
+    令牌吊销过滤器
+    记录"令牌可能已失效"的用户，未命中的用户可直接信任JWT，无需查询数据库;
+    命中时(含布隆过滤器误报)由调用方回退到数据库做精确校验
+
+    可能失效的用户包括:
+        - 被禁用或令牌版本号被递增过的用户 (布隆过滤器)
+        - 启动时扫描到的已删除用户ID区间 (有序区间列表)
+        - 大于已知最大ID的用户 (加载之后新建或删除的用户)
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._gap_starts: List[int] = []
+        self._gap_ends: List[int] = []
+        # 区间内的ID总数，用于判断已知ID范围内是否有新的删除
+        self._gap_total = 0
+        self._max_user_id = 0
+        self._revoked_during_load: Optional[List[int]] = None
+        self.ready = False
+
+        # 指标
+        self.hits = 0
+        self.misses = 0
+
+    def revoke(self, user_id: int) -> None:
+        """将用户标记为令牌可能失效，在禁用、删除用户或递增令牌版本后调用"""
+        self._bloom.add(user_id)
+        if self._revoked_during_load is not None:
+            self._revoked_during_load.append(user_id)
+
+    def might_be_revoked(self, user_id: int) -> bool:
+        """
+        判断用户的令牌是否可能已失效
+
+        Args:
+            user_id: 用户ID
+
+        Returns:
+            False 表示令牌一定未被吊销；True 表示需要回退到数据库校验
+        """
+        if not self.ready or user_id > self._max_user_id or self._in_gap(user_id) or user_id in self._bloom:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def _in_gap(self, user_id: int) -> bool:
+        index = bisect.bisect_right(self._gap_starts, user_id) - 1
+        return index >= 0 and user_id <= self._gap_ends[index]
+
+    def rebuild(self, revoked_ids: List[int], gaps: List[Tuple[int, int]], max_user_id: int) -> None:
+        """
+        用完整快照重建过滤器
+
+        Args:
+            revoked_ids: 被禁用或令牌版本号大于0的用户ID
+            gaps: 已删除用户的ID闭区间列表
+            max_user_id: 当前最大用户ID
+        """
+        bloom = BloomFilter(max(self.capacity, len(revoked_ids) * 2), self.error_rate)
+        for user_id in revoked_ids:
+            bloom.add(user_id)
+
+        gaps = sorted(gaps)
+        self._bloom = bloom
+        self._gap_starts = [start for start, _ in gaps]
+        self._gap_ends = [end for _, end in gaps]
+        self._gap_total = sum(end - start + 1 for start, end in gaps)
+        self._max_user_id = max_user_id
+        self.ready = True
+
+    async def load_from_db(self) -> None:
+        """从数据库加载吊销快照"""
+        # 加载期间发生的吊销可能不在快照中，重建后需要补回
+        self._revoked_during_load = []
+        try:
+            await self._load_from_db()
+        finally:
+            self._revoked_during_load = None
+
+    async def _load_from_db(self) -> None:
+        revoked_ids = await User.filter(
+            Q(user_status__not=UserStatus.ACTIVE) | Q(token_version__gt=0)
+        ).values_list("id", flat=True)
+
+        gaps = await self._load_gaps()
+        max_user_id = await User.all().order_by("-id").first().values_list("id", flat=True) or 0
+
+        self.rebuild(list(revoked_ids) + self._revoked_during_load, gaps, max_user_id)
+        logger.info(
+            "令牌吊销过滤器已加载: revoked={}, gaps={}, max_user_id={}", len(revoked_ids), len(gaps), max_user_id
+        )
+
+    async def _load_gaps(self) -> List[Tuple[int, int]]:
+        """
+        找出已删除用户的ID区间
+
+        上次加载的ID范围内没有新的删除时(主键索引上的 COUNT 与上次的区间吻合)，
+        沿用已知区间，只对之后新增的ID做窗口扫描；否则全表扫描
+        """
+        conn = Tortoise.get_connection("default")
+        gaps: List[Tuple[int, int]] = []
+        scan_after = 0
+        if self.ready and self._max_user_id:
+            _, rows = await conn.execute_query(
+                f'SELECT COUNT(*) AS total FROM "user" WHERE id <= {int(self._max_user_id)}'
+            )
+            if rows[0]["total"] == self._max_user_id - self._gap_total:
+                gaps = list(zip(self._gap_starts, self._gap_ends))
+                scan_after = self._max_user_id
+
+        # 通过相邻ID之差找出区间，只返回存在空洞的行
+        _, rows = await conn.execute_query(
+            'SELECT prev_id, id FROM ('
+            f'SELECT id, LAG(id, 1, {scan_after}) OVER (ORDER BY id) AS prev_id FROM "user" WHERE id > {scan_after}'
+            ') t WHERE id - prev_id > 1'
+        )
+        gaps.extend((row["prev_id"] + 1, row["id"] - 1) for row in rows)
+        return gaps
+
+    def stats(self) -> dict:
+        """返回过滤器统计信息"""
+        return {
+            "ready": self.ready,
+            "bloom_size_bytes": len(self._bloom._bits),
+            "bloom_items": self._bloom.count,
+            "gaps": len(self._gap_starts),
+            "max_user_id": self._max_user_id,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# 全局令牌吊销过滤器，在 core/lifespan.py 中加载并定期刷新
+revocation_filter = RevocationFilter(
+    capacity=config.REVOCATION_BLOOM_CAPACITY,
+    error_rate=config.REVOCATION_BLOOM_ERROR_RATE,
+)
+
+
+async def refresh_revocation_filter_periodically(interval: float) -> None:
+    """
+    定期从数据库重建过滤器
+    使其他worker进程中的禁用/删除操作在interval秒内生效，并清理已恢复用户的旧条目
+
+    每次刷新每个worker执行: 查询已吊销的用户(只返回吊销的行)、主键上的 COUNT，
+    以及仅覆盖新增ID的窗口扫描；已知范围内有删除时才退化为全表窗口扫描
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await revocation_filter.load_from_db()
+        except Exception as e:
+            logger.error("刷新令牌吊销过滤器失败: {}", e)
@@ -0,0 +1,204 @@
+"""
+带查询指标的 asyncpg 数据库后端
+
+在 Tortoise 配置中将 engine 设置为 "database.asyncpg_backend" 即可启用，
+在 tortoise.backends.asyncpg 的基础上:
+    - 记录每条查询的次数与耗时，以及按请求的查询统计(见 query_metrics.py)
+    - 不区分大小写的匹配(icontains/istartswith/iendswith/iexact)生成 ILIKE，
+      而不是 UPPER(CAST(...)) LIKE，可以使用 pg_trgm 的 GIN 索引
+    - 连接池记录获取连接的等待时间和每个连接的占用情况，见 pool_stats()
+"""
+import asyncio
+import time
+import weakref
+from typing import Dict, Tuple
+
+import asyncpg
+
+from pypika.enums import SqlTypes
+from pypika.functions import Cast
+from pypika.terms import Criterion, Term
+from tortoise.backends.asyncpg.client import AsyncpgDBClient, TransactionWrapper
+from tortoise.backends.asyncpg.executor import AsyncpgExecutor
+from tortoise.backends.base.client import TransactionContext, TransactionContextPooled
+from tortoise.filters import (
+    Like,
+    escape_like,
+    insensitive_contains,
+    insensitive_ends_with,
+    insensitive_exact,
+    insensitive_starts_with,
+)
+
+from core.metrics import db_pool_acquire_duration_seconds, metrics
+from core.request_context import get_request_id
+from database.query_metrics import QueryMetricsMixin
+
+
+class ILike(Like):
+    """带 ESCAPE 子句的 ILIKE"""
+
+    def __init__(self, left, right, alias=None) -> None:
+        super().__init__(left, right, alias=alias)
+        self.comparator = " ILIKE "
+
+
+def _ilike(field: Term, pattern: str) -> Criterion:
+    # 转换到不带长度的 VARCHAR 只是类型重标记，不影响索引匹配
+    return ILike(Cast(field, SqlTypes.VARCHAR), field.wrap_constant(pattern))
+
+
+def postgres_insensitive_contains(field: Term, value: str) -> Criterion:
+    return _ilike(field, f"%{escape_like(value)}%")
+
+
+def postgres_insensitive_starts_with(field: Term, value: str) -> Criterion:
+    return _ilike(field, f"{escape_like(value)}%")
+
+
+def postgres_insensitive_ends_with(field: Term, value: str) -> Criterion:
+    return _ilike(field, f"%{escape_like(value)}")
+
+
+def postgres_insensitive_exact(field: Term, value: str) -> Criterion:
+    return _ilike(field, escape_like(value))
+
+
+class TrigramAwareExecutor(AsyncpgExecutor):
+    FILTER_FUNC_OVERRIDE = {
+        **AsyncpgExecutor.FILTER_FUNC_OVERRIDE,
+        insensitive_contains: postgres_insensitive_contains,
+        insensitive_starts_with: postgres_insensitive_starts_with,
+        insensitive_ends_with: postgres_insensitive_ends_with,
+        insensitive_exact: postgres_insensitive_exact,
+    }
+
+
+class InstrumentedPool(asyncpg.Pool):
+    """
+    记录连接获取与占用情况的连接池
+        - 获取连接的等待时间(直方图和累计/最大值)、正在等待的协程数、获取超时次数
+        - 每个已借出连接的借出时间和请求ID，用于找出长时间占用连接的请求
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = "default"
+        self.waiting = 0
+        self.acquire_count = 0
+        self.acquire_timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # 连接代理对象id -> (借出时间, 请求ID)
+        self._borrowed: Dict[int, Tuple[float, str]] = {}
+
+    async def _acquire(self, timeout):
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = await super()._acquire(timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        wait = time.perf_counter() - start
+        self.acquire_count += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        db_pool_acquire_duration_seconds.observe(wait, self.name)
+        self._borrowed[id(connection)] = (time.monotonic(), get_request_id())
+        return connection
+
+    async def release(self, connection, *, timeout=None):
+        self._borrowed.pop(id(connection), None)
+        return await super().release(connection, timeout=timeout)
+
+    def stats(self, long_held_seconds: float) -> dict:
+        """
+        返回连接池的实时统计
+        
+        Args:
+            long_held_seconds: 借出超过该秒数的连接列入 long_held
+        """
+        now = time.monotonic()
+        long_held = sorted(
+            (
+                {"held_seconds": round(now - acquired_at, 3), "request_id": request_id}
+                for acquired_at, request_id in list(self._borrowed.values())
+                if now - acquired_at >= long_held_seconds
+            ),
+            key=lambda item: item["held_seconds"],
+            reverse=True,
+        )
+        size = self.get_size()
+        idle = self.get_idle_size()
+        return {
+            "min_size": self.get_min_size(),
+            "max_size": self.get_max_size(),
+            "size": size,
+            "idle": idle,
+            "in_use": size - idle,
+            "utilization": round((size - idle) / self.get_max_size(), 3),
+            "waiting": self.waiting,
+            "acquire_count": self.acquire_count,
+            "acquire_timeouts": self.acquire_timeouts,
+            "avg_wait_ms": round(self.total_wait / self.acquire_count * 1000, 3) if self.acquire_count else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+            "long_held": long_held,
+        }
+
+
+# 当前存活的连接池，连接关闭后自动移除
+_pools: "weakref.WeakSet[InstrumentedPool]" = weakref.WeakSet()
+
+
+def pool_stats(long_held_seconds: float) -> Dict[str, dict]:
+    """
+    返回所有连接池的实时统计
+
+    Args:
+        long_held_seconds: 借出超过该秒数的连接列入 long_held
+
+    Returns:
+        dict: 连接名 -> 统计信息
+    """
+    return {pool.name: pool.stats(long_held_seconds) for pool in list(_pools) if not pool.is_closing()}
+
+
+def _pool_gauge() -> Dict[Tuple[str, ...], float]:
+    values = {}
+    for pool in list(_pools):
+        if pool.is_closing():
+            continue
+        size, idle = pool.get_size(), pool.get_idle_size()
+        values[(pool.name, "in_use")] = size - idle
+        values[(pool.name, "idle")] = idle
+        values[(pool.name, "waiting")] = pool.waiting
+    return values
+
+
+metrics.gauge_callback("db_pool_connections", "连接池连接数", _pool_gauge, ("connection", "state"))
+
+
+class InstrumentedTransactionWrapper(QueryMetricsMixin, TransactionWrapper):
+    """事务内的查询同样计入指标"""
+    executor_class = TrigramAwareExecutor
+
+
+class InstrumentedAsyncpgDBClient(QueryMetricsMixin, AsyncpgDBClient):
+    executor_class = TrigramAwareExecutor
+
+    def _in_transaction(self) -> TransactionContext:
+        return TransactionContextPooled(InstrumentedTransactionWrapper(self))
+
+    async def create_pool(self, **kwargs) -> asyncpg.Pool:
+        # 与 asyncpg.create_pool 相同，只是使用 InstrumentedPool
+        options = {**asyncpg.create_pool.__kwdefaults__, **kwargs}
+        pool = await InstrumentedPool(None, **options)
+        pool.name = self.connection_name
+        _pools.add(pool)
+        return pool
+
+
+client_class = InstrumentedAsyncpgDBClient
@@ -0,0 +1,158 @@
+"""
+operation_log 按月分区维护
+
+表结构由 migrations/models/12_*_partition_operation_log.py 转换为按 create_time 的范围分区表，
+分区命名为 operation_log_pYYYYMM。本模块负责:
+    - 提前创建未来几个月的分区，避免新数据落入默认分区
+    - 整个删除过期月份的分区，代替逐行 DELETE，不产生死元组也不需要 VACUUM
+"""
+import asyncio
+import re
+from datetime import date
+from typing import List, Tuple
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from core.loguru import logger
+
+PARENT_TABLE = "operation_log"
+PARTITION_PREFIX = f"{PARENT_TABLE}_p"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+# 多个worker同时维护时只有一个执行，其余直接跳过
+_ADVISORY_LOCK_KEY = 0x6F706C6F67  # "oplog"
+
+
+def add_months(month: date, months: int) -> date:
+    """返回 month 所在月份偏移 months 个月后的月初日期"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """月份对应的分区表名"""
+    return f"{PARTITION_PREFIX}{month.year:04d}{month.month:02d}"
+
+
+def partition_month(name: str):
+    """
+    从分区表名解析月份
+
+    Returns:
+        date | None: 月初日期，名称不符合命名规则(如默认分区)时返回 None
+    """
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def months_to_create(today: date, months_ahead: int) -> List[Tuple[str, date, date]]:
+    """
+    计算需要存在的分区: 当前月份及之后 months_ahead 个月
+
+    Returns:
+        list: (分区名, 下界, 上界) 列表，上界不包含
+    """
+    current = today.replace(day=1)
+    result = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current, offset)
+        result.append((partition_name(start), start, add_months(start, 1)))
+    return result
+
+
+def expired_partitions(names: List[str], today: date, retention_months: int) -> List[str]:
+    """
+    找出整月都早于保留期的分区
+
+    保留当前月份及之前 retention_months 个月，例如10月、保留6个月时删除3月及更早的分区
+
+    Args:
+        names: 现有分区表名
+        today: 当前日期
+        retention_months: 保留的月数
+
+    Returns:
+        list: 需要删除的分区表名
+    """
+    cutoff = add_months(today.replace(day=1), -retention_months)
+    expired = []
+    for name in names:
+        month = partition_month(name)
+        if month is not None and month < cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+async def _is_partitioned(conn) -> bool:
+    _, rows = await conn.execute_query(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass($1)", [PARENT_TABLE]
+    )
+    return bool(rows) and rows[0]["relkind"] == "p"
+
+
+async def _list_partitions(conn) -> List[str]:
+    _, rows = await conn.execute_query(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass($1)",
+        [PARENT_TABLE],
+    )
+    return [row["relname"] for row in rows]
+
+
+async def maintain_operation_log_partitions(months_ahead: int, retention_months: int) -> dict:
+    """
+    创建未来的分区并删除过期分区
+
+    Args:
+        months_ahead: 提前创建的月数
+        retention_months: 保留的月数，小于等于0表示不删除
+
+    Returns:
+        dict: 本次创建和删除的分区名
+    """
+    result = {"created": [], "dropped": []}
+    conn = Tortoise.get_connection("default")
+    if not await _is_partitioned(conn):
+        logger.warning("{} 不是分区表，跳过分区维护，请先执行数据库迁移", PARENT_TABLE)
+        return result
+
+    async with in_transaction("default") as tx:
+        _, rows = await tx.execute_query("SELECT pg_try_advisory_xact_lock($1) AS locked", [_ADVISORY_LOCK_KEY])
+        if not rows[0]["locked"]:
+            logger.debug("其他进程正在维护操作日志分区，跳过")
+            return result
+
+        today = date.today()
+        existing = set(await _list_partitions(tx))
+        for name, start, end in months_to_create(today, months_ahead):
+            if name in existing:
+                continue
+            await tx.execute_script(
+                f'CREATE TABLE "{name}" PARTITION OF "{PARENT_TABLE}" '
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+            result["created"].append(name)
+
+        if retention_months > 0:
+            for name in expired_partitions(list(existing), today, retention_months):
+                # 删除分区只修改元数据并删除文件，耗时与分区大小无关
+                await tx.execute_script(f'DROP TABLE "{name}"')
+                result["dropped"].append(name)
+
+    if result["created"] or result["dropped"]:
+        logger.info("操作日志分区维护完成: 新建 {}，删除 {}", result["created"], result["dropped"])
+    return result
+
+
+async def maintain_operation_log_partitions_periodically(
+    interval: float, months_ahead: int, retention_months: int
+) -> None:
+    """启动时执行一次，之后每 interval 秒执行一次分区维护"""
+    while True:
+        try:
+            await maintain_operation_log_partitions(months_ahead, retention_months)
+        except Exception as e:
+            logger.error("操作日志分区维护失败: {}", e)
+        await asyncio.sleep(interval)
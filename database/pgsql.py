@@ -1,54 +1,92 @@
-from fastapi import FastAPI
-from tortoise.contrib.fastapi import register_tortoise
-from tortoise import Tortoise
+import asyncio
+from contextlib import AsyncExitStack
+from typing import List, Tuple
+
+from tortoise import Tortoise, connections
+from tortoise.backends.asyncpg.client import AsyncpgDBClient
 from config import config
 from core.loguru import logger
-import importlib
-import inspect
 
 
-async def init_db(app: FastAPI) -> None:
+async def init_db(generate_schemas: bool = False) -> None:
     """
-    初始化数据库连接
+    初始化数据库连接，整个进程只调用一次(由 lifespan 调用)
+
+    Args:
+        generate_schemas: 是否按模型自动建表，仅用于开发环境；生产环境的表结构由 Aerich 迁移管理
     """
-    try:
-        # 首先检查model目录下是否有可用的模型类
-        try:
-            import model
-            import model.user  # 尝试导入用户模型
-            from model.user import User  # 尝试导入User模型类
-            logger.info(f"成功导入User模型: {User}")
-            model_classes = inspect.getmembers(model.user, inspect.isclass)
-            tortoise_models = [cls for name, cls in model_classes if hasattr(cls, '_meta')]
-            logger.info(f"找到Tortoise ORM模型类: {tortoise_models}")
-        except ImportError as e:
-            logger.error(f"导入模型失败: {e}")
-        
-        # 打印Tortoise配置信息
-        db_config = config.DATABASE_CONFIG.copy()
-        # 隐藏密码
-        if 'credentials' in db_config['connections']['default']:
-            db_config['connections']['default']['credentials'] = {
-                **db_config['connections']['default']['credentials'],
-                'password': '******'  # 隐藏密码
-            }
-        logger.info(f"Tortoise配置: {db_config}")
-        
-        # 使用register_tortoise方法初始化数据库连接
-        logger.info("使用register_tortoise初始化数据库连接...")
-        register_tortoise(
-            app,
-            config=config.DATABASE_CONFIG,
-            generate_schemas=True,  # 自动创建数据表
-            add_exception_handlers=True,  # 添加异常处理
+    await Tortoise.init(config=config.DATABASE_CONFIG)
+    for name, connection in config.DATABASE_CONFIG['connections'].items():
+        if not isinstance(connection, dict):
+            continue
+        credentials = connection.get('credentials', {})
+        logger.info(
+            "数据库连接 {}: {}:{}/{} (连接池 {}-{})",
+            name, credentials.get('host'), credentials.get('port'), credentials.get('database'),
+            credentials.get('minsize'), credentials.get('maxsize')
         )
-        
-        logger.info("数据库初始化成功")
-    except Exception as e:
-        logger.error(f"数据库初始化失败: {str(e)}")
-        # 更详细的错误信息记录
-        logger.exception("数据库初始化详细错误")
-        raise
+    if generate_schemas:
+        logger.warning("按模型自动建表 (DB_GENERATE_SCHEMAS)，仅用于开发环境")
+        await Tortoise.generate_schemas(safe=True)
+
+
+def _hot_statements() -> List[Tuple[str, bool]]:
+    """
+    启动时预热的常用查询: (不带 LIMIT 的 SELECT 语句, 是否只在主库执行)
+    覆盖鉴权主体查询、用户列表的分页与计数、操作日志写入涉及的表
+    """
+    from model.operation_log import OperationLog
+    from model.user import User
+
+    return [
+        (User.filter(id=0).values("user_status", "user_type", "token_version", "username").sql(), False),
+        (User.all().sql(), False),
+        (User.all().count().sql(), False),
+        # 写语句无法附加 LIMIT 0 空跑，改为读取目标表，加载其目录信息和各列类型的编解码器
+        (OperationLog.all().sql(), True),
+    ]
+
+
+async def _run_all(connection, sqls: List[str]) -> None:
+    # 附加 LIMIT 0 执行: 不返回数据，但语句会进入 asyncpg 每个连接的语句缓存，
+    # 同时加载服务端的表与索引目录缓存，以及该连接的类型编解码器
+    for sql in sqls:
+        await connection.fetch(f"{sql} LIMIT 0")
+
+
+async def _warm_up_connection(name: str, statements: List[Tuple[str, bool]]) -> int:
+    client = connections.get(name)
+    if not isinstance(client, AsyncpgDBClient):
+        await client.execute_query("SELECT 1")
+        return 1
+
+    is_primary = name == "default"
+    sqls = [sql for sql, primary_only in statements if is_primary or not primary_only]
+    if int(client.extra.get("statement_cache_size", 100)) == 0:
+        # 关闭了语句缓存(如经由 PgBouncer 事务池)时预热的语句无法复用，只建立连接
+        sqls = []
+
+    # 首次获取连接时创建连接池；同时持有 minsize 个连接，保证每个连接都被预热
+    async with AsyncExitStack() as stack:
+        held = [
+            await stack.enter_async_context(client.acquire_connection())
+            for _ in range(client.pool_minsize)
+        ]
+        # 各连接并行，同一连接上依次执行
+        await asyncio.gather(*(_run_all(connection, sqls) for connection in held))
+    return len(held)
+
+
+async def warm_up_db() -> None:
+    """
+    预热所有数据库连接(主库和只读副本)
+    在开始接收请求之前建立连接池的 minsize 个连接，并在每个连接上空跑常用查询，
+    避免冷启动和滚动重启后的第一批请求承担建连和目录加载的延迟
+    """
+    statements = _hot_statements()
+    for name in config.DATABASE_CONFIG['connections']:
+        opened = await _warm_up_connection(name, statements)
+        logger.info("数据库连接 {} 预热完成: {} 个连接", name, opened)
 
 
 async def close_db() -> None:
@@ -56,12 +94,11 @@ async def close_db() -> None:
     关闭数据库连接
     """
     try:
-        from tortoise import Tortoise
         if Tortoise._inited:
             await Tortoise.close_connections()
             logger.info("数据库连接已关闭")
     except Exception as e:
-        logger.error(f"关闭数据库连接失败: {str(e)}")
+        logger.error("关闭数据库连接失败: {}", e)
         raise
 
 
@@ -70,13 +107,11 @@ async def get_db_version():
     获取数据库版本信息
     """
     try:
-        from tortoise import Tortoise
         conn = Tortoise.get_connection("default")
         result = await conn.execute_query("SELECT version()")
         version = result[1][0]["version"] if result and len(result) > 1 else None
-        logger.debug(f"获取数据库版本成功: {version}")
+        logger.debug("获取数据库版本成功: {}", version)
         return version
     except Exception as e:
-        logger.error(f"获取数据库版本失败: {str(e)}")
+        logger.error("获取数据库版本失败: {}", e)
         raise
-
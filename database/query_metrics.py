@@ -0,0 +1,193 @@
+"""
+查询指标与按请求的查询统计
+
+QueryMetricsMixin 包装数据库客户端的全部执行入口(见 asyncpg_backend.py、sqlite_backend.py):
+    - 记录全局的查询次数与耗时直方图
+    - 超过 QUERY_SLOW_SECONDS 的查询输出慢查询日志
+    - 当前上下文中有 QueryStats 时(由 QueryTrackingMiddleware 为每个请求创建)，
+      记录本请求执行的每条语句、耗时和行数，用于查询预算和 N+1 检测
+
+测试中可用 assert_max_queries 断言一段代码执行的查询数上限
+"""
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import config
+from core.loguru import logger
+from core.metrics import db_queries_total, db_query_duration_seconds
+
+_OPERATIONS = ("select", "insert", "update", "delete")
+# 日志中SQL的最大长度
+_MAX_SQL_LENGTH = 500
+# 归一化时把字符串和数字字面量替换为 ?，Tortoise 会把查询参数直接拼进SQL
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+
+
+def _operation(query: str) -> str:
+    """取SQL的首个关键字作为指标标签，限定在固定集合内以控制标签基数"""
+    verb = query.lstrip()[:6].lower()
+    return verb if verb in _OPERATIONS else "other"
+
+
+def normalize_sql(query: str) -> str:
+    """
+    去掉SQL中的字面量，只保留语句结构
+    仅参数不同的语句(如 N+1 中按不同ID逐条查询)归一化后相同
+
+    Args:
+        query: SQL语句
+
+    Returns:
+        str: 归一化后的SQL
+    """
+    return _NUMBER_LITERAL.sub("?", _STRING_LITERAL.sub("?", query))
+
+
+class QueryStats:
+    """单个请求内执行的查询"""
+
+    def __init__(self, max_statements: int):
+        self.max_statements = max_statements
+        self.count = 0
+        self.total_duration = 0.0
+        # (SQL, 耗时秒, 行数)，最多保留 max_statements 条
+        self.statements: List[Tuple[str, float, int]] = []
+        # 归一化SQL -> 执行次数
+        self.fingerprints: Dict[str, int] = {}
+
+    def add(self, query: str, duration: float, rows: int) -> None:
+        self.count += 1
+        self.total_duration += duration
+        if len(self.statements) < self.max_statements:
+            self.statements.append((query, duration, rows))
+        key = normalize_sql(query)
+        self.fingerprints[key] = self.fingerprints.get(key, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        返回执行次数达到 threshold 的语句，按次数从多到少排序
+
+        Args:
+            threshold: 次数阈值
+
+        Returns:
+            list: (归一化SQL, 次数) 列表
+        """
+        items = [(sql, count) for sql, count in self.fingerprints.items() if count >= threshold]
+        return sorted(items, key=lambda item: item[1], reverse=True)
+
+
+# 当前请求的查询统计，请求之外为 None
+query_stats_var: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries(max_statements: int = config.QUERY_TRACK_MAX_STATEMENTS) -> Iterator[QueryStats]:
+    """
+    在 with 块内统计执行的查询，块内创建的子任务同样计入
+
+    Args:
+        max_statements: 最多保留的语句条数(次数不受限制)
+
+    Yields:
+        QueryStats: 查询统计
+    """
+    stats = QueryStats(max_statements)
+    token = query_stats_var.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats_var.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """
+    测试辅助: 断言 with 块内执行的查询不超过 limit 条
+
+    Args:
+        limit: 允许的最大查询数
+
+    Raises:
+        AssertionError: 超出时列出执行过的语句
+    """
+    with track_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        executed = "\n".join(f"  {query}" for query, _, _ in stats.statements)
+        raise AssertionError(f"执行了 {stats.count} 条查询，超过上限 {limit}:\n{executed}")
+
+
+def _row_count(result: Any) -> int:
+    # execute_query 返回 (行数, 结果)，execute_query_dict 返回结果列表
+    if isinstance(result, tuple):
+        return result[0] or 0
+    if isinstance(result, list):
+        return len(result)
+    return 0
+
+
+def _record(query: str, start: float, rows: int) -> None:
+    duration = time.perf_counter() - start
+    operation = _operation(query)
+    db_queries_total.inc(operation)
+    db_query_duration_seconds.observe(duration, operation)
+
+    stats = query_stats_var.get()
+    if stats is not None:
+        stats.add(query, duration, rows)
+    if duration >= config.QUERY_SLOW_SECONDS:
+        logger.warning("慢查询 {:.1f}ms, 行数 {}: {}", duration * 1000, rows, query[:_MAX_SQL_LENGTH])
+
+
+class QueryMetricsMixin:
+    """包装客户端的全部执行入口，记录查询次数、耗时与行数"""
+
+    async def execute_insert(self, query: str, values: list) -> Any:
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = await super().execute_insert(query, values)
+            rows = 1
+            return result
+        finally:
+            _record(query, start, rows)
+
+    async def execute_many(self, query: str, values: list) -> None:
+        start = time.perf_counter()
+        rows = 0
+        try:
+            result = await super().execute_many(query, values)
+            rows = len(values)
+            return result
+        finally:
+            _record(query, start, rows)
+
+    async def execute_query(self, query: str, values: Optional[list] = None) -> Tuple[int, List[dict]]:
+        start = time.perf_counter()
+        result = None
+        try:
+            result = await super().execute_query(query, values)
+            return result
+        finally:
+            _record(query, start, _row_count(result))
+
+    async def execute_query_dict(self, query: str, values: Optional[list] = None) -> List[dict]:
+        start = time.perf_counter()
+        result = None
+        try:
+            result = await super().execute_query_dict(query, values)
+            return result
+        finally:
+            _record(query, start, _row_count(result))
+
+    async def execute_script(self, query: str) -> None:
+        start = time.perf_counter()
+        try:
+            return await super().execute_script(query)
+        finally:
+            _record(query, start, 0)
@@ -0,0 +1,203 @@
+"""
+只读副本路由
+
+TORTOISE_ORM 中配置了 replica_* 连接(见 DB_REPLICA_HOSTS)时启用 ReplicaRouter:
+    - 读查询按轮询分配到健康的副本，没有健康副本时回退到主库
+    - 写查询和事务内的查询始终使用主库
+    - 用户写入后 REPLICA_STICKY_SECONDS 秒内，该用户的读查询也走主库(读己之写)；
+      同一请求(协程上下文)内写入之后的读查询同样走主库
+    - 后台任务定期检查副本的可用性和复制延迟，不健康的副本暂时移出轮询，恢复后重新加入
+
+写入标记保存在进程内，多worker部署时同一用户的后续请求落到其他worker上不受保护，
+REPLICA_STICKY_SECONDS 应大于正常情况下的复制延迟
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from tortoise.backends.base.client import BaseTransactionWrapper
+from tortoise.connection import connections
+
+from config import config
+from core.cache import TTLCache
+from core.loguru import logger
+from core.request_context import get_user_id
+
+PRIMARY = "default"
+REPLICA_PREFIX = "replica_"
+
+# 当前上下文是否已经写入过，写入后的读查询改走主库
+_wrote_var: ContextVar[bool] = ContextVar("replica_wrote", default=False)
+
+# 主库上返回0；副本已回放完收到的WAL时延迟为0，否则为最后回放的事务距今的秒数
+_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag
+"""
+
+
+class _Replica:
+    """单个副本的健康状态"""
+    __slots__ = ("name", "healthy", "failures", "lag", "last_error", "checked_at", "reads")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.healthy = True
+        self.failures = 0
+        self.lag: Optional[float] = None
+        self.last_error = ""
+        self.checked_at: Optional[float] = None
+        self.reads = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "lag_seconds": self.lag,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+            "reads": self.reads,
+        }
+
+
+class ReplicaSet:
+    """
+    副本集合: 选择读连接、记录写入、检查副本健康状态
+
+    所有方法都在事件循环线程中调用，不需要加锁
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        sticky_seconds: float,
+        sticky_maxsize: int,
+        max_lag_seconds: float,
+        failure_threshold: int,
+    ):
+        self._replicas = [_Replica(name) for name in names]
+        self.max_lag_seconds = max_lag_seconds
+        self.failure_threshold = failure_threshold
+        # 最近写入过的用户: user_id -> True
+        self._sticky = TTLCache(maxsize=sticky_maxsize, ttl=sticky_seconds)
+        self._next = 0
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._replicas)
+
+    def read_connection(self) -> str:
+        """
+        返回本次读查询应使用的连接名
+
+        Returns:
+            str: 副本连接名；在事务内、刚写入过或没有健康副本时返回主库连接名
+        """
+        replica = self._choose_replica()
+        if replica is None:
+            self.primary_reads += 1
+            return PRIMARY
+        replica.reads += 1
+        return replica.name
+
+    def _choose_replica(self) -> Optional[_Replica]:
+        if not self._replicas or _wrote_var.get():
+            return None
+        # 事务开始后 connections 中的主库连接被替换为事务连接，事务内的读必须在同一连接上
+        if isinstance(connections.get(PRIMARY), BaseTransactionWrapper):
+            return None
+        user_id = get_user_id()
+        if user_id is not None and self._sticky.get(user_id):
+            return None
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if not healthy:
+            return None
+        self._next = (self._next + 1) % len(healthy)
+        return healthy[self._next]
+
+    def record_write(self) -> None:
+        """记录一次写入，之后当前上下文和当前用户在粘滞时间内的读查询走主库"""
+        if not self._replicas:
+            return
+        _wrote_var.set(True)
+        user_id = get_user_id()
+        if user_id is not None:
+            self._sticky.set(user_id, True)
+
+    async def check(self, timeout: float) -> None:
+        """
+        检查所有副本的可用性和复制延迟
+            - 连续失败 failure_threshold 次或延迟超过 max_lag_seconds 时移出轮询
+            - 检查成功且延迟正常时重新加入
+
+        Args:
+            timeout: 单个副本的检查超时(秒)
+        """
+        for replica in self._replicas:
+            was_healthy = replica.healthy
+            replica.checked_at = time.time()
+            try:
+                _, rows = await asyncio.wait_for(
+                    connections.get(replica.name).execute_query(_LAG_SQL), timeout
+                )
+                replica.lag = float(rows[0]["lag"])
+            except Exception as e:
+                replica.failures += 1
+                replica.last_error = str(e) or type(e).__name__
+                if replica.failures >= self.failure_threshold:
+                    replica.healthy = False
+            else:
+                replica.failures = 0
+                replica.last_error = ""
+                replica.healthy = replica.lag <= self.max_lag_seconds
+
+            if was_healthy and not replica.healthy:
+                logger.warning(
+                    "副本 {} 移出读轮询: 延迟 {} 秒, 错误: {}", replica.name, replica.lag, replica.last_error or "-"
+                )
+            elif not was_healthy and replica.healthy:
+                logger.info("副本 {} 恢复，重新加入读轮询", replica.name)
+
+    def stats(self) -> Dict[str, object]:
+        """返回副本状态和读查询的分配情况"""
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_users": len(self._sticky),
+            "replicas": [replica.to_dict() for replica in self._replicas],
+        }
+
+
+class ReplicaRouter:
+    """Tortoise 连接路由，在 TORTOISE_ORM 的 routers 中引用"""
+
+    def db_for_read(self, model) -> str:
+        return replica_set.read_connection()
+
+    def db_for_write(self, model) -> str:
+        replica_set.record_write()
+        return PRIMARY
+
+
+async def check_replicas_periodically(interval: float, timeout: float) -> None:
+    """启动时执行一次，之后每 interval 秒检查一次副本健康状态"""
+    while True:
+        try:
+            await replica_set.check(timeout)
+        except Exception as e:
+            logger.error("副本健康检查失败: {}", e)
+        await asyncio.sleep(interval)
+
+
+# 全局副本集合，TORTOISE_ORM 中没有副本连接时所有查询都走主库
+replica_set = ReplicaSet(
+    names=[name for name in config.DATABASE_CONFIG["connections"] if name.startswith(REPLICA_PREFIX)],
+    sticky_seconds=config.REPLICA_STICKY_SECONDS,
+    sticky_maxsize=config.REPLICA_STICKY_MAXSIZE,
+    max_lag_seconds=config.REPLICA_MAX_LAG_SECONDS,
+    failure_threshold=config.REPLICA_FAILURE_THRESHOLD,
+)
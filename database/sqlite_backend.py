@@ -0,0 +1,22 @@
+"""
+带查询指标的 SQLite 数据库后端
+
+在 Tortoise 配置中将 engine 设置为 "database.sqlite_backend" 即可启用，
+与 asyncpg_backend 一样记录查询指标和按请求的查询统计，主要用于测试和本地开发
+"""
+from tortoise.backends.base.client import TransactionContext
+from tortoise.backends.sqlite.client import SqliteClient, TransactionWrapper
+
+from database.query_metrics import QueryMetricsMixin
+
+
+class InstrumentedTransactionWrapper(QueryMetricsMixin, TransactionWrapper):
+    """事务内的查询同样计入指标"""
+
+
+class InstrumentedSqliteClient(QueryMetricsMixin, SqliteClient):
+    def _in_transaction(self) -> TransactionContext:
+        return TransactionContext(InstrumentedTransactionWrapper(self))
+
+
+client_class = InstrumentedSqliteClient
@@ -2,8 +2,6 @@ from fastapi import FastAPI, Request, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
-import traceback
-from tortoise.contrib.fastapi import register_tortoise
 # 导入数据模型和数据库配置
 from core.loguru import logger
 from config import config
@@ -13,6 +11,8 @@ from starlette.exceptions import HTTPException
 from fastapi.responses import JSONResponse
 from middleware.logger_middleware import register_middleware
 from schemas.Baseresponse import error_response
+from core.error_tracker import error_tracker
+from core.request_context import get_request_id
 # 创建FastAPI实例
 app = FastAPI(
     title=config.PROJECT_NAME,
@@ -41,10 +41,10 @@ async def index():
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """处理请求验证错误，输出详细错误信息到控制台"""
     error_detail = str(exc)
-    logger.error(f"请求验证错误: {error_detail}")
-    logger.error(f"错误详情: {exc.errors()}")
+    logger.error("请求验证错误: {}", error_detail)
+    logger.error("错误详情: {}", exc.errors())
     if hasattr(exc, 'body'):
-        logger.error(f"客户端提交的数据: {exc.body}")
+        logger.error("客户端提交的数据: {}", exc.body)
     return JSONResponse(
         status_code=422,
         content={"detail": exc.errors(), "message": "请求数据验证失败"}
@@ -53,32 +53,26 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """处理HTTP异常，记录详细信息"""
-    logger.error(f"HTTP错误: {exc.detail} (状态码: {exc.status_code})")
+    logger.error("HTTP错误: {} (状态码: {})", exc.detail, exc.status_code)
     return JSONResponse(
         status_code=exc.status_code,
-        content={"detail": exc.detail, "message": "请求处理失败"}
+        content={"detail": exc.detail, "message": "请求处理失败"},
+        headers=getattr(exc, "headers", None)
     )
 
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
-    """处理所有未捕获的异常，输出详细堆栈到控制台"""
+    """处理所有未捕获的异常，同一异常只在首次出现时输出完整堆栈，之后定期汇总"""
     error_msg = str(exc)
-    trace = traceback.format_exc()
-    logger.error(f"未处理的异常: {error_msg}")
-    logger.error(f"异常堆栈: \n{trace}")
-    logger.error(f"请求路径: {request.url.path}")
+    error_tracker.report(exc, f"未处理的异常: {error_msg} - 请求路径: {request.url.path}")
+    # 500响应由最外层的 ServerErrorMiddleware 发出，不经过 RequestIdMiddleware，需要在这里带上请求ID
     return JSONResponse(
         status_code=500,
-        content={"detail": "服务器内部错误", "message": error_msg if config.DEBUG else "请联系管理员"}
+        content={"detail": "服务器内部错误", "message": error_msg if config.DEBUG else "请联系管理员"},
+        headers={config.REQUEST_ID_HEADER: get_request_id()}
     )
 
-# 注册数据库
-register_tortoise(
-    app,
-    config=config.DATABASE_CONFIG,
-    generate_schemas=False,  # 不自动生成数据库表，我们使用 Aerich 来管理迁移
-    add_exception_handlers=False,  # 关闭自动异常处理，使用我们自定义的处理器
-)
+# 数据库在 lifespan 中初始化(core/lifespan.py)，表结构由 Aerich 迁移管理
 
 
 
@@ -1,4 +1,6 @@
-from middleware.logger_middleware import log_internal_requests
+from middleware.logger_middleware import InternalRequestLogMiddleware
+from middleware.metrics_middleware import MetricsMiddleware
+from middleware.request_id_middleware import RequestIdMiddleware
 
-# 导出所有中间件函数
-__all__ = ['log_internal_requests'] 
\ No newline at end of file
+# 导出所有中间件
+__all__ = ['InternalRequestLogMiddleware', 'MetricsMiddleware', 'RequestIdMiddleware'] 
\ No newline at end of file
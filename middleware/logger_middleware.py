@@ -1,259 +1,137 @@
-from fastapi import Request
 import time
+from typing import Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from core.loguru import app_logger as logger
-from model.operation_log import OperationLog
-from tortoise.exceptions import OperationalError
-from core.jwtwoken import verify_token
-from fastapi import HTTPException
+from core.operation_log_writer import operation_log_writer
+from core.auth import get_request_identity
+from core.audit import audit_policies
+from core.error_tracker import error_tracker
+from core.request_context import get_request_id
+from middleware.metrics_middleware import MetricsMiddleware
+from middleware.query_tracking_middleware import QueryTrackingMiddleware
+from middleware.request_id_middleware import RequestIdMiddleware
 from config import config
 from fastapi import FastAPI
 
-async def log_internal_requests(request: Request, call_next):
+class InternalRequestLogMiddleware:
     """
-    专门用于记录内部API请求的中间件
-    只对以/api/internal/开头的请求路径生效
-    """
-    # 检查是否是内部接口
-    is_internal_api = request.url.path.startswith("/api/internal/")
-    
-    # 如果不是内部接口，直接调用下一个处理器
-    if not is_internal_api:
-        return await call_next(request)
+    专门用于记录内部API请求的中间件 (纯ASGI实现)
+    只对以/api/internal/开头的请求路径生效，其他路径直接透传，不产生任何额外开销
     
-    # 不记录日志的路径列表
-    skip_log_paths = [
-        "/api/internal/users/get_user_list"
-    ]
+    不使用 BaseHTTPMiddleware: 不为每个请求创建额外的任务和内存流，
+    响应体原样透传(流式响应不受影响)，状态码和耗时从 http.response.start 消息中获取
     
-    # 检查是否是需要跳过记录的路径
-    path_without_query = request.url.path.split("?")[0]
-    if path_without_query in skip_log_paths:
-        # 直接调用下一个处理器，不记录日志
-        return await call_next(request)
-    
-    # 对内部接口进行日志记录
-    start_time = time.time()
+    是否写入操作日志由路由的审计策略决定，见 core/audit.py
+    """
     
-    # 记录请求信息
-    logger.info(f"开始请求: {request.method} {request.url.path}")
+    def __init__(self, app: ASGIApp, path_prefix: str = "/api/internal/"):
+        self.app = app
+        self.path_prefix = path_prefix
     
-    try:
-        # 处理请求
-        response = await call_next(request)
-        
-        # 计算处理时间
-        process_time = (time.time() - start_time) * 1000
-        logger.info(f"完成请求: {request.method} {request.url.path} - 状态码: {response.status_code} - 处理时间: {process_time:.2f}ms")
-        
-        # 对于OPTIONS请求，只记录到控制台，不记录到数据库
-        if request.method == "OPTIONS":
-            return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # 非内部接口，直接调用下一个处理器
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        path = scope["path"]
+        start_time = time.perf_counter()
+        status_code = None
+        process_time = 0.0
+        
+        # 记录请求信息
+        logger.info("开始请求: {} {}", method, path)
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, process_time
+            if message["type"] == "http.response.start":
+                # 只读取状态码，不缓冲响应体
+                status_code = message["status"]
+                process_time = (time.perf_counter() - start_time) * 1000
+            await send(message)
         
-        # 记录操作日志到数据库
         try:
-            # 获取用户信息
-            user_id = None
-            username = "system"  # 默认使用system作为用户名，而不是unknown
-            
-            # 从请求头中获取token
-            token = None
-            auth_header = request.headers.get("Authorization")
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.replace("Bearer ", "")
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            # 捕获中间件中的异常
+            process_time = (time.perf_counter() - start_time) * 1000
+            logger.error("请求处理异常: {} {} - 异常: {} - 处理时间: {:.2f}ms", method, path, e, process_time)
             
-            # 如果找到token，尝试解析
-            if token:
+            # 对于OPTIONS请求，只记录到控制台，不记录到数据库
+            if method != "OPTIONS" and audit_policies.policy_for(scope.get("endpoint")).should_audit(failed=True):
                 try:
-                    # 使用verify_token获取用户信息
-                    token_data = verify_token(token)
-                    if token_data:
-                        from model.user import User
-                        # 获取用户详细信息
-                        user = await User.filter(id=token_data.user_id).first()
-                        if user:
-                            user_id = user.id
-                            username = user.username
-                except Exception as token_err:
-                    logger.warning(f"解析Token失败: {str(token_err)}")
-            
-            # 操作结果
-            result = "成功" if response.status_code < 400 else "失败"
-            
-            # 写入数据库 - 只有当user_id不为None时才写入
-            if user_id is not None:
-                await OperationLog.create(
-                    user_id=user_id,
-                    username=username,
-                    operation=f"{request.method} {request.url.path}",
-                    result=result
-                )
-            else:
-                # 记录无法写入数据库的情况
-                logger.info(f"跳过记录日志到数据库: 无法获取用户ID, 路径: {request.url.path}")
-        except OperationalError as e:
-            logger.error(f"记录操作日志到数据库失败: {str(e)}")
+                    await self._audit(scope, f"异常: {str(e)}")
+                except Exception as db_err:
+                    logger.error("记录异常操作日志到数据库失败: {}", db_err)
+            raise  # 重新抛出异常，让异常处理器处理
         
-        return response
-    except Exception as e:
-        # 捕获中间件中的异常
-        process_time = (time.time() - start_time) * 1000
-        logger.error(f"请求处理异常: {request.method} {request.url.path} - 异常: {str(e)} - 处理时间: {process_time:.2f}ms")
+        logger.info("完成请求: {} {} - 状态码: {} - 处理时间: {:.2f}ms", method, path, status_code, process_time)
         
         # 对于OPTIONS请求，只记录到控制台，不记录到数据库
-        if request.method == "OPTIONS":
-            raise  # 重新抛出异常，让异常处理器处理
+        if method == "OPTIONS":
+            return
         
-        # 记录操作日志到数据库 - 异常情况
-        try:
-            # 获取用户信息
-            user_id = None
-            username = "system"  # 默认使用system作为用户名
-            
-            # 从请求头中获取token
-            token = None
-            auth_header = request.headers.get("Authorization")
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.replace("Bearer ", "")
-            
-            # 如果找到token，尝试解析
-            if token:
-                try:
-                    # 使用verify_token获取用户信息
-                    token_data = verify_token(token)
-                    if token_data:
-                        from model.user import User
-                        # 获取用户详细信息
-                        user = await User.filter(id=token_data.user_id).first()
-                        if user:
-                            user_id = user.id
-                            username = user.username
-                except Exception as token_err:
-                    logger.warning(f"解析Token失败: {str(token_err)}")
-            
-            # 写入数据库 - 只有当user_id不为None时才写入
-            if user_id is not None:
-                await OperationLog.create(
-                    user_id=user_id,
-                    username=username,
-                    operation=f"{request.method} {request.url.path}",
-                    result=f"异常: {str(e)}"
-                )
-            else:
-                # 记录无法写入数据库的情况
-                logger.info(f"跳过记录异常日志到数据库: 无法获取用户ID, 路径: {request.url.path}")
-        except Exception as db_err:
-            logger.error(f"记录异常操作日志到数据库失败: {str(db_err)}")
+        # 按路由的审计策略决定是否写入操作日志
+        failed = status_code is None or status_code >= 400
+        if not audit_policies.policy_for(scope.get("endpoint")).should_audit(failed):
+            return
         
-        raise  # 重新抛出异常，让异常处理器处理
-
-
-async def log_operation(request: Request, call_next):
-    """
-    通用操作日志中间件，记录所有API请求到数据库
-    """
-    # 排除静态资源、文档等路径
-    if request.url.path.startswith(("/docs", "/redoc", "/static", "/openapi.json")):
-        return await call_next(request)
-    
-    start_time = time.time()
+        # 此时响应已发送完毕，记录操作日志不会增加客户端等待时间；
+        # 这里的异常不能再向上抛出，否则会在已开始的响应上再触发错误响应
+        try:
+            # 操作结果
+            result = "失败" if failed else "成功"
+            await self._audit(scope, result)
+        except Exception as e:
+            error_tracker.report(e, f"记录操作日志失败: {method} {path}")
     
-    try:
-        # 处理请求
-        response = await call_next(request)
-        
-        # 计算处理时间
-        process_time = (time.time() - start_time) * 1000
-        
+    async def _audit(self, scope: Scope, result: str) -> None:
+        """
+        提交操作日志
+        用户身份直接读取鉴权依赖项保存在 request.state 中的结果，不再解码Token或查询用户表
+        
+        Args:
+            scope: ASGI scope
+            result: 操作结果
+        """
         # 获取用户信息
-        user_id = None
-        username = "unknown"
-        
-        # 从请求头中获取token
-        token = None
-        auth_header = request.headers.get("Authorization")
-        if auth_header:
-            token = auth_header
-        else:
-            raise HTTPException(status_code=401, detail="未授权")
-        
-        # 如果找到token，尝试解析
-        if token:
-            try:
-                # 使用verify_token获取用户信息
-                token_data = verify_token(token)
-                if token_data:
-                    from model.user import User
-                    # 获取用户详细信息
-                    user = await User.filter(id=token_data.user_id).first()
-                    if user:
-                        user_id = user.id
-                        username = user.username
-            except Exception as token_err:
-                logger.warning(f"解析Token失败: {str(token_err)}")
-        
-        # 操作结果
-        result = "成功" if response.status_code < 400 else "失败"
-        
-        # 写入数据库
-        await OperationLog.create(
-            user_id=user_id,
-            username=username,
-            operation=f"{request.method} {request.url.path}",
-            result=result
-        )
-        
-        return response
-    except Exception as e:
-        # 捕获中间件中的异常
-        process_time = (time.time() - start_time) * 1000
+        user_id, username = get_request_identity(scope.get("state"))
+        if user_id is not None and username is None:
+            username = await _load_username(user_id)
+        if username is None:
+            username = "system"  # 默认使用system作为用户名，而不是unknown
         
-        # 尝试记录异常到数据库
-        try:
-            # 获取用户信息
-            user_id = None
-            username = "unknown"
-            
-            # 从请求头中获取token
-            token = None
-            auth_header = request.headers.get("Authorization")
-            if auth_header and auth_header.startswith("Bearer "):
-                token = auth_header.replace("Bearer ", "")
-            
-            # 如果找到token，尝试解析
-            if token:
-                try:
-                    # 使用verify_token获取用户信息
-                    token_data = verify_token(token)
-                    if token_data:
-                        from model.user import User
-                        # 获取用户详细信息
-                        user = await User.filter(id=token_data.user_id).first()
-                        if user:
-                            user_id = user.id
-                            username = user.username
-                except Exception as token_err:
-                    logger.warning(f"解析Token失败: {str(token_err)}")
-            
-            # 写入数据库
-            await OperationLog.create(
+        # 提交到后台批量写入器 - 只有当user_id不为None时才写入
+        if user_id is not None:
+            operation_log_writer.enqueue(
                 user_id=user_id,
                 username=username,
-                operation=f"{request.method} {request.url.path}",
-                result=f"异常: {str(e)}"
+                operation=f"{scope['method']} {scope['path']}",
+                result=result,
+                request_id=get_request_id()
             )
-        except Exception as db_err:
-            logger.error(f"记录操作日志失败: {str(db_err)}")
-        
-        raise  # 重新抛出异常
+        else:
+            # 记录无法写入数据库的情况
+            logger.info("跳过记录日志到数据库: 无法获取用户ID, 路径: {}", scope['path'])
+
+
+async def _load_username(user_id: int) -> Optional[str]:
+    """查询用户名，仅用于未携带用户名的旧版Token，这类Token过期后不再需要"""
+    from model.user import User
+    return await User.filter(id=user_id).first().values_list("username", flat=True)
 
 
 # Register application middleware and event handlers
 def register_middleware(app: FastAPI):
-    """注册应用中间件"""
+    """注册应用中间件
+
+    add_middleware 后注册的中间件包在外层，因此实际顺序由外到内为：
+    RequestId → Metrics → QueryTracking → InternalRequestLog → CORS
+    """
     from fastapi.middleware.cors import CORSMiddleware
-    from middleware import log_internal_requests
     
-    # 注册CORS中间件
+    # 注册CORS中间件，位于最内层，预检请求在此直接返回，但仍经过外层的请求ID与指标统计
     app.add_middleware(
         CORSMiddleware,
         allow_origins=config.CORS_ORIGINS,
@@ -262,6 +140,18 @@ def register_middleware(app: FastAPI):
         allow_headers=config.CORS_HEADERS,
     )
     
-    # 注册内部API日志中间件
-    app.middleware("http")(log_internal_requests)
-    logger.info("已注册内部API日志中间件")
\ No newline at end of file
+    # 注册内部API日志中间件，位于CORS之外，记录的操作日志可以带上请求ID
+    app.add_middleware(InternalRequestLogMiddleware, path_prefix="/api/internal/")
+    logger.info("已注册内部API日志中间件")
+    
+    # 注册请求查询统计中间件，统计每个请求(含内部API日志写入)的SQL语句数并检测疑似N+1
+    app.add_middleware(QueryTrackingMiddleware)
+    logger.info("已注册请求查询统计中间件")
+    
+    # 注册请求指标中间件，位于请求ID中间件之内，统计除请求ID处理外的完整耗时
+    app.add_middleware(MetricsMiddleware)
+    logger.info("已注册请求指标中间件")
+    
+    # 注册请求ID中间件，最后注册因而位于最外层，使其余所有中间件的日志都带上请求ID
+    app.add_middleware(RequestIdMiddleware)
+    logger.info("已注册请求ID中间件")
\ No newline at end of file
@@ -0,0 +1,74 @@
+import time
+from typing import Callable, Dict, Optional
+
+from starlette.routing import BaseRoute, Mount
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import http_request_duration_seconds, http_requests_total
+
+# 未匹配到路由(404)的请求统一使用该标签，避免任意路径造成标签基数爆炸
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    请求指标中间件 (纯ASGI实现)
+    按路由模板(而不是实际路径)记录请求数、状态码类别和耗时直方图
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # endpoint -> 路由模板，首次出现时从应用路由表中查找
+        self._route_paths: Dict[Callable, str] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+        elapsed = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, elapsed
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed = time.perf_counter() - start_time
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if elapsed is None:
+                elapsed = time.perf_counter() - start_time
+            route = self._route_path(scope)
+            method = scope["method"]
+            http_requests_total.inc(route, method, f"{status_code // 100}xx")
+            http_request_duration_seconds.observe(elapsed, route, method)
+
+    def _route_path(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            routes = getattr(scope.get("app"), "routes", [])
+            path = _find_route_path(routes, endpoint) or UNMATCHED_ROUTE
+            self._route_paths[endpoint] = path
+        return path
+
+
+def _find_route_path(routes: list, endpoint: Callable, prefix: str = "") -> Optional[str]:
+    """在路由表中查找endpoint对应的路由模板"""
+    for route in routes:
+        if isinstance(route, Mount):
+            # 静态文件等挂载的子应用以挂载路径作为标签
+            if route.app is endpoint:
+                return prefix + route.path
+            found = _find_route_path(route.routes, endpoint, prefix + route.path)
+            if found:
+                return found
+        elif isinstance(route, BaseRoute) and getattr(route, "endpoint", None) is endpoint:
+            return prefix + route.path
+    return None
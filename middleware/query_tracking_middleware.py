@@ -0,0 +1,49 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import config
+from core.loguru import app_logger as logger
+from core.metrics import db_queries_per_request
+from database.query_metrics import track_queries
+
+# 警告日志中最多列出的重复语句数
+_MAX_REPORTED = 3
+
+
+class QueryTrackingMiddleware:
+    """
+    请求查询统计中间件 (纯ASGI实现)
+    统计每个请求执行的SQL语句数、总耗时，请求结束后:
+        - 查询数超过 QUERY_BUDGET_PER_REQUEST 时输出警告
+        - 同一语句(忽略参数)重复执行达到 QUERY_REPEAT_THRESHOLD 次时按疑似 N+1 输出警告
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self._report(scope, stats)
+
+    @staticmethod
+    def _report(scope: Scope, stats) -> None:
+        db_queries_per_request.observe(stats.count)
+        if stats.count == 0:
+            return
+        method, path = scope["method"], scope["path"]
+        if stats.count > config.QUERY_BUDGET_PER_REQUEST:
+            logger.warning(
+                "请求查询数超出预算: {} {} - {} 条查询(预算 {}), 总耗时 {:.1f}ms",
+                method, path, stats.count, config.QUERY_BUDGET_PER_REQUEST, stats.total_duration * 1000
+            )
+        for sql, count in stats.repeated(config.QUERY_REPEAT_THRESHOLD)[:_MAX_REPORTED]:
+            logger.warning("疑似N+1查询: {} {} - 同一语句执行 {} 次: {}", method, path, count, sql[:500])
+        logger.debug(
+            "请求查询统计: {} {} - {} 条查询, 总耗时 {:.1f}ms", method, path, stats.count, stats.total_duration * 1000
+        )
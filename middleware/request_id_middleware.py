@@ -0,0 +1,42 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import config
+from core.request_context import new_request_id, request_id_var
+
+
+class RequestIdMiddleware:
+    """
+    请求ID中间件 (纯ASGI实现)
+    沿用请求头中的请求ID或生成新的ID，保存到contextvar中，
+    本请求内输出的所有日志都会自动带上该ID，并在响应头中返回
+    未处理异常的500响应由外层 ServerErrorMiddleware 发出，响应头由 main.py 的异常处理器设置
+    """
+
+    def __init__(self, app: ASGIApp, header_name: str = config.REQUEST_ID_HEADER):
+        self.app = app
+        self.header_name = header_name
+        self._header_key = header_name.lower().encode("latin-1")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == self._header_key:
+                incoming = value.decode("latin-1")
+                break
+        request_id = new_request_id(incoming)
+        header = (self._header_key, request_id.encode("latin-1"))
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [header]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        await self.app(scope, receive, send_wrapper)
+        # 异常时不重置: 外层 ServerErrorMiddleware 调用的异常处理器仍在同一请求任务中，
+        # 其输出的日志需要带上请求ID
+        request_id_var.reset(token)
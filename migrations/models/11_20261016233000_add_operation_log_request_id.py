@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # 早期部署的 operation_log 表不在迁移中创建，可能不存在；此时跳过，
+    # 由之后的迁移 12 创建分区表，其中已包含 request_id 列及其索引
+    return """
+        DO $$
+BEGIN
+    IF to_regclass('operation_log') IS NOT NULL THEN
+        ALTER TABLE "operation_log" ADD COLUMN IF NOT EXISTS "request_id" VARCHAR(64);
+        CREATE INDEX IF NOT EXISTS "idx_operation_request_5e3c1a" ON "operation_log" ("request_id");
+        COMMENT ON COLUMN "operation_log"."request_id" IS '请求ID，与日志中的request_id对应';
+    END IF;
+END $$;"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_operation_request_5e3c1a";
+ALTER TABLE IF EXISTS "operation_log" DROP COLUMN IF EXISTS "request_id";"""
@@ -0,0 +1,93 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # 将 operation_log 改为按 create_time 按月范围分区的表
+    # 已有数据迁移到对应月份的分区，之后由 database/partition.py 提前创建分区并按月删除过期分区
+    return """
+        DO $$
+DECLARE
+    legacy_exists BOOLEAN;
+    start_month DATE;
+    cur_month DATE;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE relname = 'operation_log' AND relkind = 'p') THEN
+        RETURN;
+    END IF;
+
+    legacy_exists := to_regclass('operation_log') IS NOT NULL;
+    IF legacy_exists THEN
+        ALTER TABLE "operation_log" RENAME TO "operation_log_legacy";
+        ALTER INDEX IF EXISTS "operation_log_pkey" RENAME TO "operation_log_legacy_pkey";
+    ELSE
+        CREATE SEQUENCE IF NOT EXISTS "operation_log_id_seq";
+    END IF;
+
+    -- 分区表的主键必须包含分区键
+    CREATE TABLE "operation_log" (
+        "create_time" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+        "update_time" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+        "id" INT NOT NULL  DEFAULT nextval('operation_log_id_seq'),
+        "username" VARCHAR(50) NOT NULL,
+        "operation" VARCHAR(255) NOT NULL,
+        "result" VARCHAR(255) NOT NULL,
+        "request_id" VARCHAR(64),
+        "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE,
+        PRIMARY KEY ("id", "create_time")
+    ) PARTITION BY RANGE ("create_time");
+    -- 序列归属新表，删除旧表时不会连带删除
+    ALTER SEQUENCE "operation_log_id_seq" OWNED BY "operation_log"."id";
+    COMMENT ON TABLE "operation_log" IS '操作日志';
+
+    -- 兜底分区，正常情况下应为空
+    CREATE TABLE "operation_log_default" PARTITION OF "operation_log" DEFAULT;
+
+    start_month := date_trunc('month', CURRENT_DATE);
+    IF legacy_exists THEN
+        SELECT LEAST(start_month, date_trunc('month', MIN("create_time"))::DATE) INTO start_month
+        FROM "operation_log_legacy";
+    END IF;
+    cur_month := start_month;
+    WHILE cur_month <= date_trunc('month', CURRENT_DATE) + INTERVAL '2 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF "operation_log" FOR VALUES FROM (%L) TO (%L)',
+            'operation_log_p' || to_char(cur_month, 'YYYYMM'), cur_month, cur_month + INTERVAL '1 month'
+        );
+        cur_month := cur_month + INTERVAL '1 month';
+    END LOOP;
+
+    IF legacy_exists THEN
+        INSERT INTO "operation_log" ("create_time", "update_time", "id", "username", "operation", "result", "request_id", "user_id")
+        SELECT "create_time", "update_time", "id", "username", "operation", "result", "request_id", "user_id"
+        FROM "operation_log_legacy";
+        DROP TABLE "operation_log_legacy";
+    END IF;
+END $$;
+CREATE INDEX IF NOT EXISTS "idx_operation_l_user_id_2b1943" ON "operation_log" ("user_id", "create_time");
+CREATE INDEX IF NOT EXISTS "idx_operation_l_create__8a7489" ON "operation_log" ("create_time");
+CREATE INDEX IF NOT EXISTS "idx_operation_request_5e3c1a" ON "operation_log" ("request_id");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    # 恢复为普通表，保留全部数据
+    return """
+        ALTER TABLE "operation_log" RENAME TO "operation_log_partitioned";
+ALTER INDEX IF EXISTS "operation_log_pkey" RENAME TO "operation_log_partitioned_pkey";
+DROP INDEX IF EXISTS "idx_operation_l_user_id_2b1943";
+DROP INDEX IF EXISTS "idx_operation_l_create__8a7489";
+DROP INDEX IF EXISTS "idx_operation_request_5e3c1a";
+CREATE TABLE "operation_log" (
+    "create_time" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "update_time" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+    "id" INT NOT NULL  DEFAULT nextval('operation_log_id_seq') PRIMARY KEY,
+    "username" VARCHAR(50) NOT NULL,
+    "operation" VARCHAR(255) NOT NULL,
+    "result" VARCHAR(255) NOT NULL,
+    "request_id" VARCHAR(64),
+    "user_id" INT NOT NULL REFERENCES "user" ("id") ON DELETE CASCADE
+);
+ALTER SEQUENCE "operation_log_id_seq" OWNED BY "operation_log"."id";
+INSERT INTO "operation_log" SELECT "create_time", "update_time", "id", "username", "operation", "result", "request_id", "user_id" FROM "operation_log_partitioned";
+DROP TABLE "operation_log_partitioned";
+CREATE INDEX IF NOT EXISTS "idx_operation_request_5e3c1a" ON "operation_log" ("request_id");
+COMMENT ON TABLE "operation_log" IS '操作日志';"""
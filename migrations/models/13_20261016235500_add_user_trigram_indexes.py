@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    # pg_trgm GIN索引，使 LIKE/ILIKE '%关键词%' 和词相似度运算符 <% 不再全表扫描
+    # 迁移在事务中执行，不能使用 CONCURRENTLY，建索引期间会阻塞 user 表的写入
+    return """
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS "idx_user_username_trgm" ON "user" USING GIN ("username" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "idx_user_nickname_trgm" ON "user" USING GIN ("nickname" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "idx_user_user_phone_trgm" ON "user" USING GIN ("user_phone" gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS "idx_user_user_email_trgm" ON "user" USING GIN ("user_email" gin_trgm_ops);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    # 保留 pg_trgm 扩展，其他对象可能依赖它
+    return """
+        DROP INDEX IF EXISTS "idx_user_username_trgm";
+DROP INDEX IF EXISTS "idx_user_nickname_trgm";
+DROP INDEX IF EXISTS "idx_user_user_phone_trgm";
+DROP INDEX IF EXISTS "idx_user_user_email_trgm";"""
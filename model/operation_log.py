@@ -15,6 +15,7 @@ class OperationLog(TimestampMixin, Model):
     username = fields.CharField(max_length=50, nullable=False)
     operation = fields.CharField(max_length=255, nullable=False)
     result = fields.CharField(max_length=255, nullable=False)
+    request_id = fields.CharField(max_length=64, null=True, db_index=True, description="请求ID，与日志中的request_id对应")
 
     # 使用字符串形式的模型引用，不是直接导入
     user = fields.ForeignKeyField("models.User", related_name="operation_logs", on_delete=fields.CASCADE)
@@ -22,6 +23,8 @@ class OperationLog(TimestampMixin, Model):
     class Meta:
         table = "operation_log"
         table_description = "操作日志"
+        # 按 create_time 按月分区，见迁移 12_*_partition_operation_log.py
+        indexes = (("user_id", "create_time"), ("create_time",))
 
     def __str__(self):
         return f"<OperationLog(id={self.id}, user_id={self.user_id}, username={self.username}, operation={self.operation}, result={self.result}, create_time={self.create_time})>"
@@ -45,6 +45,9 @@ class User(TimestampMixin, models.Model):
     client_host: fields.CharField = fields.CharField(
         max_length=45, null=True, default=None, description="最后登录IP"
     ) # Sufficient for IPv4, potentially short for IPv6 FQDNs, adjust if needed
+    token_version: fields.IntField = fields.IntField(
+        default=0, description="令牌版本，递增后该用户已签发的令牌全部失效"
+    )
 
     # 添加类型提示，这不会影响数据库结构，只用于代码提示
     operation_logs: fields.ReverseRelation["OperationLog"]
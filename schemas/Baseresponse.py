@@ -3,7 +3,7 @@ from typing import Any
 class BaseResponse(BaseModel):
     code: int
     message: str
-    data: Anyddddd
+    data: Any
 
 
 def success_response(message: str, data: Any = None):
@@ -0,0 +1,17 @@
+from typing import Optional
+from pydantic import BaseModel
+from datetime import datetime
+
+
+# 操作日志列表项响应模型
+class OperationLogItem(BaseModel):
+    id: int
+    user_id: int
+    username: str
+    operation: str
+    result: str
+    request_id: Optional[str] = None
+    create_time: datetime
+
+    class Config:
+        from_attributes = True
@@ -22,7 +22,8 @@ TEST_DB_URL = "sqlite://:memory:"
 TORTOISE_TEST_CONFIG = {
     "connections": {
         "default": {
-            "engine": "tortoise.backends.sqlite",
+            # 带查询统计的SQLite后端，assert_max_queries 依赖它记录查询
+            "engine": "database.sqlite_backend",
             "credentials": {"file_path": ":memory:"}
         }
     },
@@ -282,6 +283,449 @@ async def test_get_user_list(client):
         assert len(data["data"]["items"]) == 2
         assert data["data"]["page_info"]["total"] == 2
 
+# 测试进程级TTL缓存
+def test_ttl_cache_lru_and_expiry():
+    from core.cache import TTLCache
+
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")  # 淘汰最久未使用的2
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+
+    cache.set(4, "d", ttl=0)  # ttl<=0 不缓存
+    assert cache.get(4) is None
+    assert cache.pop(1) == "a"
+    assert cache.get(1) is None
+
+# 测试令牌吊销过滤器
+def test_revocation_filter():
+    from core.revocation import RevocationFilter
+
+    revocation = RevocationFilter(capacity=100, error_rate=0.01)
+    assert revocation.might_be_revoked(1)  # 未加载前全部回退到数据库校验
+
+    revocation.rebuild(revoked_ids=[3], gaps=[(5, 7)], max_user_id=10)
+    assert not revocation.might_be_revoked(1)
+    assert revocation.might_be_revoked(3)
+    assert revocation.might_be_revoked(6)
+    assert not revocation.might_be_revoked(8)
+    assert revocation.might_be_revoked(11)
+
+    revocation.revoke(2)
+    assert revocation.might_be_revoked(2)
+
+# 测试管理员接口不信任JWT中的用户类型: 过滤器未命中时仍以主体缓存为准
+def test_admin_check_ignores_token_user_type(monkeypatch):
+    from starlette.requests import Request
+    from core import auth
+    from core.Exception import ForbiddenException
+    from core.jwtwoken import TokenPayload
+
+    monkeypatch.setattr(auth.revocation_filter, "might_be_revoked", lambda user_id: False)
+    # 其他worker已把该用户降级为普通用户，本进程的过滤器尚未刷新
+    auth.principal_cache.set(42, auth.Principal(42, UserStatus.ACTIVE, UserType.NORMAL, 0, "demoted"))
+    token = TokenPayload(user_id=42, user_type=UserType.ADMIN, token_version=0, username="demoted")
+
+    async def main():
+        request = Request({"type": "http", "headers": []})
+        await auth.get_current_active_user(request, token)  # 普通接口仍按JWT放行
+        with pytest.raises(ForbiddenException):
+            await auth.get_admin_user(request, token)
+
+    try:
+        asyncio.run(main())
+    finally:
+        auth.invalidate_principal(42)
+
+# 测试登录限流
+def test_keyed_throttle_delay_and_lockout():
+    from core.rate_limit import KeyedThrottle
+
+    throttle = KeyedThrottle(
+        name="test", burst=2, refill_seconds=60, free_failures=1, base_delay=30,
+        max_delay=60, max_failures=3, lockout_seconds=300, max_keys=2
+    )
+    assert throttle.retry_after("a") is None
+    assert throttle.retry_after("a") is None
+    assert throttle.retry_after("a") is not None  # 令牌耗尽
+    assert throttle.rejected_rate == 1
+
+    throttle.record_failure("b")
+    assert throttle.retry_after("b") is None  # 免延迟的失败次数内
+    throttle.record_failure("b")
+    assert throttle.retry_after("b") > 0  # 渐进延迟
+    throttle.record_failure("b")
+    assert throttle.lockouts == 1
+
+    throttle.retry_after("c")  # 超过max_keys，淘汰最久未访问的键
+    assert throttle.stats()["keys"] == 2
+    for key in ("d", "e", "f"):  # 大量新键不会挤掉锁定中的键
+        throttle.retry_after(key)
+    assert "b" in throttle._states
+    assert throttle.retry_after("b") > 0
+
+# 测试日志中间件读取鉴权依赖项解析的用户身份
+def test_get_request_identity():
+    from core.auth import Principal, get_request_identity
+    from core.jwtwoken import TokenPayload
+
+    assert get_request_identity(None) == (None, None)
+    token_payload = TokenPayload(user_id=1, user_type=1, username="admin")
+    assert get_request_identity({"token_payload": token_payload}) == (1, "admin")
+    principal = Principal(user_id=2, user_status=1, user_type=1, username="root")
+    assert get_request_identity({"token_payload": token_payload, "principal": principal}) == (2, "root")
+
+# 测试路由审计策略
+def test_audit_policies():
+    from core.audit import AuditPolicy, AuditPolicyRegistry, audit_policy
+
+    app = FastAPI()
+
+    @app.get("/never")
+    @audit_policy(AuditPolicy.NEVER)
+    async def never():
+        return {}
+
+    @app.get("/errors")
+    @audit_policy(AuditPolicy.ERRORS)
+    async def errors():
+        return {}
+
+    @app.get("/default")
+    async def default():
+        return {}
+
+    registry = AuditPolicyRegistry()
+    registry.compile(app)
+    assert not registry.policy_for(never).should_audit(failed=True)
+    assert registry.policy_for(errors).should_audit(failed=True)
+    assert not registry.policy_for(errors).should_audit(failed=False)
+    assert registry.policy_for(default).should_audit(failed=False)
+    assert registry.policy_for(None).should_audit(failed=False)  # 未匹配路由
+
+    assert not AuditPolicy(AuditPolicy.SAMPLE, rate=0.0).should_audit(failed=False)
+    assert AuditPolicy(AuditPolicy.SAMPLE, rate=0.0).should_audit(failed=True)
+    with pytest.raises(ValueError):
+        AuditPolicy(AuditPolicy.SAMPLE, rate=2)
+
+# 测试指标注册表的Prometheus文本输出
+def test_metrics_render():
+    from core.metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "请求数", ("route",))
+    histogram = registry.histogram("latency_seconds", "耗时", ("route",), buckets=(0.1, 1.0))
+    counter.inc("/a")
+    counter.inc("/a")
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, "/a")
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{route="/a"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+# 测试请求ID的沿用与重新生成
+def test_new_request_id():
+    from core.request_context import new_request_id
+
+    assert new_request_id("abc-123.x_y") == "abc-123.x_y"
+    assert len(new_request_id(None)) == 32
+    assert new_request_id("bad id\n") != "bad id\n"  # 非法字符，防止日志注入
+    assert new_request_id("a" * 65) != "a" * 65
+    assert new_request_id("abc\n") != "abc\n"  # 末尾换行同样拒绝
+
+# 测试异常指纹聚合
+def test_error_tracker_fingerprint():
+    from core.error_tracker import ErrorTracker, fingerprint
+
+    def fail(value):
+        raise ValueError(f"bad value {value}")
+
+    errors = []
+    for value in (1, 2, 3):
+        try:
+            fail(value)
+        except ValueError as e:
+            errors.append(e)
+    try:
+        int("x")
+    except ValueError as e:
+        other = e
+
+    # 消息不同、位置相同的异常归为同一指纹
+    assert fingerprint(errors[0]) == fingerprint(errors[1])
+    assert fingerprint(errors[0]) != fingerprint(other)
+
+    tracker = ErrorTracker(max_fingerprints=10, summary_interval=3600)
+    for e in errors + [other]:
+        tracker.report(e, "test")
+    top = tracker.top()
+    assert top[0]["count"] == 3 and top[1]["count"] == 1
+    assert tracker.stats()["suppressed"] == 2
+
+# 测试操作日志分区的月份计算
+def test_operation_log_partition_months():
+    from datetime import date
+    from database.partition import add_months, expired_partitions, months_to_create
+
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+    created = months_to_create(date(2026, 12, 15), 1)
+    assert created == [
+        ("operation_log_p202612", date(2026, 12, 1), date(2027, 1, 1)),
+        ("operation_log_p202701", date(2027, 1, 1), date(2027, 2, 1)),
+    ]
+
+    names = ["operation_log_default", "operation_log_p202603", "operation_log_p202604", "operation_log_p202610"]
+    # 10月保留6个月: 4月及之后保留
+    assert expired_partitions(names, date(2026, 10, 16), 6) == ["operation_log_p202603"]
+
+# 测试分页游标编解码
+def test_pagination_cursor():
+    from common.pagination import decode_cursor, encode_cursor
+    from core.Exception import ValidationException
+
+    cursor = encode_cursor(["2026-10-01T00:00:00+00:00", 42])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == ["2026-10-01T00:00:00+00:00", 42]
+    for bad in ("zzz", encode_cursor([1])):
+        with pytest.raises(ValidationException):
+            decode_cursor(bad, 2)
+
+# 测试PostgreSQL后端不区分大小写匹配生成可走索引的ILIKE
+def test_postgres_ilike_filters():
+    from pypika import Table
+    from database.asyncpg_backend import postgres_insensitive_contains, postgres_insensitive_starts_with
+
+    table = Table("user")
+    sql = postgres_insensitive_contains(table.username, "a_b%").get_sql(quote_char='"')
+    assert sql == r"""CAST("username" AS VARCHAR) ILIKE '%a\_b\%%' ESCAPE '\'"""
+    assert "UPPER" not in postgres_insensitive_starts_with(table.username, "ab").get_sql(quote_char='"')
+
+# 测试只读副本连接配置的解析
+def test_replica_connections(monkeypatch):
+    import TORTOISE_ORM
+
+    monkeypatch.setattr(TORTOISE_ORM, "DB_REPLICA_HOSTS", "10.0.0.2:5433, 10.0.0.3,")
+    replicas = TORTOISE_ORM._replica_connections()
+    assert list(replicas) == ["replica_0", "replica_1"]
+    assert replicas["replica_0"]["credentials"]["host"] == "10.0.0.2"
+    assert replicas["replica_0"]["credentials"]["port"] == 5433
+    assert replicas["replica_1"]["credentials"]["port"] == TORTOISE_ORM.DB_PORT
+
+    monkeypatch.setattr(TORTOISE_ORM, "DB_REPLICA_HOSTS", "")
+    assert TORTOISE_ORM._replica_connections() == {}
+
+# 测试启动阶段计时
+def test_startup_timer():
+    from core.lifespan import StartupTimer
+
+    timer = StartupTimer()
+    with timer.phase("a"):
+        pass
+    with pytest.raises(RuntimeError):
+        with timer.phase("b"):
+            raise RuntimeError("boom")
+    summary = timer.summary()
+    assert list(summary["phases"]) == ["a", "b"]
+    assert summary["total_ms"] >= summary["phases"]["a"]
+
+# 测试按请求的查询统计与查询数断言
+def test_assert_max_queries():
+    from database.query_metrics import assert_max_queries, normalize_sql
+
+    assert normalize_sql("""SELECT "id" FROM "user" WHERE "id"=12 AND "username"='a''b' LIMIT 1""") == \
+        """SELECT "id" FROM "user" WHERE "id"=? AND "username"=? LIMIT ?"""
+
+    async def main():
+        # 自行初始化独立的内存数据库，不依赖会话级异步fixture
+        await Tortoise.init(config=TORTOISE_TEST_CONFIG)
+        try:
+            await Tortoise.generate_schemas()
+            with assert_max_queries(2) as stats:
+                for user_id in (1, 2):
+                    await User.filter(id=user_id).first()
+            assert stats.repeated(2)[0][1] == 2
+
+            with pytest.raises(AssertionError, match="超过上限 1"):
+                with assert_max_queries(1):
+                    await User.all().count()
+                    await User.all().first()
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(main())
+
+# 测试就绪探针的结果缓存、并发请求共享检查以及缓存过期后重新检查
+def test_readiness_probe_cache():
+    from core.health import ReadinessProbe
+
+    now = [0.0]
+    calls = []
+
+    async def database():
+        calls.append("database")
+        await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    async def pool():
+        return {"ok": False}
+
+    probe = ReadinessProbe(
+        ttl=5, db_timeout=1, saturation_threshold=0.9,
+        checks={"database": database, "pool": pool}, clock=lambda: now[0],
+    )
+
+    async def main():
+        results = await asyncio.gather(*(probe.check() for _ in range(10)))
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        # 连接池只报告饱和，不影响就绪
+        assert results[0]["ready"] is True
+        assert results[0]["checks"]["pool"] == {"ok": False}
+
+        now[0] = 4.9
+        assert await probe.check() is results[0]
+        assert len(calls) == 1
+
+        now[0] = 5.0
+        refreshed = await probe.check()
+        assert refreshed is not results[0]
+        assert len(calls) == 2
+
+    asyncio.run(main())
+
+# 测试操作日志溢出落盘不在请求路径上访问文件系统，回放失败时保留剩余记录
+def test_operation_log_spool_off_request_path(tmp_path, monkeypatch):
+    import core.operation_log_writer as writer_module
+    from core.operation_log_writer import OperationLogWriter
+
+    async def database_down():
+        return False
+    monkeypatch.setattr(writer_module, "_database_available", database_down)
+
+    writer = OperationLogWriter(batch_size=2, flush_interval=0.1, max_queue=10,
+                                spool_path=tmp_path / "oplog.spool", replay_interval=30)
+
+    async def main():
+        for i in range(5):
+            writer.enqueue(1, "admin", f"op{i}", "成功")  # 写入器未启动，记录交给后台落盘
+        assert not writer.spool_path.exists()
+        await asyncio.sleep(0.1)
+        assert writer.spooled == 5
+
+        async def failing_write(batch):
+            raise ConnectionError("数据库不可用")
+        writer._write = failing_write
+        await writer._replay_spool()
+
+    asyncio.run(main())
+    assert len(writer.spool_path.read_text(encoding="utf-8").splitlines()) == 5
+    assert not writer.replay_path.exists()
+
+# 测试并发导出: 名额在处理函数中占用，超出时立即返回503，响应结束后释放
+def test_operation_log_export_concurrency(monkeypatch):
+    from api.internal.operation_log import operation_log
+    from core.Exception import ServiceUnavailableException
+
+    monkeypatch.setattr(operation_log, "export_limiter", operation_log._ExportLimiter(1))
+    filters = dict(export_format="csv", user_id=None, username=None, start_time=None,
+                   end_time=None, operation=None, result=None)
+
+    async def main():
+        await Tortoise.init(config={**TORTOISE_TEST_CONFIG, "apps": {"models": {"models": ["model"]}}})
+        try:
+            await exports()
+        finally:
+            await Tortoise.close_connections()
+
+    async def exports():
+        results = await asyncio.gather(
+            operation_log.export_operation_logs(**filters),
+            operation_log.export_operation_logs(**filters),
+            return_exceptions=True,
+        )
+        print(results)
+        responses = [r for r in results if not isinstance(r, Exception)]
+        errors = [r for r in results if isinstance(r, ServiceUnavailableException)]
+        assert len(responses) == 1 and len(errors) == 1
+        assert errors[0].headers["Retry-After"] == "30"
+
+        await responses[0].background()  # 响应完成(含客户端提前断开)时释放名额
+        assert operation_log.export_limiter.active == 0
+        response = await operation_log.export_operation_logs(**filters)
+        await response.body_iterator.aclose()
+        await response.background()
+
+    asyncio.run(main())
+    assert operation_log.export_limiter.active == 0
+
+# 测试响应发送之后记录操作日志失败时不会向上抛出异常
+def test_internal_log_middleware_swallows_audit_errors(monkeypatch):
+    from middleware.logger_middleware import InternalRequestLogMiddleware
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def broken_audit(scope, result):
+        raise RuntimeError("用户表不可用")
+
+    middleware = InternalRequestLogMiddleware(app)
+    monkeypatch.setattr(middleware, "_audit", broken_audit)
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/api/internal/users/x", "headers": []}
+    asyncio.run(middleware(scope, None, send))
+    assert [message["type"] for message in sent] == ["http.response.start", "http.response.body"]
+
+# 测试 bcrypt 校准的 min_rounds 超出有效范围时按边界截断，推荐值始终是测量过的 rounds
+def test_bcrypt_calibration_clamps_min_rounds(monkeypatch):
+    from utils import bcrypt_calibration
+
+    monkeypatch.setattr(bcrypt_calibration, "measure_rounds", lambda rounds, samples=3: float(rounds))
+
+    result = bcrypt_calibration.calibrate_bcrypt_rounds(target_ms=1000, min_rounds=32)
+    assert result["recommended"] == bcrypt_calibration.MAX_ROUNDS
+    assert result["recommended"] in result["timings"]
+
+    result = bcrypt_calibration.calibrate_bcrypt_rounds(target_ms=0, min_rounds=2)
+    assert result["recommended"] == bcrypt_calibration.MIN_ROUNDS
+    assert result["recommended"] in result["timings"]
+
+    monkeypatch.setattr("sys.argv", ["bcrypt_calibration", "--min-rounds", "32"])
+    with pytest.raises(SystemExit):
+        bcrypt_calibration.main()
+
+# 测试 Tortoise 私有API封装在已验证的版本上可用，升级 Tortoise 后此测试失败以提示复查
+def test_tortoise_compat():
+    from pypika.enums import Order
+    from common import tortoise_compat
+
+    assert tortoise_compat.TORTOISE_VERSION == tortoise_compat.TESTED_TORTOISE_VERSION
+
+    async def main():
+        await Tortoise.init(config={**TORTOISE_TEST_CONFIG, "apps": {"models": {"models": ["model"]}}})
+        try:
+            assert tortoise_compat.query_set_orderings(User.all()) == []
+            assert tortoise_compat.query_set_orderings(User.all().order_by("-id")) == [("id", Order.desc)]
+            assert tortoise_compat.query_set_db(User.all()) is User._meta.db
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(main())
+
 # 运行测试
 if __name__ == "__main__":
     pytest.main(["-xvs", "test.py"]) 
\ No newline at end of file
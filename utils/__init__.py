@@ -1,6 +1,7 @@
 from utils.crypto import (
     hash_password,
     verify_password,
+    verify_and_update_password,
     generate_salt,
     hash_password_with_salt,
     verify_password_with_salt,
@@ -10,6 +11,7 @@ from utils.crypto import (
 __all__ = [
     'hash_password',
     'verify_password',
+    'verify_and_update_password',
     'generate_salt',
     'hash_password_with_salt',
     'verify_password_with_salt',
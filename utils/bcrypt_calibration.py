@@ -0,0 +1,93 @@
+"""
+bcrypt 成本参数校准工具
+
+在部署机器上测量不同 rounds 的哈希耗时，推荐满足延迟预算的最大 rounds
+运行方式 (在项目根目录):
+    python -m utils.bcrypt_calibration --target-ms 250
+将推荐值写入环境变量 BCRYPT_ROUNDS 后，旧哈希会在用户下次登录时自动更新
+"""
+import argparse
+import time
+from typing import Dict, List
+
+import bcrypt
+
+from config import config
+
+# passlib 的 bcrypt 处理器接受的 rounds 范围
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+
+
+def measure_rounds(rounds: int, samples: int = 3) -> float:
+    """
+    测量指定rounds下单次哈希的耗时
+
+    Args:
+        rounds: bcrypt成本参数
+        samples: 采样次数，取中位数
+
+    Returns:
+        float: 单次哈希耗时(毫秒)
+    """
+    timings: List[float] = []
+    password = b"bcrypt-calibration-password"
+    for _ in range(samples):
+        salt = bcrypt.gensalt(rounds=rounds)
+        start = time.perf_counter()
+        bcrypt.hashpw(password, salt)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int = 10, samples: int = 3) -> Dict[str, object]:
+    """
+    从min_rounds开始逐级测量，直到耗时超过延迟预算
+
+    Args:
+        target_ms: 单次哈希的延迟预算(毫秒)
+        min_rounds: 起始rounds，也是推荐值的下限，超出 [MIN_ROUNDS, MAX_ROUNDS] 时按边界截断
+        samples: 每个rounds的采样次数
+
+    Returns:
+        dict: recommended 为推荐的rounds，timings 为各rounds的耗时(毫秒)
+    """
+    min_rounds = min(max(min_rounds, MIN_ROUNDS), MAX_ROUNDS)
+    timings: Dict[int, float] = {}
+    recommended = min_rounds
+    for rounds in range(min_rounds, MAX_ROUNDS + 1):
+        elapsed = measure_rounds(rounds, samples)
+        timings[rounds] = elapsed
+        if elapsed > target_ms:
+            break
+        recommended = rounds
+    return {"recommended": recommended, "timings": timings}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="校准 bcrypt 成本参数")
+    parser.add_argument("--target-ms", type=float, default=250, help="单次哈希的延迟预算(毫秒)")
+    parser.add_argument(
+        "--min-rounds",
+        type=int,
+        default=10,
+        choices=range(MIN_ROUNDS, MAX_ROUNDS + 1),
+        metavar=f"{{{MIN_ROUNDS}..{MAX_ROUNDS}}}",
+        help="推荐值的下限",
+    )
+    parser.add_argument("--samples", type=int, default=3, help="每个rounds的采样次数")
+    args = parser.parse_args()
+
+    result = calibrate_bcrypt_rounds(args.target_ms, args.min_rounds, args.samples)
+    for rounds, elapsed in result["timings"].items():
+        marker = " <= 推荐" if rounds == result["recommended"] else ""
+        print(f"rounds={rounds:<3} {elapsed:>10.1f} ms{marker}")
+
+    print(f"当前 BCRYPT_ROUNDS={config.BCRYPT_ROUNDS}，推荐 BCRYPT_ROUNDS={result['recommended']}")
+    if result["timings"][result["recommended"]] > args.target_ms:
+        print(f"警告: 最低 rounds={result['recommended']} 已超过延迟预算 {args.target_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
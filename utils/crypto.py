@@ -1,11 +1,13 @@
 import hashlib
 import secrets
 import base64
-from typing import Tuple
+from typing import Optional, Tuple
 from passlib.context import CryptContext
+from config import config
 
 # 创建passlib上下文，用于密码哈希和验证
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 指定rounds后，成本参数与配置不一致的哈希会被 needs_update 判定为需要更新
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     """
@@ -34,6 +36,20 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    验证密码，并在哈希参数过时(如bcrypt成本与配置不一致)时生成新哈希
+    
+    Args:
+        plain_password: 原始密码
+        hashed_password: 存储的密码哈希
+        
+    Returns:
+        Tuple[bool, Optional[str]]: (验证是否成功, 需要保存的新哈希，无需更新时为None)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def generate_salt(length: int = 16) -> str:
     """
     生成随机盐值
@@ -102,6 +118,16 @@ class PasswordManager:
         """验证密码"""
         return verify_password(plain_password, hashed_password)
     
+    @staticmethod
+    def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """验证密码，哈希参数过时时返回新哈希"""
+        return verify_and_update_password(plain_password, hashed_password)
+    
+    @staticmethod
+    def needs_update(hashed_password: str) -> bool:
+        """判断哈希参数是否过时"""
+        return pwd_context.needs_update(hashed_password)
+    
     @staticmethod
     def hash_with_salt(password: str) -> Tuple[str, str]:
         """使用自定义盐值进行哈希"""